@@ -0,0 +1,87 @@
+"""Per-call cost of forking a branch for a `@branch` decorated function.
+
+Compares `fork`, which validates the tags and metadata on every call and then
+applies them with `add_tags` and `add_metadata`, against forking from the
+precomputed branch template used by `@branch`. Reports the time per call, and
+the number of memory blocks allocated per call, measured with `tracemalloc`.
+The writer thread is paused for both, so that only the cost to the caller is
+timed, and everything kept for the backend is counted. Run with
+`python benchmarks/branch_template.py`.
+"""
+
+import timeit
+import tracemalloc
+
+from bramble.backends.base import BrambleWriter
+from bramble.contextual import fork, _fork_trusted
+from bramble.loggers import TreeLogger
+from bramble.wrapper import _compile_template
+
+CALLS = 20_000
+REPEAT = 5
+TAGS = ["tag one", "tag two", "tag three"]
+METADATA = {"key": "value", "number": 1, "ratio": 0.5, "flag": True}
+
+
+class NullWriter(BrambleWriter):
+    async def async_append_entries(self, entries):
+        pass
+
+    async def async_extend_tree(self, relationships):
+        pass
+
+    async def async_update_branch_metadata(self, metadata):
+        pass
+
+    async def async_add_tags(self, tags):
+        pass
+
+
+def decorated():
+    pass
+
+
+def fork_validated():
+    with fork("decorated", tags=TAGS, metadata=METADATA):
+        pass
+
+
+template = _compile_template(decorated, tags=TAGS, metadata=METADATA)
+
+
+def fork_template():
+    with _fork_trusted(template.name, template.tags, template.metadata):
+        pass
+
+
+def paused_logger() -> TreeLogger:
+    tree_logger = TreeLogger(NullWriter())
+    tree_logger.run = lambda *_, **__: None
+    return tree_logger
+
+
+def time_per_call(fn) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        with paused_logger():
+            timings.append(timeit.timeit(fn, number=CALLS))
+    return min(timings) / CALLS * 1e9
+
+
+def blocks_per_call(fn) -> float:
+    with paused_logger():
+        fn()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(CALLS):
+            fn()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    stats = after.compare_to(before, "lineno")
+    return sum(stat.count_diff for stat in stats) / CALLS
+
+
+if __name__ == "__main__":
+    print(f"{'':>10} {'time':>10} {'blocks':>8}")
+    for name, fn in [("fork", fork_validated), ("template", fork_template)]:
+        print(f"{name:>10} {time_per_call(fn):>7.0f} ns {blocks_per_call(fn):>8.1f}")
@@ -0,0 +1,153 @@
+"""Cost of handing tasks to the `TreeLogger` writer thread.
+
+Compares a shared `queue.SimpleQueue` (the previous enqueue path) against the
+task list used by `TreeLogger`, with several threads producing at once, on
+both the producer and the writer side. Run with `python benchmarks/enqueue.py`.
+"""
+
+import threading
+import datetime
+import queue
+import time
+
+from bramble.backends.base import BrambleWriter
+from bramble.loggers import TreeLogger
+from bramble.logs import LogEntry, MessageType
+
+CALLS_PER_THREAD = 100_000
+THREAD_COUNTS = [1, 8, 32]
+
+
+class NullWriter(BrambleWriter):
+    async def async_append_entries(self, entries):
+        pass
+
+    async def async_extend_tree(self, relationships):
+        pass
+
+    async def async_update_branch_metadata(self, metadata):
+        pass
+
+    async def async_add_tags(self, tags):
+        pass
+
+
+def _time_threads(num_threads: int, target) -> float:
+    barrier = threading.Barrier(num_threads + 1)
+
+    def _run():
+        barrier.wait()
+        target()
+
+    threads = [threading.Thread(target=_run) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter_ns()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter_ns() - start
+    return elapsed / (num_threads * CALLS_PER_THREAD)
+
+
+def bench_simple_queue(num_threads: int, task: tuple) -> float:
+    tasks = queue.SimpleQueue()
+    done = threading.Event()
+
+    def _consume():
+        while not done.is_set():
+            try:
+                tasks.get(timeout=0.01)
+            except queue.Empty:
+                pass
+
+    consumer = threading.Thread(target=_consume)
+    consumer.start()
+
+    def _produce():
+        put = tasks.put
+        for _ in range(CALLS_PER_THREAD):
+            put(task)
+
+    result = _time_threads(num_threads, _produce)
+    done.set()
+    consumer.join()
+    return result
+
+
+def bench_task_list(num_threads: int, task: tuple) -> float:
+    with TreeLogger(NullWriter(), debounce=0.01) as tree_logger:
+
+        def _produce():
+            enqueue = tree_logger._enqueue
+            for _ in range(CALLS_PER_THREAD):
+                enqueue(task)
+
+        return _time_threads(num_threads, _produce)
+
+
+def bench_simple_queue_get(task: tuple) -> float:
+    tasks = queue.SimpleQueue()
+    for _ in range(CALLS_PER_THREAD):
+        tasks.put(task)
+
+    start = time.perf_counter_ns()
+    get = tasks.get_nowait
+    try:
+        while True:
+            get()
+    except queue.Empty:
+        pass
+    return (time.perf_counter_ns() - start) / CALLS_PER_THREAD
+
+
+def bench_task_list_drain(task: tuple) -> float:
+    tree_logger = TreeLogger(NullWriter())
+    tree_logger._drain()
+    for _ in range(CALLS_PER_THREAD):
+        tree_logger._enqueue(task)
+
+    start = time.perf_counter_ns()
+    tasks = tree_logger._drain()
+    elapsed = time.perf_counter_ns() - start
+    assert len(tasks) == CALLS_PER_THREAD
+    return elapsed / CALLS_PER_THREAD
+
+
+def bench_branch_log(num_threads: int) -> float:
+    with TreeLogger(NullWriter(), debounce=0.01) as tree_logger:
+        branch = tree_logger.root
+
+        def _produce():
+            log = branch.log
+            for _ in range(CALLS_PER_THREAD):
+                log("benchmark message")
+
+        return _time_threads(num_threads, _produce)
+
+
+if __name__ == "__main__":
+    entry = LogEntry(
+        message="benchmark message",
+        timestamp=datetime.datetime.now().timestamp(),
+        message_type=MessageType.USER,
+        entry_metadata=None,
+    )
+    task = (0, "0" * 24, entry)
+
+    print(f"{'threads':>8} {'SimpleQueue.put':>16} {'_enqueue':>10} {'log':>10}")
+    for num_threads in THREAD_COUNTS:
+        queue_ns = bench_simple_queue(num_threads, task)
+        list_ns = bench_task_list(num_threads, task)
+        log_ns = bench_branch_log(num_threads)
+        print(
+            f"{num_threads:>8} {queue_ns:>13.0f} ns {list_ns:>7.0f} ns "
+            f"{log_ns:>7.0f} ns"
+        )
+
+    print()
+    print(f"{'SimpleQueue.get':>16} {'_drain':>10}  (per task, writer thread)")
+    print(
+        f"{bench_simple_queue_get(task):>13.0f} ns "
+        f"{bench_task_list_drain(task):>7.0f} ns"
+    )
@@ -0,0 +1,65 @@
+"""Cost of adding a child, a tag, and a metadata key to a wide branch.
+
+Each update only carries what changed, so the time spent by the caller and by
+the writer thread should not grow with the number of children, tags, or
+metadata keys which the branch already has. For each size, the branch is
+first grown to that size, and then the next updates are timed, both when they
+are made and when they are collected into a batch for the backend. Run with
+`python benchmarks/fan_out.py`.
+"""
+
+import time
+
+from bramble.backends.base import BrambleWriter
+from bramble.loggers import TreeLogger, _Batch
+
+SIZES = [100, 1_000, 10_000, 100_000]
+UPDATES = 1_000
+
+
+class NullWriter(BrambleWriter):
+    async def async_append_entries(self, entries):
+        pass
+
+    async def async_extend_tree(self, relationships):
+        pass
+
+    async def async_update_branch_metadata(self, metadata):
+        pass
+
+    async def async_add_tags(self, tags):
+        pass
+
+
+def update(parent, index: int) -> None:
+    parent.branch(f"child {index}")
+    parent.add_tags([f"tag {index}"])
+    parent.add_metadata({f"key {index}": index})
+
+
+def time_per_update(size: int) -> tuple:
+    tree_logger = TreeLogger(NullWriter())
+    parent = tree_logger.root
+    for index in range(size):
+        update(parent, index)
+    tree_logger._drain()
+
+    start = time.perf_counter_ns()
+    for index in range(size, size + UPDATES):
+        update(parent, index)
+    caller = (time.perf_counter_ns() - start) / UPDATES
+
+    tasks = tree_logger._drain()
+    batch = _Batch()
+    start = time.perf_counter_ns()
+    for task in tasks:
+        batch.add(task)
+    writer = (time.perf_counter_ns() - start) / UPDATES
+    return caller, writer
+
+
+if __name__ == "__main__":
+    print(f"{'size':>8} {'caller':>10} {'writer':>10}")
+    for size in SIZES:
+        caller, writer = time_per_update(size)
+        print(f"{size:>8} {caller:>7.0f} ns {writer:>7.0f} ns")
@@ -0,0 +1,87 @@
+"""Bytes written by `FileWriter` for each flush of a tree logger.
+
+A flush is a single `WriteBatch`, as collected by the logging thread. Here,
+each flush creates some branches, logs to them, and tags and closes them.
+`FileWriter` appends the records of a flush to the segment of each partition
+it touched. This is compared against serializing and rewriting every touched
+partition in full, once per flush, as `FileWriter` did before segments. The
+cost of a rewrite grows with everything logged so far, while the cost of an
+append only depends on the flush. Run with `python benchmarks/file_flush.py`.
+"""
+
+import asyncio
+import json
+import tempfile
+
+from bramble.backends import FileWriter
+from bramble.backends.base import WriteBatch
+from bramble.backends.file_backend import _list_partitions, _read_partition
+from bramble.logs import BranchCreation, LogEntry, MessageType
+
+FLUSHES = 200
+REPORT_AT = [1, 10, 50, 100, 200]
+BRANCHES_PER_FLUSH = 20
+PARTITIONS = 4
+
+
+class CountingFileWriter(FileWriter):
+    """Counts the bytes appended, and the bytes a full rewrite would take."""
+
+    appended = 0
+    rewritten = 0
+
+    async def _write_pending(self):
+        touched = list(self._pending)
+        self.appended = sum(
+            len(json.dumps(record)) + 1
+            for records in self._pending.values()
+            for record in records
+        )
+        await super()._write_pending()
+
+        segments = _list_partitions(self.base_path)
+        self.rewritten = 0
+        for partition in touched:
+            branches, _ = _read_partition(
+                self.base_path, partition, segments[partition]
+            )
+            self.rewritten += len(json.dumps(branches))
+
+
+def flush(index: int) -> WriteBatch:
+    branch_ids = [f"{index}-{branch}" for branch in range(BRANCHES_PER_FLUSH)]
+    entry = LogEntry("message " * 10, 0.0, MessageType.USER, None)
+    return WriteBatch(
+        created={
+            branch_id: BranchCreation(branch_id, "root", [], {"name": branch_id}, 0.0)
+            for branch_id in branch_ids
+        },
+        entries={branch_id: [entry] * 5 for branch_id in branch_ids},
+        tags={branch_id: ["tag"] for branch_id in branch_ids},
+        lifecycle={
+            branch_id: {"end": 1.0, "duration": 1.0, "status": "ok"}
+            for branch_id in branch_ids
+        },
+    )
+
+
+if __name__ == "__main__":
+    print(f"{'flush':>6} {'rewrite':>12} {'append':>12}")
+    with tempfile.TemporaryDirectory() as base_path:
+        # Compaction is left out, so that only the writes of flushes count
+        writer = CountingFileWriter(
+            base_path,
+            num_concurrent_writes=PARTITIONS,
+            max_segment_bytes=2**40,
+        )
+
+        async def run():
+            for index in range(1, FLUSHES + 1):
+                await writer.async_write_batch(flush(index))
+                if index in REPORT_AT:
+                    print(
+                        f"{index:>6} {writer.rewritten / 1e3:>9.1f} kB "
+                        f"{writer.appended / 1e3:>9.1f} kB"
+                    )
+
+        asyncio.run(run())
@@ -0,0 +1,98 @@
+"""Write throughput, read throughput, and size of JSON and binary segments.
+
+The same flushes are written by a `FileWriter` with each `file_format`, and
+then loaded by a `FileReader`. Each flush creates some branches, with a
+name, tags and metadata, logs to them, and closes them, as a tree logger
+would. Compaction is left out, so that only segments are measured. Run with
+`python benchmarks/file_format.py`.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from bramble.backends import FileReader, FileWriter
+from bramble.backends.base import WriteBatch
+from bramble.logs import BranchCreation, LogEntry, MessageType
+from bramble.utils import time_ordered_id
+
+FLUSHES = 200
+BRANCHES_PER_FLUSH = 50
+ENTRIES_PER_BRANCH = 10
+
+
+def flushes() -> list:
+    batches = []
+    for index in range(FLUSHES):
+        branch_ids = [time_ordered_id() for _ in range(BRANCHES_PER_FLUSH)]
+        batches.append(
+            WriteBatch(
+                created={
+                    branch_id: BranchCreation(
+                        name=f"worker {index % 8}",
+                        parent=None,
+                        tags=["batch", f"shard-{index % 4}"],
+                        metadata={
+                            "name": f"worker {index % 8}",
+                            "model": "small",
+                            "attempt": 1,
+                        },
+                        start=time.time(),
+                    )
+                    for branch_id in branch_ids
+                },
+                entries={
+                    branch_id: [
+                        LogEntry(
+                            f"processed item {entry} of {branch_id}",
+                            time.time(),
+                            MessageType.USER,
+                            {"item": entry, "status": "done"},
+                        )
+                        for entry in range(ENTRIES_PER_BRANCH)
+                    ]
+                    for branch_id in branch_ids
+                },
+                lifecycle={
+                    branch_id: {"end": time.time(), "duration": 0.5, "status": "ok"}
+                    for branch_id in branch_ids
+                },
+            )
+        )
+    return batches
+
+
+def measure(file_format: str, batches: list) -> tuple:
+    with tempfile.TemporaryDirectory() as base_path:
+        writer = FileWriter(base_path, max_segment_bytes=2**40, file_format=file_format)
+
+        async def write():
+            for batch in batches:
+                await writer.async_write_batch(batch)
+
+        start = time.perf_counter()
+        asyncio.run(write())
+        write_seconds = time.perf_counter() - start
+
+        size = sum(
+            os.path.getsize(os.path.join(base_path, name))
+            for name in os.listdir(base_path)
+        )
+
+        start = time.perf_counter()
+        FileReader(base_path)
+        read_seconds = time.perf_counter() - start
+    return write_seconds, read_seconds, size
+
+
+if __name__ == "__main__":
+    batches = flushes()
+    entries = FLUSHES * BRANCHES_PER_FLUSH * ENTRIES_PER_BRANCH
+    print(f"{'format':>8} {'write':>14} {'read':>14} {'size':>10}")
+    for file_format in ["json", "binary"]:
+        write_seconds, read_seconds, size = measure(file_format, batches)
+        print(
+            f"{file_format:>8} {entries / write_seconds / 1e3:>7.0f} k/s "
+            f"{entries / read_seconds / 1e3:>9.0f} k/s {size / 1e6:>7.1f} MB"
+        )
@@ -0,0 +1,84 @@
+"""Time taken by `FileReader` to load a directory, by number of workers.
+
+A synthetic corpus of 100k branches, each with a few entries, is written by
+`FileWriter` and compacted, so that every partition has a snapshot and an
+index. For each number of workers, a reader is then opened, and every
+branch is loaded with `get_branches`, as the UI does. Speedups depend on
+the number of cores available. Run with
+`python benchmarks/file_reader_workers.py`.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from bramble.backends import FileReader, FileWriter
+from bramble.backends.base import WriteBatch
+from bramble.logs import BranchCreation, LogEntry, MessageType
+from bramble.utils import time_ordered_id
+
+BRANCHES = 100_000
+BRANCHES_PER_FLUSH = 1_000
+ENTRIES_PER_BRANCH = 5
+WORKERS = [1, 2, 4, 8]
+
+
+def write_corpus(base_path: str) -> None:
+    writer = FileWriter(base_path)
+
+    async def write():
+        for index in range(BRANCHES // BRANCHES_PER_FLUSH):
+            branch_ids = [time_ordered_id() for _ in range(BRANCHES_PER_FLUSH)]
+            await writer.async_write_batch(
+                WriteBatch(
+                    created={
+                        branch_id: BranchCreation(
+                            name=f"worker {index % 8}",
+                            parent=None,
+                            tags=[f"shard-{index % 4}"],
+                            metadata={"name": f"worker {index % 8}", "attempt": 1},
+                            start=time.time(),
+                        )
+                        for branch_id in branch_ids
+                    },
+                    entries={
+                        branch_id: [
+                            LogEntry(
+                                f"processed item {entry}",
+                                time.time(),
+                                MessageType.USER,
+                                {"item": entry},
+                            )
+                            for entry in range(ENTRIES_PER_BRANCH)
+                        ]
+                        for branch_id in branch_ids
+                    },
+                    lifecycle={
+                        branch_id: {"end": time.time(), "duration": 0.5, "status": "ok"}
+                        for branch_id in branch_ids
+                    },
+                )
+            )
+        await writer.async_compact()
+
+    asyncio.run(write())
+
+
+if __name__ == "__main__":
+    print(f"{os.cpu_count()} cores")
+    print(f"{'workers':>8} {'open':>10} {'branches':>10} {'total':>10}")
+    with tempfile.TemporaryDirectory() as base_path:
+        write_corpus(base_path)
+        for num_workers in WORKERS:
+            start = time.perf_counter()
+            reader = FileReader(base_path, num_workers=num_workers)
+            opened = time.perf_counter()
+            branches = reader.get_branches(reader.get_branch_ids())
+            loaded = time.perf_counter()
+            assert len(branches) == BRANCHES
+            reader.close()
+            print(
+                f"{num_workers:>8} {opened - start:>8.2f} s "
+                f"{loaded - opened:>8.2f} s {loaded - start:>8.2f} s"
+            )
@@ -1,5 +1,6 @@
-from bramble.loggers import TreeLogger, LogBranch
-from bramble.logs import MessageType, LogEntry
-from bramble.wrapper import branch
+from bramble.loggers import TreeLogger, LogBranch, OverflowPolicy
+from bramble.logs import MessageType, BranchStatus, LogEntry, LazyMessage
+from bramble.wrapper import branch, CapturePolicy
 from bramble.contextual import log, apply, fork, disable, context, enable
 from bramble.stdlib import hook_logging
+from bramble.utils import set_validation, ValidationMode, time_ordered_id
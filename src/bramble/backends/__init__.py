@@ -1,4 +1,4 @@
-from bramble.backends.file_backend import FileReader, FileWriter
+from bramble.backends.file_backend import FileReader, FileWriter, FsyncPolicy
 
 try:
     from bramble.backends.redis_backend import RedisReader, RedisWriter
@@ -1,6 +1,30 @@
 from typing import Dict, List, Tuple
 
-from bramble.logs import LogEntry, BranchData
+import asyncio
+import warnings
+from dataclasses import dataclass, field
+
+from bramble.logs import LogEntry, BranchData, BranchSummary, BranchCreation
+
+
+@dataclass(slots=True)
+class WriteBatch:
+    """Everything collected by a tree logger for a single write to a backend.
+
+    Each field holds the argument of the `BrambleWriter` function of the same
+    name, and is empty if there is nothing to write for it. Branches in
+    `created` are new, and are not in `metadata` or `tags`, but may receive
+    entries, children, and lifecycle updates in the same batch.
+    """
+
+    created: Dict[str, BranchCreation] = field(default_factory=dict)
+    entries: Dict[str, List[LogEntry]] = field(default_factory=dict)
+    relationships: Dict[str, Tuple[str | None, List[str]]] = field(default_factory=dict)
+    metadata: Dict[str, Dict[str, str | int | float | bool]] = field(
+        default_factory=dict
+    )
+    tags: Dict[str, List[str]] = field(default_factory=dict)
+    lifecycle: Dict[str, Dict[str, float | str]] = field(default_factory=dict)
 
 
 class BrambleWriter:
@@ -20,12 +44,77 @@ class BrambleWriter:
     will work as long as either is implemented.
     """
 
+    def write_batch(self, batch: WriteBatch) -> None:
+        """Writes everything collected for a single flush of a tree logger.
+
+        This is how `bramble` sends its updates while logging. Backends which
+        can apply several kinds of update at once, for example in a single
+        transaction, should implement this.
+
+        Implementing this is optional. By default, each non-empty field of
+        `batch` is passed on to the function of the same name.
+
+        Args:
+            batch (WriteBatch): The updates to write.
+        """
+        if batch.created:
+            self.create_branches(branches=batch.created)
+        if batch.entries:
+            self.append_entries(entries=batch.entries)
+        if batch.relationships:
+            self.extend_tree(relationships=batch.relationships)
+        if batch.metadata:
+            self.update_branch_metadata(metadata=batch.metadata)
+        if batch.tags:
+            self.add_tags(tags=batch.tags)
+        if batch.lifecycle:
+            self.update_lifecycle(lifecycle=batch.lifecycle)
+
+    async def async_write_batch(self, batch: WriteBatch) -> None:
+        """Writes everything collected for a single flush of a tree logger.
+
+        This is how `bramble` sends its updates while logging. Backends which
+        can apply several kinds of update at once, for example in a single
+        transaction, should implement this.
+
+        Implementing this is optional. By default, each non-empty field of
+        `batch` is passed on to the function of the same name.
+
+        Args:
+            batch (WriteBatch): The updates to write.
+        """
+        # Writers which only implement the async functions must not be sent
+        # through the sync fallback
+        if type(self).write_batch is not BrambleWriter.write_batch:
+            self.write_batch(batch=batch)
+            return
+
+        todo = []
+        if batch.created:
+            todo.append(self.async_create_branches(branches=batch.created))
+        if batch.entries:
+            todo.append(self.async_append_entries(entries=batch.entries))
+        if batch.relationships:
+            todo.append(self.async_extend_tree(relationships=batch.relationships))
+        if batch.metadata:
+            todo.append(self.async_update_branch_metadata(metadata=batch.metadata))
+        if batch.tags:
+            todo.append(self.async_add_tags(tags=batch.tags))
+        if batch.lifecycle:
+            todo.append(self.async_update_lifecycle(lifecycle=batch.lifecycle))
+
+        await asyncio.gather(*todo)
+
     def append_entries(
         self,
         entries: Dict[str, List[LogEntry]],
     ) -> None:
         """Appends log entries to the tree logger storage.
 
+        An entry which was logged to several branches at once is passed as the
+        same `LogEntry` object under each of those branch ids. Backends may use
+        this to store its payload only once.
+
         Args:
             log_entries (Dict[str, List[LogEntry]]): The log entries to append,
             keyed by branch id.
@@ -38,6 +127,10 @@ class BrambleWriter:
     ) -> None:
         """Appends log entries to the tree logger storage.
 
+        An entry which was logged to several branches at once is passed as the
+        same `LogEntry` object under each of those branch ids. Backends may use
+        this to store its payload only once.
+
         Args:
             log_entries (Dict[str, List[LogEntry]]): The log entries to append,
             keyed by branch id.
@@ -118,6 +211,136 @@ class BrambleWriter:
         """
         self.update_tree(relationships=relationships)
 
+    def extend_tree(
+        self, relationships: Dict[str, Tuple[str | None, List[str]]]
+    ) -> None:
+        """Adds parent and child relationships to tree logger branches.
+
+        This is how `bramble` sends relationships while logging. Unlike
+        `update_tree`, only the changes are provided, so that the cost of each
+        update does not grow with the number of children of a branch. A parent
+        of `None` keeps the existing parent, and the children are added to the
+        existing children. Nothing is removed.
+
+        Implementing this is optional. By default, the full relationships of
+        each branch are kept in memory and passed to `update_tree`. That
+        memory is never released, and grows with every branch logged, so
+        writers used for long running programs should implement this.
+
+        Args:
+            relationships (Dict[str, Tuple[str | None, List[str]]]):
+                Mapping of branch IDs to a `(parent_id, list_of_new_child_ids)`
+                tuple. The parent ID is `None` if it has not changed.
+        """
+        self.update_tree(relationships=self._accumulate_tree(relationships))
+
+    async def async_extend_tree(
+        self, relationships: Dict[str, Tuple[str | None, List[str]]]
+    ) -> None:
+        """Adds parent and child relationships to tree logger branches.
+
+        This is how `bramble` sends relationships while logging. Unlike
+        `update_tree`, only the changes are provided, so that the cost of each
+        update does not grow with the number of children of a branch. A parent
+        of `None` keeps the existing parent, and the children are added to the
+        existing children. Nothing is removed.
+
+        Implementing this is optional. By default, the full relationships of
+        each branch are kept in memory and passed to `update_tree`. That
+        memory is never released, and grows with every branch logged, so
+        writers used for long running programs should implement this.
+
+        Args:
+            relationships (Dict[str, Tuple[str | None, List[str]]]):
+                Mapping of branch IDs to a `(parent_id, list_of_new_child_ids)`
+                tuple. The parent ID is `None` if it has not changed.
+        """
+        # As with `async_write_batch`, writers which only implement
+        # `async_update_tree` must not be sent through the sync fallback
+        if type(self).extend_tree is not BrambleWriter.extend_tree:
+            self.extend_tree(relationships=relationships)
+        else:
+            await self.async_update_tree(
+                relationships=self._accumulate_tree(relationships)
+            )
+
+    def _accumulate_tree(
+        self, relationships: Dict[str, Tuple[str | None, List[str]]]
+    ) -> Dict[str, Tuple[str | None, List[str]]]:
+        # Writers are not required to call `__init__`, so the tree is created
+        # on first use. Children are kept in a dict, to preserve their order.
+        tree = self.__dict__.get("_extended_tree")
+        if tree is None:
+            tree = self.__dict__["_extended_tree"] = {}
+            warnings.warn(
+                f"{type(self).__name__} does not implement `extend_tree`, so "
+                "the relationships of every branch are kept in memory to be "
+                "passed to `update_tree`. Implement `extend_tree` or "
+                "`async_extend_tree` to avoid this.",
+                stacklevel=2,
+            )
+
+        full_relationships = {}
+        for branch_id, (parent, children) in relationships.items():
+            known_parent, known_children = tree.get(branch_id, (None, {}))
+            if parent is None:
+                parent = known_parent
+            known_children.update(dict.fromkeys(children))
+            tree[branch_id] = (parent, known_children)
+            full_relationships[branch_id] = (parent, list(known_children))
+
+        return full_relationships
+
+    def create_branches(self, branches: Dict[str, BranchCreation]) -> None:
+        """Records newly created tree logger branches.
+
+        Each branch is stored with its name, metadata, tags and start time,
+        linked to its parent, and added to the children of its parent. Later
+        changes to these branches are sent through the other functions.
+
+        Implementing this is optional. By default, each branch is passed on
+        to `update_branch_metadata`, `extend_tree`, `add_tags` and
+        `update_lifecycle`.
+
+        Args:
+            branches (Dict[str, BranchCreation]): The new branches, keyed by
+                branch id.
+        """
+        metadata, relationships, tags, lifecycle = _split_creations(branches)
+        self.update_branch_metadata(metadata=metadata)
+        self.extend_tree(relationships=relationships)
+        if tags:
+            self.add_tags(tags=tags)
+        self.update_lifecycle(lifecycle=lifecycle)
+
+    async def async_create_branches(self, branches: Dict[str, BranchCreation]) -> None:
+        """Records newly created tree logger branches.
+
+        Each branch is stored with its name, metadata, tags and start time,
+        linked to its parent, and added to the children of its parent. Later
+        changes to these branches are sent through the other functions.
+
+        Implementing this is optional. By default, each branch is passed on
+        to `update_branch_metadata`, `extend_tree`, `add_tags` and
+        `update_lifecycle`.
+
+        Args:
+            branches (Dict[str, BranchCreation]): The new branches, keyed by
+                branch id.
+        """
+        # As with `async_write_batch`, writers which only implement the async
+        # functions must not be sent through the sync fallback
+        if type(self).create_branches is not BrambleWriter.create_branches:
+            self.create_branches(branches=branches)
+            return
+
+        metadata, relationships, tags, lifecycle = _split_creations(branches)
+        await self.async_update_branch_metadata(metadata=metadata)
+        await self.async_extend_tree(relationships=relationships)
+        if tags:
+            await self.async_add_tags(tags=tags)
+        await self.async_update_lifecycle(lifecycle=lifecycle)
+
     def update_branch_metadata(
         self, metadata: Dict[str, Dict[str, str | int | float | bool]]
     ) -> None:
@@ -148,6 +371,72 @@ class BrambleWriter:
         """
         self.update_branch_metadata(metadata=metadata)
 
+    def update_lifecycle(self, lifecycle: Dict[str, Dict[str, float | str]]) -> None:
+        """Records when tree logger branches were opened and closed.
+
+        Each branch maps to the lifecycle fields which changed, out of
+        `"start"`, `"end"` and `"duration"` (floats, in seconds) and
+        `"status"` (`"ok"` or `"error"`). Fields which are not provided keep
+        their existing values.
+
+        Unlike the other functions, implementing this is optional. By default,
+        lifecycle events are ignored.
+
+        Args:
+            lifecycle (Dict[str, Dict[str, float | str]]): Mapping of branch
+                IDs to lifecycle fields.
+        """
+        pass
+
+    async def async_update_lifecycle(
+        self, lifecycle: Dict[str, Dict[str, float | str]]
+    ) -> None:
+        """Records when tree logger branches were opened and closed.
+
+        Each branch maps to the lifecycle fields which changed, out of
+        `"start"`, `"end"` and `"duration"` (floats, in seconds) and
+        `"status"` (`"ok"` or `"error"`). Fields which are not provided keep
+        their existing values.
+
+        Unlike the other functions, implementing this is optional. By default,
+        lifecycle events are ignored.
+
+        Args:
+            lifecycle (Dict[str, Dict[str, float | str]]): Mapping of branch
+                IDs to lifecycle fields.
+        """
+        self.update_lifecycle(lifecycle=lifecycle)
+
+
+def _split_creations(
+    branches: Dict[str, BranchCreation],
+) -> Tuple[
+    Dict[str, Dict[str, str | int | float | bool]],
+    Dict[str, Tuple[str | None, List[str]]],
+    Dict[str, List[str]],
+    Dict[str, Dict[str, float | str]],
+]:
+    """Splits new branches into the updates of the other writer functions."""
+    metadata = {}
+    relationships = {}
+    tags = {}
+    lifecycle = {}
+    for branch_id, branch in branches.items():
+        metadata[branch_id] = branch.metadata
+        if branch_id in relationships:
+            relationships[branch_id] = (branch.parent, relationships[branch_id][1])
+        else:
+            relationships[branch_id] = (branch.parent, [])
+        if branch.parent is not None:
+            if branch.parent not in relationships:
+                relationships[branch.parent] = (None, [])
+            relationships[branch.parent][1].append(branch_id)
+        if branch.tags:
+            tags[branch_id] = branch.tags
+        lifecycle[branch_id] = {"start": branch.start}
+
+    return metadata, relationships, tags, lifecycle
+
 
 class BrambleReader:
     """Reading backend interface for `bramble` logging.
@@ -190,6 +479,53 @@ class BrambleReader:
         """
         return self.get_branches(branch_ids=branch_ids)
 
+    def get_branch_summaries(self, branch_ids: List[str]) -> Dict[str, BranchSummary]:
+        """Gets tree logger branches without their messages.
+
+        This is how the `bramble` ui lists branches. Implementing this is
+        optional. By default, the full data of each branch is read with
+        `get_branches`, and summarized, so backends which can count the
+        messages of a branch without reading them should implement this.
+
+        Args:
+            branch_ids (List[str]): The IDs of the tree logger branches.
+
+        Returns:
+            Dict[str, BranchSummary]: A dict of branch IDs to the corresponding
+                BranchSummary object.
+        """
+        return {
+            branch_id: BranchSummary.from_branch_data(branch_data)
+            for branch_id, branch_data in self.get_branches(branch_ids).items()
+        }
+
+    async def async_get_branch_summaries(
+        self, branch_ids: List[str]
+    ) -> Dict[str, BranchSummary]:
+        """Gets tree logger branches without their messages.
+
+        This is how the `bramble` ui lists branches. Implementing this is
+        optional. By default, the full data of each branch is read with
+        `async_get_branches`, and summarized, so backends which can count the
+        messages of a branch without reading them should implement this.
+
+        Args:
+            branch_ids (List[str]): The IDs of the tree logger branches.
+
+        Returns:
+            Dict[str, BranchSummary]: A dict of branch IDs to the corresponding
+                BranchSummary object.
+        """
+        # Readers which only implement `async_get_branches` must not be sent
+        # through the sync fallback
+        if type(self).get_branch_summaries is not BrambleReader.get_branch_summaries:
+            return self.get_branch_summaries(branch_ids=branch_ids)
+        branches = await self.async_get_branches(branch_ids=branch_ids)
+        return {
+            branch_id: BranchSummary.from_branch_data(branch_data)
+            for branch_id, branch_data in branches.items()
+        }
+
     def get_branch_ids(self) -> List[str]:
         """Gets the IDs of all tree logger branches.
 
@@ -0,0 +1,219 @@
+"""A compact binary encoding for the segments of `FileWriter`.
+
+A segment is a sequence of records, each stored as its length, as a 4 byte
+unsigned integer, followed by the record itself. Records are encoded as
+tagged values, much like JSON, but without repeating the strings which
+logs are full of: metadata keys, branch names, message types, tags and
+branch IDs. The first time a short string appears in a segment, it is
+defined in place, and given the next index of the segment's string table.
+After that, it is referenced by its index. Strings of lowercase hex digits,
+such as the default branch IDs, are defined as the raw bytes they spell.
+
+Since the string table is rebuilt while reading, a segment can only be read
+from its start. A record which was cut short ends the segment.
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+import re
+import struct
+
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STRING = 5
+_REFERENCE = 6
+_DEFINE = 7
+_DEFINE_HEX = 8
+_LIST = 9
+_MAP = 10
+_BIG_INT = 11
+
+# Longer strings, mostly messages, are rarely repeated, and would only make
+# the string table bigger
+_MAX_INTERNED_LENGTH = 64
+_HEX = re.compile(r"(?:[0-9a-f]{2})+")
+
+_LENGTH = struct.Struct("<I")
+_INT64 = struct.Struct("<q")
+_DOUBLE = struct.Struct("<d")
+
+
+def encode_records(records: List[Any], strings: Dict[str, int]) -> bytes:
+    """Encodes records, to be appended to a segment.
+
+    `strings` is the string table of the segment, which holds every string
+    defined in it so far. It is only updated once all of `records` have been
+    encoded, so that it does not change if encoding fails.
+    """
+    defined: Dict[str, int] = {}
+    data = bytearray()
+    for record in records:
+        encoded = bytearray()
+        _encode(record, encoded, strings, defined)
+        data += _LENGTH.pack(len(encoded))
+        data += encoded
+    strings.update(defined)
+    return bytes(data)
+
+
+def decode_records(data: bytes) -> Iterator[Any]:
+    """Decodes the records of a segment, in the order they were written."""
+    strings: List[str] = []
+    offset = 0
+    while offset + _LENGTH.size <= len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        start = offset + _LENGTH.size
+        offset = start + length
+        if offset > len(data):
+            # A write which was cut short leaves a partial last record
+            return
+
+        try:
+            record, _ = _decode(data, start, strings)
+        except (IndexError, struct.error, UnicodeDecodeError):
+            return
+        yield record
+
+
+def _encode(
+    value: Any, data: bytearray, strings: Dict[str, int], defined: Dict[str, int]
+) -> None:
+    # `bool` is checked before `int`, since it is one
+    if value is None:
+        data.append(_NONE)
+    elif value is True:
+        data.append(_TRUE)
+    elif value is False:
+        data.append(_FALSE)
+    elif isinstance(value, str):
+        _encode_string(value, data, strings, defined)
+    elif isinstance(value, int):
+        if -(2**63) <= value < 2**63:
+            data.append(_INT)
+            data += _INT64.pack(value)
+        else:
+            data.append(_BIG_INT)
+            _encode_bytes(str(value).encode("ascii"), data)
+    elif isinstance(value, float):
+        data.append(_FLOAT)
+        data += _DOUBLE.pack(value)
+    elif isinstance(value, (list, tuple)):
+        data.append(_LIST)
+        _encode_size(len(value), data)
+        for item in value:
+            _encode(item, data, strings, defined)
+    elif isinstance(value, dict):
+        data.append(_MAP)
+        _encode_size(len(value), data)
+        for key, item in value.items():
+            _encode(key, data, strings, defined)
+            _encode(item, data, strings, defined)
+    else:
+        raise TypeError(
+            f"Object of type {type(value).__name__} cannot be written to a binary segment."
+        )
+
+
+def _encode_string(
+    value: str, data: bytearray, strings: Dict[str, int], defined: Dict[str, int]
+) -> None:
+    if len(value) > _MAX_INTERNED_LENGTH:
+        data.append(_STRING)
+        _encode_bytes(value.encode("utf-8"), data)
+        return
+
+    index = strings.get(value)
+    if index is None:
+        index = defined.get(value)
+    if index is not None:
+        data.append(_REFERENCE)
+        _encode_size(index, data)
+        return
+
+    defined[value] = len(strings) + len(defined)
+    if _HEX.fullmatch(value):
+        data.append(_DEFINE_HEX)
+        _encode_bytes(bytes.fromhex(value), data)
+    else:
+        data.append(_DEFINE)
+        _encode_bytes(value.encode("utf-8"), data)
+
+
+def _encode_bytes(value: bytes, data: bytearray) -> None:
+    _encode_size(len(value), data)
+    data += value
+
+
+def _encode_size(size: int, data: bytearray) -> None:
+    # Sizes and indexes are stored 7 bits at a time, lowest first, with the
+    # top bit of each byte set if more follow
+    while size >= 0x80:
+        data.append((size & 0x7F) | 0x80)
+        size >>= 7
+    data.append(size)
+
+
+def _decode(data: bytes, offset: int, strings: List[str]) -> Tuple[Any, int]:
+    # Tags are checked roughly from most to least common
+    tag = data[offset]
+    offset += 1
+    if tag == _REFERENCE:
+        index, offset = _decode_size(data, offset)
+        return strings[index], offset
+    if tag == _MAP:
+        size, offset = _decode_size(data, offset)
+        mapping = {}
+        for _ in range(size):
+            key, offset = _decode(data, offset, strings)
+            mapping[key], offset = _decode(data, offset, strings)
+        return mapping, offset
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, offset)[0], offset + _DOUBLE.size
+    if tag == _INT:
+        return _INT64.unpack_from(data, offset)[0], offset + _INT64.size
+    if tag == _LIST:
+        size, offset = _decode_size(data, offset)
+        items = []
+        for _ in range(size):
+            item, offset = _decode(data, offset, strings)
+            items.append(item)
+        return items, offset
+    if tag == _STRING or tag == _DEFINE or tag == _DEFINE_HEX or tag == _BIG_INT:
+        size, offset = _decode_size(data, offset)
+        end = offset + size
+        if end > len(data):
+            raise IndexError("Binary segment ends within a value.")
+        value = data[offset:end]
+        if tag == _STRING:
+            return value.decode("utf-8"), end
+        if tag == _BIG_INT:
+            return int(value), end
+        strings.append(value.hex() if tag == _DEFINE_HEX else value.decode("utf-8"))
+        return strings[-1], end
+    if tag == _NONE:
+        return None, offset
+    if tag == _TRUE:
+        return True, offset
+    if tag == _FALSE:
+        return False, offset
+    raise IndexError(f"Unknown tag {tag} in binary segment.")
+
+
+def _decode_size(data: bytes, offset: int) -> Tuple[int, int]:
+    size = data[offset]
+    offset += 1
+    if size < 0x80:
+        return size, offset
+
+    size &= 0x7F
+    shift = 7
+    while True:
+        byte = data[offset]
+        offset += 1
+        size |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return size, offset
+        shift += 7
@@ -1,102 +1,372 @@
-from typing import Dict, List, Any, Tuple
+from typing import Callable, Dict, Iterator, List, Any, Set, Tuple, Self
 
 import asyncio
+import concurrent.futures
+import functools
+import gzip
 import json
+import lzma
+import mmap
 import os
+import re
+import time
+from contextlib import contextmanager
+from enum import Enum
 
-from bramble.backends.base import BrambleWriter, BrambleReader
-from bramble.logs import LogEntry, BranchData
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from bramble.backends import binary_format
+from bramble.backends.base import BrambleWriter, BrambleReader, WriteBatch
+from bramble.logs import (
+    LogEntry,
+    BranchData,
+    BranchSummary,
+    BranchStatus,
+    BranchCreation,
+)
+
+# Each partition is stored as a snapshot, holding the state of its branches,
+# and segments, holding the records appended since that snapshot was taken.
+# Segment ids are zero padded hex timestamps, so that they sort by age.
+_SNAPSHOT_FORMAT = "bramble_logging_storage_partition_{}.jsonl"
+_SEGMENT_FORMAT = "bramble_logging_storage_partition_{}.{}.jsonl"
+_BINARY_SEGMENT_FORMAT = "bramble_logging_storage_partition_{}.{}.bin"
+# Each snapshot has an index, describing its branches without their messages
+_INDEX_FORMAT = "bramble_logging_storage_partition_{}.index.json"
+_FILE_PATTERN = re.compile(
+    r"^bramble_logging_storage_partition_(\d+)(?:\.([0-9a-f]{16}))?"
+    r"\.(?:jsonl(?:\.(?:gz|xz|zst))?|bin)$"
+)
+# The final snapshot of a sealed partition may be compressed, and is then
+# stored with the suffix of its codec
+_COMPRESSION_SUFFIXES = {"gzip": ".gz", "lzma": ".xz", "zstd": ".zst"}
+
+
+class FsyncPolicy(Enum):
+    """When a `FileWriter` forces what it has written onto the disk."""
+
+    NEVER = "never"
+    FLUSH = "flush"
+
+    @classmethod
+    def from_string(cls, input: str) -> Self | None:
+        try:
+            return cls(input.lower().strip())
+        except:
+            raise ValueError(f"'{input}' is not a valid FsyncPolicy!")
 
 
 class FileWriter(BrambleWriter):
+    """Writes `bramble` logs to a directory of files.
+
+    Branches are spread over partitions, each holding up to
+    `num_flows_per_partition` branches. New branches are assigned to one of
+    `num_concurrent_writes` open partitions, by their ID, and a full
+    partition is replaced by a new one. Every flush appends a record of what
+    changed to the current segment of each partition it touched, so the cost
+    of a write only depends on the new data. Once a segment grows past
+    `max_segment_bytes`, it is sealed, and merged into the snapshot of its
+    partition on a background thread.
+
+    The writer only remembers which partition each branch of an open
+    partition belongs to. A partition is sealed once it is full, and nothing
+    has been written to it for `seal_after` seconds: it is merged into its
+    final snapshot, and forgotten. If more than `max_open_flows` branches are
+    held in open partitions, the least recently written partitions are sealed
+    early. Anything logged to a branch after its partition was sealed is
+    written to a new partition, and merged back in by `FileReader`.
+
+    Partitions also stop receiving new branches once `max_partition_bytes`
+    have been written to them, or `max_partition_age` seconds after they were
+    opened, so that their files stay a similar size. With `compression` set
+    to `"gzip"`, `"lzma"` or `"zstd"`, the final snapshot of a sealed
+    partition is compressed. `FileReader` decompresses them as it reads.
+
+    Each time a partition is compacted, an index of its snapshot is written
+    next to it, which `FileReader` opens instead of the snapshot itself.
+
+    With `file_format="binary"`, segments are written in the compact format
+    of `bramble.backends.binary_format` instead of JSON lines. Snapshots are
+    always JSON, and `FileReader` reads segments of either format.
+
+    Records are serialized and appended on a pool of `max_write_threads`
+    threads, so that the partitions touched by a flush are written in
+    parallel, without blocking the event loop. Compactions run on the same
+    pool.
+
+    A writer opened on a directory which already holds logs writes to new
+    partitions, numbered after those on disk, and leaves the others as they
+    are.
+
+    Files are never rewritten in place: segments are only appended to, and a
+    new snapshot replaces the old one with a single rename, so readers never
+    see a truncated file. `fsync` decides how much may be lost if the machine
+    crashes. With `"never"`, the operating system writes files back whenever
+    it chooses. With `"flush"`, every flush is on disk before the write
+    returns. With a number of seconds, files are synced at most that often,
+    so that only the last interval can be lost. Unless `fsync` is `"never"`,
+    snapshots are also synced before the segments they replace are removed.
+    """
+
     _partition: Dict[str, int]
-    _data: Dict[int, Dict[str, Any]]
+    _partition_branches: Dict[int, List[str]]
+    _last_written: Dict[int, float]
     _open_partitions: List[int]
-    _file_format: str = "bramble_logging_storage_partition_{}.jsonl"
+    _pending: Dict[int, List[Tuple[str, str, Any]]]
+    _segments: Dict[int, str]
+    _segment_bytes: Dict[int, int]
+    _sealed: Dict[int, str]
+    _compactions: Dict[int, Tuple[concurrent.futures.Future, str]]
+    _partition_bytes: Dict[int, int]
+    _opened_at: Dict[int, float]
+    _final: Set[int]
+    _string_tables: Dict[int, Dict[str, int]]
 
     def __init__(
         self,
         base_path: str,
         num_flows_per_partition: int = 1000,
         num_concurrent_writes: int = 16,
+        max_segment_bytes: int = 4 * 1024 * 1024,
+        seal_after: float = 60.0,
+        max_open_flows: int = 100_000,
+        max_write_threads: int = 4,
+        fsync: FsyncPolicy | str | float = FsyncPolicy.NEVER,
+        max_partition_bytes: int | None = None,
+        max_partition_age: float | None = None,
+        compression: str | None = None,
+        file_format: str = "json",
     ):
+        if not isinstance(max_segment_bytes, int) or max_segment_bytes <= 0:
+            raise ValueError(
+                f"`max_segment_bytes` must be a positive `int`, received {max_segment_bytes!r}."
+            )
+        if not isinstance(seal_after, (int, float)) or seal_after < 0:
+            raise ValueError(
+                f"`seal_after` must be a non-negative number, received {seal_after!r}."
+            )
+        if not isinstance(max_open_flows, int) or max_open_flows <= 0:
+            raise ValueError(
+                f"`max_open_flows` must be a positive `int`, received {max_open_flows!r}."
+            )
+        if not isinstance(max_write_threads, int) or max_write_threads <= 0:
+            raise ValueError(
+                f"`max_write_threads` must be a positive `int`, received {max_write_threads!r}."
+            )
+        if isinstance(fsync, str):
+            fsync = FsyncPolicy.from_string(fsync)
+        elif isinstance(fsync, bool) or not isinstance(
+            fsync, (FsyncPolicy, int, float)
+        ):
+            raise ValueError(
+                f"`fsync` must be of type `str`, `FsyncPolicy` or a number of seconds, received {type(fsync)}."
+            )
+        elif not isinstance(fsync, FsyncPolicy) and fsync <= 0:
+            raise ValueError(
+                f"`fsync` must be a positive number of seconds, received {fsync!r}."
+            )
+        if max_partition_bytes is not None and (
+            not isinstance(max_partition_bytes, int) or max_partition_bytes <= 0
+        ):
+            raise ValueError(
+                f"`max_partition_bytes` must be a positive `int` or `None`, received {max_partition_bytes!r}."
+            )
+        if max_partition_age is not None and (
+            not isinstance(max_partition_age, (int, float)) or max_partition_age <= 0
+        ):
+            raise ValueError(
+                f"`max_partition_age` must be a positive number or `None`, received {max_partition_age!r}."
+            )
+        if compression is not None and compression not in _COMPRESSION_SUFFIXES:
+            raise ValueError(
+                f"`compression` must be one of {list(_COMPRESSION_SUFFIXES)} or `None`, received {compression!r}."
+            )
+        if file_format not in ("json", "binary"):
+            raise ValueError(
+                f"`file_format` must be one of ['json', 'binary'], received {file_format!r}."
+            )
+        if compression == "zstd" and zstandard is None:
+            raise ImportError(
+                "To compress with zstd, please install the zstd extras. (e.g. `pip install bramble[zstd]`)"
+            )
+
         self.base_path = base_path
         self.num_flows_per_partition = num_flows_per_partition
-        self._open_partitions = list(range(num_concurrent_writes))
-        self._next_partition = num_concurrent_writes
-        self._partition = {}
-        self._data = {}
-        for partition in self._open_partitions:
-            self._create_partition(partition)
+        self.max_segment_bytes = max_segment_bytes
+        self.seal_after = seal_after
+        self.max_open_flows = max_open_flows
+        self.max_write_threads = max_write_threads
+        self.max_partition_bytes = max_partition_bytes
+        self.max_partition_age = max_partition_age
+        self.compression = compression
+        self.file_format = file_format
+        self._string_tables = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_write_threads,
+            thread_name_prefix="bramble-file-writer",
+        )
+        self._write_lock = asyncio.Lock()
+        self.fsync = fsync
+        self._unsynced: Set[str] = set()
+        self._last_fsync = time.monotonic()
         os.makedirs(base_path, exist_ok=True)
+        # Partitions left in the directory by an earlier writer are never
+        # written to again, so that their snapshots stay as they are
+        first_partition = max(_list_partitions(base_path), default=-1) + 1
+        self._open_partitions = list(
+            range(first_partition, first_partition + num_concurrent_writes)
+        )
+        self._opened_at = dict.fromkeys(self._open_partitions, time.monotonic())
+        self._partition_bytes = {}
+        self._final = set()
+        self._next_partition = first_partition + num_concurrent_writes
+        self._partition = {}
+        self._partition_branches = {}
+        self._last_written = {}
+        self._pending = {}
+        self._segments = {}
+        self._segment_bytes = {}
+        self._last_segment_id = 0
+        self._sealed = {}
+        self._compactions = {}
+
+    async def async_write_batch(self, batch: WriteBatch) -> None:
+        # New branches go first, so that later updates in the same batch are
+        # applied on top of them. Each partition is then appended to once.
+        await self._write_pending(
+            (self._record_created, batch.created),
+            (self._record_entries, batch.entries),
+            (self._record_extend_tree, batch.relationships),
+            (self._record_metadata, batch.metadata),
+            (self._record_tags, batch.tags),
+            (self._record_lifecycle, batch.lifecycle),
+        )
+
+    async def async_create_branches(self, branches: Dict[str, BranchCreation]) -> None:
+        await self._write_pending((self._record_created, branches))
 
-    # TODO: wait until the end of these operations to update the appropriate partitions
     async def async_append_entries(
         self,
         entries: Dict[str, List[LogEntry]],
     ) -> None:
-        async def _write_logs(id: str, logs: List[LogEntry]):
-            partition = self._select_partition(id)
-            logs = [
+        await self._write_pending((self._record_entries, entries))
+
+    async def async_add_tags(self, tags: Dict[str, List[str]]) -> None:
+        await self._write_pending((self._record_tags, tags))
+
+    async def async_update_tree(
+        self, relationships: Dict[str, Tuple[str | None, List[str]]]
+    ) -> None:
+        await self._write_pending((self._record_update_tree, relationships))
+
+    async def async_extend_tree(
+        self, relationships: Dict[str, Tuple[str | None, List[str]]]
+    ) -> None:
+        await self._write_pending((self._record_extend_tree, relationships))
+
+    async def async_update_branch_metadata(
+        self, metadata: Dict[str, Dict[str, str | int | float | bool]]
+    ) -> None:
+        await self._write_pending((self._record_metadata, metadata))
+
+    async def async_update_lifecycle(
+        self, lifecycle: Dict[str, Dict[str, float | str]]
+    ) -> None:
+        await self._write_pending((self._record_lifecycle, lifecycle))
+
+    async def async_compact(self) -> None:
+        """Merges every segment written so far into the snapshots.
+
+        Compaction happens in the background as segments fill up, so calling
+        this is never required. It is useful to leave a directory of logs with
+        as few files as possible, for example once logging has finished.
+        """
+        await self._write_pending()
+        for partition in list(self._segments):
+            self._seal(partition)
+        while self._compactions or self._sealed:
+            self._start_compactions()
+            await asyncio.gather(
+                *(
+                    asyncio.wrap_future(compaction)
+                    for compaction, _ in self._compactions.values()
+                ),
+                return_exceptions=True,
+            )
+
+    # Each `_record` function turns an update into records, which are
+    # serialized and appended to the segments of their partitions by
+    # `_write_pending`
+
+    def _record(self, branch_id: str, kind: str, payload: Any) -> None:
+        partition = self._select_partition(branch_id)
+        if partition not in self._pending:
+            self._pending[partition] = []
+        self._pending[partition].append((kind, branch_id, payload))
+
+    def _record_created(self, branches: Dict[str, BranchCreation]) -> None:
+        for id, branch in branches.items():
+            self._record(
+                id,
+                "create",
                 {
+                    "parent": branch.parent,
+                    "tags": branch.tags,
+                    "metadata": branch.metadata,
+                    "start": branch.start,
+                },
+            )
+            # The parent may live in another partition
+            if branch.parent is not None:
+                self._record(branch.parent, "extend_tree", [None, [id]])
+
+    def _record_entries(self, entries: Dict[str, List[LogEntry]]) -> None:
+        # Entries shared by several branches only need to be converted once
+        serialized: Dict[int, Dict[str, Any]] = {}
+
+        def _serialize(entry: LogEntry) -> Dict[str, Any]:
+            entry_dict = serialized.get(id(entry))
+            if entry_dict is None:
+                entry_dict = {
                     "message": entry.message,
                     "timestamp": entry.timestamp,
                     "message_type": entry.message_type.value,
                     "entry_metadata": entry.entry_metadata,
                 }
-                for entry in logs
-            ]
+                serialized[id(entry)] = entry_dict
+            return entry_dict
 
-            self._data[partition][id]["messages"].extend(logs)
-            await self._update_partition(partition)
+        for branch_id, logs in entries.items():
+            self._record(branch_id, "entries", [_serialize(entry) for entry in logs])
 
-        tasks = []
-        for id, logs in entries.items():
-            tasks.append(_write_logs(id, logs))
-
-        await asyncio.gather(*tasks)
-
-    async def async_add_tags(self, tags: Dict[str, List[str]]) -> None:
-        async def _write_tags(id: str, tags: List[str]):
-            partition = self._select_partition(id)
-            self._data[partition][id]["tags"].extend(tags)
-            await self._update_partition(partition)
-
-        tasks = []
-        for id, branch_tags in tags.items():
-            tasks.append(_write_tags(id, branch_tags))
-
-        await asyncio.gather(*tasks)
-
-    async def async_update_tree(
+    def _record_update_tree(
         self, relationships: Dict[str, Tuple[str | None, List[str]]]
     ) -> None:
-        async def _write_tree(id: str, parent: str | None, children: List[str]):
-            partition = self._select_partition(id)
-            self._data[partition][id]["metadata"].update(
-                {"parent": parent, "children": children}
-            )
-            await self._update_partition(partition)
-
-        tasks = []
         for id, (parent, children) in relationships.items():
-            tasks.append(_write_tree(id, parent, children))
+            self._record(id, "update_tree", [parent, list(children)])
 
-        await asyncio.gather(*tasks)
+    def _record_extend_tree(
+        self, relationships: Dict[str, Tuple[str | None, List[str]]]
+    ) -> None:
+        for id, (parent, children) in relationships.items():
+            self._record(id, "extend_tree", [parent, children])
 
-    async def async_update_branch_metadata(
+    def _record_metadata(
         self, metadata: Dict[str, Dict[str, str | int | float | bool]]
     ) -> None:
-        async def _write_meta(id: str, meta: Dict[str, Any]):
-            partition = self._select_partition(id)
-            self._data[partition][id]["metadata"].update(meta)
-            await self._update_partition(partition)
-
-        tasks = []
         for id, meta in metadata.items():
-            tasks.append(_write_meta(id, meta))
+            self._record(id, "metadata", meta)
 
-        await asyncio.gather(*tasks)
+    def _record_tags(self, tags: Dict[str, List[str]]) -> None:
+        for id, branch_tags in tags.items():
+            self._record(id, "tags", branch_tags)
+
+    def _record_lifecycle(self, lifecycle: Dict[str, Dict[str, float | str]]) -> None:
+        for id, fields in lifecycle.items():
+            self._record(id, "lifecycle", fields)
 
     def _select_partition(self, logger_id: str) -> int:
         if logger_id in self._partition:
@@ -106,102 +376,1012 @@ class FileWriter(BrambleWriter):
             self._open_partitions
         )
         partition = self._open_partitions[open_partition_index]
-        if partition not in self._data:
-            self._create_partition(partition)
-        if logger_id not in self._data[partition]:
-            self._data[partition][logger_id] = {
-                "messages": [],
-                "metadata": {},
-                "tags": [],
-            }
         self._partition[logger_id] = partition
+        if partition not in self._partition_branches:
+            self._partition_branches[partition] = []
+        self._partition_branches[partition].append(logger_id)
 
-        if len(self._data[partition]) >= self.num_flows_per_partition:
-            self._open_partitions.remove(partition)
-            self._open_partitions.append(self._next_partition)
-            self._next_partition += 1
+        if len(self._partition_branches[partition]) >= self.num_flows_per_partition:
+            self._replace_open_partition(partition)
 
         return partition
 
-    def _create_partition(self, partition: int):
-        self._data[partition] = {}
+    def _replace_open_partition(self, partition: int) -> None:
+        self._open_partitions.remove(partition)
+        del self._opened_at[partition]
+        self._open_partitions.append(self._next_partition)
+        self._opened_at[self._next_partition] = time.monotonic()
+        self._next_partition += 1
+
+    def _rotate_open_partitions(self) -> None:
+        # Branches which are already in a rotated partition keep writing to
+        # it, but new branches go to its replacement
+        opened_before = None
+        if self.max_partition_age is not None:
+            opened_before = time.monotonic() - self.max_partition_age
+        for partition in list(self._open_partitions):
+            if (
+                self.max_partition_bytes is not None
+                and self._partition_bytes.get(partition, 0) >= self.max_partition_bytes
+            ) or (
+                opened_before is not None and self._opened_at[partition] < opened_before
+            ):
+                self._replace_open_partition(partition)
+
+    async def _write_pending(self, *updates: Tuple[Callable[[Any], None], Any]):
+        # Flushes are appended one after another, so that the records of a
+        # partition stay in order. Updates are recorded under the same lock,
+        # since choosing a partition for a branch must not interleave with
+        # another flush sealing that partition.
+        async with self._write_lock:
+            for record, update in updates:
+                record(update)
+
+            # However many updates touched a partition, its records are
+            # appended to its segment with a single write
+            pending, self._pending = self._pending, {}
+            partitions = sorted(pending)
+            segment_format = _SEGMENT_FORMAT
+            if self.file_format == "binary":
+                segment_format = _BINARY_SEGMENT_FORMAT
+            segment_paths = []
+            appends = []
+            loop = asyncio.get_running_loop()
+            for partition in partitions:
+                if partition not in self._segments:
+                    self._segments[partition] = self._new_segment_id()
+                    self._segment_bytes[partition] = 0
+                    self._string_tables[partition] = {}
+                path = os.path.join(
+                    self.base_path,
+                    segment_format.format(partition, self._segments[partition]),
+                )
+                segment_paths.append(path)
+
+                if self.file_format == "binary":
+                    append = functools.partial(
+                        _append_binary_records,
+                        path,
+                        pending[partition],
+                        self._string_tables[partition],
+                    )
+                else:
+                    append = functools.partial(
+                        _append_records, path, pending[partition]
+                    )
+                appends.append(loop.run_in_executor(self._executor, append))
+
+            written = await asyncio.gather(*appends)
+
+            self._unsynced.update(segment_paths)
+            if self._fsync_due():
+                await self._fsync_unsynced()
+
+            for partition, num_bytes in zip(partitions, written):
+                self._segment_bytes[partition] += num_bytes
+                self._partition_bytes[partition] = (
+                    self._partition_bytes.get(partition, 0) + num_bytes
+                )
+                if self._segment_bytes[partition] >= self.max_segment_bytes:
+                    self._seal(partition)
+
+                # Moved to the end, so that partitions stay ordered by last write
+                self._last_written.pop(partition, None)
+                self._last_written[partition] = time.monotonic()
+
+            self._rotate_open_partitions()
+            self._seal_partitions()
+            self._start_compactions()
+
+    def _fsync_due(self) -> bool:
+        if self.fsync == FsyncPolicy.NEVER or not self._unsynced:
+            return False
+        if self.fsync == FsyncPolicy.FLUSH:
+            return True
+        return time.monotonic() - self._last_fsync >= self.fsync
+
+    async def _fsync_unsynced(self) -> None:
+        # New segments are only durable once the directory listing them is.
+        # Segments which have since been compacted away are on disk in their
+        # snapshot.
+        paths, self._unsynced = self._unsynced, set()
+        paths.add(self.base_path)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _fsync, path) for path in paths)
+        )
+        self._last_fsync = time.monotonic()
+
+    def _seal_partitions(self) -> None:
+        quiet_before = time.monotonic() - self.seal_after
+        for partition, last_written in list(self._last_written.items()):
+            if last_written > quiet_before:
+                break
+            if partition not in self._open_partitions:
+                self._seal_partition(partition)
+
+        open_flows = len(self._partition)
+        for partition in list(self._last_written):
+            if open_flows <= self.max_open_flows:
+                break
+            open_flows -= len(self._partition_branches[partition])
+            self._seal_partition(partition)
+
+    def _seal_partition(self, partition: int) -> None:
+        # The partition is merged into its final snapshot, and everything the
+        # writer knows about it is forgotten
+        if partition in self._segments:
+            self._seal(partition)
+        if partition in self._open_partitions:
+            self._replace_open_partition(partition)
+        for branch_id in self._partition_branches.pop(partition):
+            del self._partition[branch_id]
+        del self._last_written[partition]
+        self._partition_bytes.pop(partition, None)
+
+        # Even if all of its segments were already merged, the snapshot of
+        # the partition is written once more, compressed
+        if self.compression is not None:
+            self._final.add(partition)
+            self._sealed.setdefault(partition, "")
+
+    def _new_segment_id(self) -> str:
+        # Strictly increasing, even within a single clock tick, and later
+        # than the segments of any earlier run
+        self._last_segment_id = max(self._last_segment_id + 1, time.time_ns())
+        return f"{self._last_segment_id:016x}"
+
+    def _seal(self, partition: int) -> None:
+        # Nothing more is appended to a sealed segment, so that it can be
+        # merged into the snapshot while later records go to a new segment.
+        # Only the latest sealed segment is kept, since compaction merges
+        # every segment up to it.
+        self._sealed[partition] = self._segments.pop(partition)
+        del self._segment_bytes[partition]
+        del self._string_tables[partition]
+
+    def _start_compactions(self) -> None:
+        # Compactions run on the thread pool rather than on the event loop, and
+        # are only looked at from here. The loop of one `TreeLogger` may end
+        # while they run, and a later call, such as `async_compact`, may come
+        # from another loop.
+        for partition, (compaction, through) in list(self._compactions.items()):
+            if compaction.done():
+                self._finish_compaction(partition, through, compaction)
+
+        for partition in list(self._sealed):
+            if partition in self._compactions:
+                continue
+
+            through = self._sealed.pop(partition)
+            # Compactions share the pool of appends, so that the writer never
+            # uses more than `max_write_threads` threads
+            compaction = self._executor.submit(
+                _compact_partition,
+                self.base_path,
+                partition,
+                through,
+                self.fsync != FsyncPolicy.NEVER,
+                self.compression if partition in self._final else None,
+            )
+            self._compactions[partition] = (compaction, through)
+
+    def _finish_compaction(
+        self, partition: int, through: str, compaction: concurrent.futures.Future
+    ) -> None:
+        del self._compactions[partition]
+        # Segments are read until they have been merged, so a compaction which
+        # failed is simply tried again later
+        if compaction.cancelled() or compaction.exception() is not None:
+            self._sealed[partition] = max(self._sealed.get(partition, ""), through)
+        elif partition not in self._sealed:
+            self._final.discard(partition)
+
+
+def _append_records(path: str, records: List[Tuple[str, str, Any]]) -> int:
+    """Serializes records, and appends them to a segment with a single write.
+
+    Returns the number of bytes written.
+    """
+    data = "".join(json.dumps(record) + "\n" for record in records)
+    with open(path, "a") as f:
+        f.write(data)
+    # `json.dumps` only produces ASCII, so characters are bytes
+    return len(data)
+
+
+def _append_binary_records(
+    path: str, records: List[Tuple[str, str, Any]], strings: Dict[str, int]
+) -> int:
+    """Encodes records, and appends them to a binary segment.
+
+    Returns the number of bytes written.
+    """
+    data = binary_format.encode_records(records, strings)
+    with open(path, "ab") as f:
+        f.write(data)
+    return len(data)
+
+
+def _fsync(path: str) -> None:
+    """Forces a file, or the listing of a directory, onto the disk."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _new_branch_data() -> Dict[str, Any]:
+    return {
+        "messages": [],
+        "metadata": {"parent": None, "children": []},
+        "tags": [],
+        "lifecycle": {},
+    }
+
+
+def _add_tags(existing: List[str], tags: List[str]) -> None:
+    existing.extend(tag for tag in dict.fromkeys(tags) if tag not in existing)
+
+
+def _open_snapshot(path: str, mode: str, compression: str | None):
+    encoding = "utf-8" if "t" in mode else None
+    match compression:
+        case None:
+            return open(path, mode, encoding=encoding)
+        case "gzip":
+            return gzip.open(path, mode, encoding=encoding)
+        case "lzma":
+            return lzma.open(path, mode, encoding=encoding)
+        case "zstd":
+            if zstandard is None:
+                raise ImportError(
+                    "To read zstd compressed logs, please install the zstd extras. (e.g. `pip install bramble[zstd]`)"
+                )
+            return zstandard.open(path, mode, encoding=encoding)
+
+
+def _snapshot_paths(path: str) -> Iterator[Tuple[str, str | None]]:
+    """Lists the possible files of a snapshot, and their compression."""
+    yield path, None
+    for compression, suffix in _COMPRESSION_SUFFIXES.items():
+        yield path + suffix, compression
 
-    async def _update_partition(self, partition: int):
-        # TODO: we should be able to do this async, but for some reason that breaks things
-        file_path = os.path.join(self.base_path, self._file_format.format(partition))
-        data_to_write = self._data[partition]
-        data_to_write = json.dumps(data_to_write)
-        with open(file_path, "w") as f:
-            f.write(data_to_write)
+
+def _find_snapshot(path: str) -> Tuple[str | None, str | None]:
+    """Finds the file of a snapshot, and its compression.
+
+    Writing a snapshot removes the others of its partition, but a crash, or a
+    writer which stopped in between, may leave two. The one which merged the
+    most segments is the newest. On a tie, the compressed one is preferred,
+    since it is only written once its partition is sealed.
+    """
+    found = [
+        (snapshot_path, compression)
+        for snapshot_path, compression in _snapshot_paths(path)
+        if os.path.exists(snapshot_path)
+    ]
+    if not found:
+        return None, None
+    if len(found) == 1:
+        return found[0]
+
+    def _compacted_through(snapshot: Tuple[str, str | None]) -> Tuple[str, bool]:
+        snapshot_path, compression = snapshot
+        try:
+            compacted_through = _read_snapshot_header(snapshot_path, compression)
+        except (OSError, EOFError, ValueError, lzma.LZMAError):
+            compacted_through = None
+        return compacted_through or "", compression is not None
+
+    return max(found, key=_compacted_through)
+
+
+def _read_snapshot(path: str) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """Reads a snapshot, and the id of the last segment merged into it."""
+    snapshot_path, compression = _find_snapshot(path)
+    if snapshot_path is None:
+        return {}, ""
+
+    # Compressed snapshots are decompressed as they are parsed, and others
+    # are mapped into memory, so that the whole text is never held at once
+    if compression is None:
+        snapshot = _map_file(snapshot_path)
+    else:
+        snapshot = _open_snapshot(snapshot_path, "rb", compression)
+    with snapshot as f:
+        lines = _mapped_lines(f) if compression is None else iter(f)
+        first_line = next(lines, b"")
+        try:
+            header = json.loads(first_line)
+        except ValueError:
+            header = None
+        if header is not None and set(header.keys()) == {"compacted_through"}:
+            branches = {}
+            for line in lines:
+                branch_id, branch_data = json.loads(line)
+                branches[branch_id] = branch_data
+            return branches, header["compacted_through"]
+
+        # Snapshots written before indexes existed are a single document
+        if header is None:
+            header = json.loads(first_line + b"".join(lines))
+        data = header
+
+    # Snapshots written before segments existed are a plain dict of branches
+    if set(data.keys()) == {"compacted_through", "branches"}:
+        return data["branches"], data["compacted_through"]
+    return data, ""
+
+
+def _read_snapshot_header(snapshot_path: str, compression: str | None) -> str | None:
+    """Reads the id of the last segment merged into a snapshot with an index."""
+    with _open_snapshot(snapshot_path, "rt", compression) as f:
+        header = json.loads(f.readline())
+    return header.get("compacted_through") if len(header) == 1 else None
+
+
+def _write_snapshot(
+    path: str,
+    index_path: str,
+    branches: Dict[str, Dict[str, Any]],
+    compacted_through: str,
+    compression: str | None,
+    fsync: bool,
+) -> None:
+    """Writes a snapshot, with each branch on its own line, and its index.
+
+    The index holds everything but the messages of each branch, along with
+    the number of messages, the time they span, and where the line of the
+    branch is in the snapshot, once decompressed. Both files are replaced
+    with a rename, the snapshot first, so that an index is only ever newer
+    than its snapshot if it was written for it.
+    """
+    header = json.dumps({"compacted_through": compacted_through}) + "\n"
+    offset = len(header)
+    index_branches = {}
+    with _open_snapshot(path + ".tmp", "wt", compression) as f:
+        f.write(header)
+        for branch_id, branch_data in branches.items():
+            # `json.dumps` only produces ASCII, so characters are bytes
+            line = json.dumps([branch_id, branch_data]) + "\n"
+            f.write(line)
+
+            timestamps = [message["timestamp"] for message in branch_data["messages"]]
+            index_branches[branch_id] = {
+                "metadata": branch_data["metadata"],
+                "tags": branch_data["tags"],
+                "lifecycle": branch_data.get("lifecycle", {}),
+                "num_entries": len(timestamps),
+                "first_timestamp": min(timestamps, default=None),
+                "last_timestamp": max(timestamps, default=None),
+                "offset": offset,
+                "length": len(line),
+            }
+            offset += len(line)
+
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(
+            {
+                "snapshot": os.path.basename(path),
+                "compacted_through": compacted_through,
+                "branches": index_branches,
+            },
+            f,
+        )
+
+    if fsync:
+        _fsync(path + ".tmp")
+        _fsync(index_path + ".tmp")
+    os.replace(path + ".tmp", path)
+    os.replace(index_path + ".tmp", index_path)
+
+
+def _segment_path(base_path: str, partition: int, segment_id: str) -> str:
+    binary_path = os.path.join(
+        base_path, _BINARY_SEGMENT_FORMAT.format(partition, segment_id)
+    )
+    if os.path.exists(binary_path):
+        return binary_path
+    return os.path.join(base_path, _SEGMENT_FORMAT.format(partition, segment_id))
+
+
+@contextmanager
+def _map_file(path: str) -> Iterator[mmap.mmap | bytes]:
+    """Maps a file into memory, read only.
+
+    Pages of the file are read as they are touched, and are shared with any
+    other process reading the same file, through the page cache. Empty files
+    cannot be mapped, and are given as empty bytes.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _read_segment(path: str) -> Iterator[Tuple[str, str, Any]]:
+    with _map_file(path) as mapped:
+        if path.endswith(".bin"):
+            yield from binary_format.decode_records(mapped)
+            return
+
+        for line in _mapped_lines(mapped):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A write which was cut short leaves a partial last line
+                continue
+
+
+def _mapped_lines(mapped: mmap.mmap | bytes) -> Iterator[bytes]:
+    # Only one line at a time is copied out of the mapping
+    start = 0
+    while start < len(mapped):
+        end = mapped.find(b"\n", start)
+        end = len(mapped) if end == -1 else end + 1
+        yield mapped[start:end]
+        start = end
+
+
+def _replay_segment(branches: Dict[str, Dict[str, Any]], path: str) -> None:
+    for kind, branch_id, payload in _read_segment(path):
+        if branch_id not in branches:
+            branches[branch_id] = _new_branch_data()
+        branch_data = branches[branch_id]
+
+        match kind:
+            case "create":
+                branch_data["metadata"].update(payload["metadata"])
+                branch_data["metadata"]["parent"] = payload["parent"]
+                _add_tags(branch_data["tags"], payload["tags"])
+                branch_data["lifecycle"]["start"] = payload["start"]
+            case "entries":
+                branch_data["messages"].extend(payload)
+            case "extend_tree":
+                parent, children = payload
+                if parent is not None:
+                    branch_data["metadata"]["parent"] = parent
+                branch_data["metadata"]["children"].extend(children)
+            case "update_tree":
+                parent, children = payload
+                branch_data["metadata"]["parent"] = parent
+                branch_data["metadata"]["children"] = children
+            case "metadata":
+                branch_data["metadata"].update(payload)
+            case "tags":
+                _add_tags(branch_data["tags"], payload)
+            case "lifecycle":
+                branch_data["lifecycle"].update(payload)
+
+
+def _list_partitions(base_path: str) -> Dict[int, List[str]]:
+    """Finds the partitions in a directory, and the ids of their segments."""
+    partitions: Dict[int, List[str]] = {}
+    for file_name in os.listdir(base_path):
+        match = _FILE_PATTERN.match(file_name)
+        if match is None:
+            continue
+
+        partition, segment_id = int(match.group(1)), match.group(2)
+        if partition not in partitions:
+            partitions[partition] = []
+        if segment_id is not None:
+            partitions[partition].append(segment_id)
+
+    for segment_ids in partitions.values():
+        segment_ids.sort()
+    return partitions
+
+
+def _read_partition(
+    base_path: str, partition: int, segment_ids: List[str]
+) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """Reads the snapshot of a partition, and replays its segments on top.
+
+    Returns the branches, and the id of the last segment which they include.
+    Segments which were already merged into the snapshot are skipped.
+    """
+    branches, compacted_through = _read_snapshot(
+        os.path.join(base_path, _SNAPSHOT_FORMAT.format(partition))
+    )
+    for segment_id in segment_ids:
+        if segment_id <= compacted_through:
+            continue
+        try:
+            _replay_segment(branches, _segment_path(base_path, partition, segment_id))
+        except FileNotFoundError:
+            # The segment was merged into a snapshot newer than the one read
+            # above, and removed, so the partition is read again from there
+            segment_ids = _list_partitions(base_path).get(partition, [])
+            return _read_partition(base_path, partition, segment_ids)
+        compacted_through = segment_id
+
+    return branches, compacted_through
+
+
+def _compact_partition(
+    base_path: str,
+    partition: int,
+    through: str,
+    fsync: bool = False,
+    compression: str | None = None,
+) -> None:
+    """Merges the segments of a partition, up to `through`, into its snapshot.
+
+    The new snapshot replaces the old one with a single rename, and records
+    the last segment it includes. Readers skip merged segments from then on,
+    so it does not matter if they are still there when read. With `fsync`,
+    the snapshot and its rename are on disk before any segment is removed.
+    With `compression`, the snapshot is compressed. Snapshots of the
+    partition in any other format are removed once it is written.
+    """
+    segment_ids = [
+        segment_id
+        for segment_id in _list_partitions(base_path).get(partition, [])
+        if segment_id <= through
+    ]
+    branches, compacted_through = _read_partition(base_path, partition, segment_ids)
+
+    uncompressed_path = os.path.join(base_path, _SNAPSHOT_FORMAT.format(partition))
+    snapshot_path = uncompressed_path
+    if compression is not None:
+        snapshot_path += _COMPRESSION_SUFFIXES[compression]
+
+    _write_snapshot(
+        snapshot_path,
+        os.path.join(base_path, _INDEX_FORMAT.format(partition)),
+        branches,
+        compacted_through,
+        compression,
+        fsync,
+    )
+    if fsync:
+        _fsync(base_path)
+    for other_path, _ in _snapshot_paths(uncompressed_path):
+        if other_path != snapshot_path and os.path.exists(other_path):
+            os.remove(other_path)
+
+    for segment_id in segment_ids:
+        os.remove(_segment_path(base_path, partition, segment_id))
+
+
+def _merge_branch_data(into: Dict[str, Any], other: Dict[str, Any]) -> None:
+    """Adds the data of a branch from a later partition to its earlier data."""
+    metadata = dict(other["metadata"])
+    parent = metadata.pop("parent", None)
+    children = metadata.pop("children", [])
+
+    into["metadata"].update(metadata)
+    if parent is not None:
+        into["metadata"]["parent"] = parent
+    into["metadata"].setdefault("children", []).extend(children)
+    into["messages"].extend(other["messages"])
+    _add_tags(into["tags"], other["tags"])
+    into.setdefault("lifecycle", {}).update(other.get("lifecycle", {}))
+
+
+def _to_branch_data(
+    branch_id: str,
+    flow_data: Dict[str, Any],
+    messages: List[LogEntry] | None = None,
+) -> BranchData | None:
+    # Records for a branch whose creation was never written, for example
+    # after a crash, do not describe a whole branch
+    if "name" not in flow_data["metadata"]:
+        return None
+
+    if messages is None:
+        messages = [LogEntry(**entry) for entry in flow_data["messages"]]
+    return BranchData(
+        children=flow_data["metadata"]["children"],
+        messages=messages,
+        **_branch_fields(branch_id, flow_data),
+    )
+
+
+def _to_branch_summary(branch_id: str, flow_data: Dict[str, Any]) -> BranchSummary:
+    # The index of a snapshot records how many messages each branch has in
+    # it, and the time they span, so messages left there are not read
+    num_entries = 0
+    timestamps = []
+    for message in flow_data["messages"]:
+        if isinstance(message, _SnapshotSlice):
+            num_entries += message.num_entries
+            timestamps.extend([message.first_timestamp, message.last_timestamp])
+        else:
+            num_entries += 1
+            timestamps.append(message["timestamp"])
+
+    return BranchSummary(
+        num_entries=num_entries,
+        first_timestamp=min(timestamps, default=None),
+        last_timestamp=max(timestamps, default=None),
+        **_branch_fields(branch_id, flow_data),
+    )
+
+
+def _branch_fields(branch_id: str, flow_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields shared by `BranchData` and `BranchSummary`."""
+    metadata = {
+        key: value
+        for key, value in flow_data["metadata"].items()
+        if key not in ["parent", "children", "name"]
+    }
+    # Files written before lifecycle events existed do not have them
+    lifecycle = flow_data.get("lifecycle", {})
+    status = lifecycle.get("status")
+    return {
+        "id": branch_id,
+        "name": flow_data["metadata"]["name"],
+        "parent": flow_data["metadata"]["parent"],
+        "metadata": metadata,
+        "tags": flow_data["tags"],
+        "start": lifecycle.get("start"),
+        "end": lifecycle.get("end"),
+        "duration": lifecycle.get("duration"),
+        "status": BranchStatus(status) if status is not None else None,
+    }
+
+
+class _SnapshotSlice:
+    """Where the messages of a branch are, in a snapshot with an index."""
+
+    __slots__ = (
+        "branch_id",
+        "path",
+        "compression",
+        "offset",
+        "length",
+        "num_entries",
+        "first_timestamp",
+        "last_timestamp",
+    )
+
+    def __init__(
+        self,
+        branch_id: str,
+        path: str,
+        compression: str | None,
+        offset: int,
+        length: int,
+        num_entries: int,
+        first_timestamp: float,
+        last_timestamp: float,
+    ):
+        self.branch_id = branch_id
+        self.path = path
+        self.compression = compression
+        self.offset = offset
+        self.length = length
+        self.num_entries = num_entries
+        self.first_timestamp = first_timestamp
+        self.last_timestamp = last_timestamp
+
+
+class _StaleIndex(Exception):
+    """A snapshot was replaced after its index was read."""
+
+
+def _read_indexed_partition(
+    base_path: str, partition: int, segment_ids: List[str]
+) -> Dict[str, Dict[str, Any]] | None:
+    """Reads a partition from the index of its snapshot, and its segments.
+
+    The messages of the snapshot are left where they are, as a
+    `_SnapshotSlice` in the messages of each branch, followed by those of
+    the segments. Returns None if the snapshot has no index, or the index is
+    out of date.
+    """
+    snapshot_path, compression = _find_snapshot(
+        os.path.join(base_path, _SNAPSHOT_FORMAT.format(partition))
+    )
+    index_path = os.path.join(base_path, _INDEX_FORMAT.format(partition))
+    if snapshot_path is None or not os.path.exists(index_path):
+        return None
+
+    with open(index_path, "r") as f:
+        index = json.load(f)
+    compacted_through = index["compacted_through"]
+    if index["snapshot"] != os.path.basename(snapshot_path):
+        return None
+    if compacted_through != _read_snapshot_header(snapshot_path, compression):
+        return None
+
+    branches = {}
+    for branch_id, entry in index["branches"].items():
+        messages = []
+        if entry["num_entries"] > 0:
+            messages.append(
+                _SnapshotSlice(
+                    branch_id,
+                    snapshot_path,
+                    compression,
+                    entry["offset"],
+                    entry["length"],
+                    entry["num_entries"],
+                    entry["first_timestamp"],
+                    entry["last_timestamp"],
+                )
+            )
+        branches[branch_id] = {
+            "messages": messages,
+            "metadata": entry["metadata"],
+            "tags": entry["tags"],
+            "lifecycle": entry["lifecycle"],
+        }
+
+    # Segments which are not merged yet are small, and read in full
+    for segment_id in segment_ids:
+        if segment_id <= compacted_through:
+            continue
+        try:
+            _replay_segment(branches, _segment_path(base_path, partition, segment_id))
+        except FileNotFoundError:
+            segment_ids = _list_partitions(base_path).get(partition, [])
+            return _read_indexed_partition(base_path, partition, segment_ids)
+    return branches
+
+
+def _load_slices(slices: List[_SnapshotSlice]) -> Dict[int, List[Dict[str, Any]]]:
+    """Reads the messages of slices, by `id` of the slice.
+
+    Each snapshot is opened once. Uncompressed snapshots are mapped into
+    memory, so that only the lines of the slices are read and decoded.
+    Compressed snapshots are read from start to end, which keeps seeking
+    cheap.
+    """
+    by_path: Dict[str, List[_SnapshotSlice]] = {}
+    for snapshot_slice in slices:
+        if snapshot_slice.path not in by_path:
+            by_path[snapshot_slice.path] = []
+        by_path[snapshot_slice.path].append(snapshot_slice)
+
+    messages = {}
+    for path, path_slices in by_path.items():
+        path_slices.sort(key=lambda snapshot_slice: snapshot_slice.offset)
+        try:
+            if path_slices[0].compression is None:
+                snapshot = _map_file(path)
+            else:
+                snapshot = _open_snapshot(path, "rb", path_slices[0].compression)
+            with snapshot as f:
+                for snapshot_slice in path_slices:
+                    messages[id(snapshot_slice)] = _read_slice(f, snapshot_slice)
+        except FileNotFoundError:
+            raise _StaleIndex(path)
+    return messages
+
+
+def _read_slice(snapshot, snapshot_slice: _SnapshotSlice) -> List[Dict[str, Any]]:
+    start, end = snapshot_slice.offset, snapshot_slice.offset + snapshot_slice.length
+    if isinstance(snapshot, (mmap.mmap, bytes)):
+        line = snapshot[start:end]
+    else:
+        snapshot.seek(start)
+        line = snapshot.read(end - start)
+
+    # The snapshot may have been replaced since its index was read
+    try:
+        branch_id, branch_data = json.loads(line)
+    except ValueError:
+        raise _StaleIndex(snapshot_slice.path)
+    if branch_id != snapshot_slice.branch_id:
+        raise _StaleIndex(snapshot_slice.path)
+    return branch_data["messages"]
+
+
+def _load_partition_data(
+    base_path: str, partition: int, segment_ids: List[str]
+) -> Dict[str, Dict[str, Any]] | None:
+    """Reads a partition for `FileReader`, or None if it no longer exists."""
+    try:
+        data = _read_indexed_partition(base_path, partition, segment_ids)
+        if data is None:
+            data, _ = _read_partition(base_path, partition, segment_ids)
+        return data
+    except FileNotFoundError:
+        # A snapshot, or the index of one, was replaced by a compaction while
+        # it was being read, so the partition is listed and read again
+        segment_ids = _list_partitions(base_path).get(partition)
+        if segment_ids is None:
+            return None
+        return _load_partition_data(base_path, partition, segment_ids)
+
+
+def _load_messages(
+    message_lists: List[List[Dict[str, Any] | _SnapshotSlice]],
+) -> List[List[Tuple[str, float, str, Dict[str, Any] | None]]]:
+    """Loads the messages of branches, including those left in snapshots.
+
+    Messages are given as tuples of the fields of `LogEntry`, which are much
+    cheaper to send back from a worker process than `LogEntry` itself.
+    """
+    loaded = _load_slices(
+        [
+            message
+            for messages in message_lists
+            for message in messages
+            if isinstance(message, _SnapshotSlice)
+        ]
+    )
+
+    def _entries(messages):
+        for message in messages:
+            if isinstance(message, _SnapshotSlice):
+                yield from loaded[id(message)]
+            else:
+                yield message
+
+    return [
+        [
+            (
+                entry["message"],
+                entry["timestamp"],
+                entry["message_type"],
+                entry.get("entry_metadata"),
+            )
+            for entry in _entries(messages)
+        ]
+        for messages in message_lists
+    ]
 
 
 class FileReader(BrambleReader):
-    _data: Dict[str, BranchData]
+    """Reads `bramble` logs from a directory written by `FileWriter`.
+
+    Partitions are opened from the indexes of their snapshots, so only the
+    branches, and not their messages, are read when the reader is created.
+    The messages of a branch are read when `get_branches` asks for it, and
+    are not kept. `get_branch_summaries` reads no messages at all, since the
+    index records how many each branch has. Partitions without an index,
+    such as those written by older versions, are read in full.
+
+    Reading and decoding is CPU bound. With `num_workers` above one,
+    partitions are read, and the branches asked for by `get_branches` are
+    built, on a pool of that many processes. The pool is started when it is
+    first needed, and kept until `close` is called, or the reader is garbage
+    collected.
+    """
+
+    _branches: Dict[str, Dict[str, Any]]
     _with_tags: Dict[str, List[str]]
+    _pool: concurrent.futures.ProcessPoolExecutor | None
+
+    def __init__(self, base_path: str, num_workers: int = 1):
+        if not isinstance(num_workers, int) or num_workers <= 0:
+            raise ValueError(
+                f"`num_workers` must be a positive `int`, received {num_workers!r}."
+            )
 
-    def __init__(self, base_path: str):
         self.base_path = base_path
+        self.num_workers = num_workers
+        self._pool = None
         self.load_data()
 
+    def close(self) -> None:
+        """Stops the worker processes of the reader, if any were started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __del__(self):
+        pool = getattr(self, "_pool", None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(self.num_workers)
+        return self._pool
+
     def load_data(self):
-        self._data = {}
+        self._branches = {}
         self._with_tags = {}
-        for file_name in os.listdir(self.base_path):
-            file_path = os.path.join(self.base_path, file_name)
-            try:
-                data = self.load_partition(file_path)
-                for logger_id, flow_log in data.items():
-                    self._data[logger_id] = flow_log
-                    for tag in flow_log.tags:
-                        if tag not in self._with_tags:
-                            self._with_tags[tag] = []
-                        self._with_tags[tag].append(logger_id)
-            except Exception as e:
-                pass
-
-    def load_partition(self, partition_path: str) -> Dict[str, BranchData]:
-        with open(partition_path, "r") as f:
-            data = f.read()
-            data = json.loads(data)
+
+        partitions = sorted(_list_partitions(self.base_path).items())
+        base_paths = [self.base_path] * len(partitions)
+        partition_ids = [partition for partition, _ in partitions]
+        segment_ids = [segment_ids for _, segment_ids in partitions]
+        if self.num_workers > 1 and len(partitions) > 1:
+            chunksize = max(1, len(partitions) // (self.num_workers * 4))
+            partition_data = list(
+                self._get_pool().map(
+                    _load_partition_data,
+                    base_paths,
+                    partition_ids,
+                    segment_ids,
+                    chunksize=chunksize,
+                )
+            )
+        else:
+            partition_data = list(
+                map(_load_partition_data, base_paths, partition_ids, segment_ids)
+            )
+
+        # A branch which was written to after its partition was sealed
+        # continues in a later partition, so partitions are merged in order
+        flows: Dict[str, Dict[str, Any]] = {}
+        for data in partition_data:
+            if data is None:
+                continue
+            for logger_id, flow_data in data.items():
+                if logger_id in flows:
+                    _merge_branch_data(flows[logger_id], flow_data)
+                else:
+                    flows[logger_id] = flow_data
+
+        for logger_id, flow_data in flows.items():
+            # Records for a branch whose creation was never written, for
+            # example after a crash, do not describe a whole branch
+            if "name" not in flow_data["metadata"]:
+                continue
+
+            self._branches[logger_id] = flow_data
+            for tag in flow_data["tags"]:
+                if tag not in self._with_tags:
+                    self._with_tags[tag] = []
+                self._with_tags[tag].append(logger_id)
+
+    def load_partition(
+        self, partition: int, segment_ids: List[str]
+    ) -> Dict[str, BranchData]:
+        data, _ = _read_partition(self.base_path, partition, segment_ids)
 
         # Now convert the data to TreeLog objects
         flow_logs = {}
         for logger_id, flow_data in data.items():
-            messages = [LogEntry(**entry) for entry in flow_data["messages"]]
-            metadata = {
-                key: value
-                for key, value in flow_data["metadata"].items()
-                if key not in ["parent", "children", "name"]
-            }
-            flow_logs[logger_id] = BranchData(
-                id=logger_id,
-                name=flow_data["metadata"]["name"],
-                parent=flow_data["metadata"]["parent"],
-                children=flow_data["metadata"]["children"],
-                messages=messages,
-                metadata=metadata,
-                tags=flow_data["tags"],
-            )
+            flow_log = _to_branch_data(logger_id, flow_data)
+            if flow_log is not None:
+                flow_logs[logger_id] = flow_log
 
         return flow_logs
 
     def get_branches(self, branch_ids: List[str]) -> Dict[str, BranchData]:
-        data = {}
-        for branch_id in branch_ids:
-            data[branch_id] = self._data[branch_id]
-        return data
-
-    def get_branch_ids(self) -> List[str]:
-        return list(self._data.keys())
+        try:
+            return self._get_branches(branch_ids)
+        except _StaleIndex:
+            # A snapshot was compacted again since it was read
+            self.load_data()
+            return self._get_branches(branch_ids)
 
+    def _get_branches(self, branch_ids: List[str]) -> Dict[str, BranchData]:
+        flows = [self._branches[branch_id] for branch_id in branch_ids]
+        message_lists = [flow_data["messages"] for flow_data in flows]
+        if self.num_workers == 1 or len(flows) < 2 * self.num_workers:
+            loaded = _load_messages(message_lists)
+        else:
+            # `get_branch_ids` lists branches in partition order, so
+            # neighbouring branches mostly share snapshots, and each chunk
+            # opens only a few of them
+            chunk_size = -(-len(flows) // (self.num_workers * 4))
+            chunks = [
+                message_lists[start : start + chunk_size]
+                for start in range(0, len(flows), chunk_size)
+            ]
+            loaded = [
+                messages
+                for chunk in self._get_pool().map(_load_messages, chunks)
+                for messages in chunk
+            ]
 
-if __name__ == "__main__":
-    path = "test"
-    reader = FileReader(path)
+        data = {}
+        for branch_id, flow_data, entries in zip(branch_ids, flows, loaded):
+            messages = [LogEntry(*entry) for entry in entries]
+            data[branch_id] = _to_branch_data(branch_id, flow_data, messages)
+        return data
 
-    async def main():
-        flow_log_ids = await reader.async_get_branch_ids()
-        data = await reader.async_get_branches(flow_log_ids)
-        print(data)
+    def get_branch_summaries(self, branch_ids: List[str]) -> Dict[str, BranchSummary]:
+        return {
+            branch_id: _to_branch_summary(branch_id, self._branches[branch_id])
+            for branch_id in branch_ids
+        }
 
-    asyncio.run(main())
+    def get_branch_ids(self) -> List[str]:
+        return list(self._branches.keys())
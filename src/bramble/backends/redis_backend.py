@@ -1,75 +1,191 @@
-from typing import Dict, List, Self
+from typing import Any, Dict, Iterable, List, Self
 
 from redis import asyncio as aioredis
+import collections
 import msgpack
-
-from bramble.backends.base import BrambleWriter, BrambleReader
-from bramble.logs import LogEntry, BranchData, MessageType
+import uuid
+
+from bramble.backends.base import BrambleWriter, BrambleReader, WriteBatch
+from bramble.logs import (
+    LogEntry,
+    BranchData,
+    BranchSummary,
+    BranchStatus,
+    BranchCreation,
+    MessageType,
+)
 
 REDIS_PREFIX = "bramble:logging:"
 
 
+def _pack_entry(log: LogEntry) -> bytes:
+    return msgpack.packb(
+        (
+            log.timestamp,
+            log.message,
+            log.message_type.value,
+            log.entry_metadata,
+        )
+    )
+
+
+def _branch_fields(id, tags, metadata, fields, parent, lifecycle) -> Dict[str, Any]:
+    """The fields shared by `BranchData` and `BranchSummary`, as stored."""
+    # Branches written before metadata was stored by key have a single packed
+    # dict instead
+    metadata = msgpack.loads(metadata) if metadata is not None else {}
+    metadata.update(
+        {key.decode(): msgpack.loads(value) for key, value in fields.items()}
+    )
+    lifecycle = {key.decode(): value.decode() for key, value in lifecycle.items()}
+    status = lifecycle.get("status")
+    return {
+        "id": id,
+        "name": metadata["name"],
+        "parent": parent.decode() if parent is not None else None,
+        "tags": list({tag.decode() for tag in tags}),
+        "metadata": metadata,
+        "start": float(lifecycle["start"]) if "start" in lifecycle else None,
+        "end": float(lifecycle["end"]) if "end" in lifecycle else None,
+        "duration": (float(lifecycle["duration"]) if "duration" in lifecycle else None),
+        "status": BranchStatus(status) if status is not None else None,
+    }
+
+
 class RedisWriter(BrambleWriter):
     redis_connection: aioredis.Redis
 
     def __init__(self, redis_connection: aioredis.Redis):
         self.redis_connection = redis_connection
 
-    async def async_append_entries(self, entries: Dict[str, List[LogEntry]]):
+    async def async_write_batch(self, batch: WriteBatch):
+        # The whole batch is sent in a single round trip. New branches go
+        # first, so that later updates in the same batch are applied on top.
         pipe = self.redis_connection.pipeline()
+        self._queue_created(pipe, batch.created)
+        self._queue_entries(pipe, batch.entries)
+        self._queue_extend_tree(pipe, batch.relationships)
+        self._queue_metadata(pipe, batch.metadata)
+        self._queue_tags(pipe, batch.tags)
+        self._queue_lifecycle(pipe, batch.lifecycle)
+        await pipe.execute()
 
-        def _update_pipe(id: str, logs: List[LogEntry]):
-            packed_logs: List[bytes] = [
-                msgpack.packb(
-                    (
-                        log.timestamp,
-                        log.message,
-                        log.message_type.value,
-                        log.entry_metadata,
-                    )
-                )
-                for log in logs
-            ]
-            pipe.rpush(REDIS_PREFIX + id + ":logs", *packed_logs)
-
-        for id, logs in entries.items():
-            _update_pipe(id, logs)
+    async def async_create_branches(self, branches: Dict[str, BranchCreation]):
+        pipe = self.redis_connection.pipeline()
+        self._queue_created(pipe, branches)
+        await pipe.execute()
 
+    async def async_append_entries(self, entries: Dict[str, List[LogEntry]]):
+        pipe = self.redis_connection.pipeline()
+        self._queue_entries(pipe, entries)
         await pipe.execute()
 
     async def async_add_tags(self, tags: Dict[str, List[str]]):
         pipe = self.redis_connection.pipeline()
+        self._queue_tags(pipe, tags)
+        await pipe.execute()
 
-        for id, branch_tags in tags.items():
-            pipe.sadd(REDIS_PREFIX + id + ":tags", *branch_tags)
+    async def async_update_tree(self, relationships):
+        pipe = self.redis_connection.pipeline()
+        self._queue_update_tree(pipe, relationships)
+        await pipe.execute()
 
+    async def async_extend_tree(self, relationships):
+        pipe = self.redis_connection.pipeline()
+        self._queue_extend_tree(pipe, relationships)
         await pipe.execute()
 
-    async def async_update_tree(self, relationships):
+    async def async_update_branch_metadata(self, metadata):
         pipe = self.redis_connection.pipeline()
+        self._queue_metadata(pipe, metadata)
+        await pipe.execute()
 
-        def _update_pipe(id: str, parent: str, children: List[str]):
-            if parent:
+    async def async_update_lifecycle(self, lifecycle):
+        pipe = self.redis_connection.pipeline()
+        self._queue_lifecycle(pipe, lifecycle)
+        await pipe.execute()
+
+    # Each `_queue` function adds the commands for an update to a pipeline,
+    # without executing it
+
+    def _queue_created(self, pipe, branches: Dict[str, BranchCreation]):
+        for id, branch in branches.items():
+            self._queue_metadata(pipe, {id: branch.metadata})
+            if branch.parent is not None:
+                pipe.set(REDIS_PREFIX + id + ":parent", branch.parent)
+                pipe.sadd(REDIS_PREFIX + branch.parent + ":children", id)
+            if branch.tags:
+                pipe.sadd(REDIS_PREFIX + id + ":tags", *branch.tags)
+            pipe.hset(REDIS_PREFIX + id + ":lifecycle", "start", branch.start)
+
+    def _queue_entries(self, pipe, entries: Dict[str, List[LogEntry]]):
+        # An entry logged to several branches at once is the same object under
+        # each of them. Its payload is stored once, and the branch lists only
+        # hold the key of that payload.
+        occurrences = collections.Counter(
+            id(log) for logs in entries.values() for log in logs
+        )
+        shared_keys: Dict[int, bytes] = {}
+
+        def _pack(log: LogEntry) -> bytes:
+            if occurrences[id(log)] > 1:
+                if id(log) in shared_keys:
+                    return shared_keys[id(log)]
+                entry_key = uuid.uuid4().hex
+                pipe.set(REDIS_PREFIX + "entry:" + entry_key, _pack_entry(log))
+                shared_keys[id(log)] = msgpack.packb(entry_key)
+                return shared_keys[id(log)]
+            return _pack_entry(log)
+
+        for branch_id, logs in entries.items():
+            if not logs:
+                continue
+            packed_logs: List[bytes] = [_pack(log) for log in logs]
+            pipe.rpush(REDIS_PREFIX + branch_id + ":logs", *packed_logs)
+
+    def _queue_tags(self, pipe, tags: Dict[str, List[str]]):
+        for id, branch_tags in tags.items():
+            if not branch_tags:
+                continue
+            pipe.sadd(REDIS_PREFIX + id + ":tags", *branch_tags)
+
+    def _queue_update_tree(self, pipe, relationships):
+        # Unlike `_queue_extend_tree`, the stored relationships are replaced
+        for id, (parent, children) in relationships.items():
+            if parent is None:
+                pipe.delete(REDIS_PREFIX + id + ":parent")
+            else:
                 pipe.set(REDIS_PREFIX + id + ":parent", parent)
 
+            pipe.delete(REDIS_PREFIX + id + ":children")
             if len(children) > 0:
                 pipe.sadd(REDIS_PREFIX + id + ":children", *children)
 
+    def _queue_extend_tree(self, pipe, relationships):
         for id, (parent, children) in relationships.items():
-            _update_pipe(id, parent, children)
-
-        await pipe.execute()
-
-    async def async_update_branch_metadata(self, metadata):
-        pipe = self.redis_connection.pipeline()
+            if parent:
+                pipe.set(REDIS_PREFIX + id + ":parent", parent)
 
-        def _update_pipe(id: str, metadata: Dict[str, str | int | float | bool]):
-            pipe.set(REDIS_PREFIX + id + ":metadata", msgpack.packb(metadata))
+            if len(children) > 0:
+                pipe.sadd(REDIS_PREFIX + id + ":children", *children)
 
+    def _queue_metadata(self, pipe, metadata):
+        # Only the keys which changed are sent, so each key is stored as its own
+        # field, rather than overwriting the whole metadata of the branch. Redis
+        # rejects `HSET` without fields, so empty updates are skipped.
         for id, meta in metadata.items():
-            _update_pipe(id, meta)
+            if not meta:
+                continue
+            pipe.hset(
+                REDIS_PREFIX + id + ":meta",
+                mapping={key: msgpack.packb(value) for key, value in meta.items()},
+            )
 
-        await pipe.execute()
+    def _queue_lifecycle(self, pipe, lifecycle):
+        for id, fields in lifecycle.items():
+            if not fields:
+                continue
+            pipe.hset(REDIS_PREFIX + id + ":lifecycle", mapping=fields)
 
     @classmethod
     def from_socket(cls, host: str, port: str) -> Self:
@@ -101,22 +217,33 @@ class RedisReader(BrambleReader):
             pipe.lrange(REDIS_PREFIX + branch_id + ":logs", 0, -1)
             pipe.smembers(REDIS_PREFIX + branch_id + ":tags")
             pipe.get(REDIS_PREFIX + branch_id + ":metadata")
+            pipe.hgetall(REDIS_PREFIX + branch_id + ":meta")
             pipe.get(REDIS_PREFIX + branch_id + ":parent")
             pipe.smembers(REDIS_PREFIX + branch_id + ":children")
+            pipe.hgetall(REDIS_PREFIX + branch_id + ":lifecycle")
 
         output = await pipe.execute()
         branches = [
-            [branch_id] + output[i : i + 5]
-            for branch_id, i in zip(branch_ids, range(0, len(output), 5))
+            [branch_id] + output[i : i + 7]
+            for branch_id, i in zip(branch_ids, range(0, len(output), 7))
         ]
+
+        # Entries shared by several branches are stored once, and referenced
+        # by their key from each branch's list
+        unpacked_logs = {
+            id: [msgpack.loads(log) for log in logs] for id, logs, *_ in branches
+        }
+        shared = await self._load_shared(
+            log for logs in unpacked_logs.values() for log in logs
+        )
+
         formatted = []
-        for id, logs, tags, metadata, parent, children in branches:
-            metadata = msgpack.loads(metadata)
-            if parent is not None:
-                parent = parent.decode()
-            children = {child.decode() for child in children}
-            logs = [msgpack.loads(log) for log in logs]
-            tags = list({tag.decode() for tag in tags})
+        for id, _, tags, metadata, fields, parent, children, lifecycle in branches:
+            logs = [
+                shared[log] if isinstance(log, str) else log
+                for log in unpacked_logs[id]
+                if not isinstance(log, str) or log in shared
+            ]
             logs = [
                 LogEntry(
                     message=message,
@@ -128,17 +255,82 @@ class RedisReader(BrambleReader):
             ]
             formatted.append(
                 BranchData(
-                    id=id,
-                    name=metadata["name"],
-                    parent=parent,
-                    children=children,
+                    children={child.decode() for child in children},
                     messages=logs,
-                    tags=tags,
-                    metadata=metadata,
+                    **_branch_fields(id, tags, metadata, fields, parent, lifecycle),
                 )
             )
         return {data.id: data for data in formatted}
 
+    async def async_get_branch_summaries(
+        self, branch_ids: List[str]
+    ) -> Dict[str, BranchSummary]:
+        """Gets tree logger branches without their messages.
+
+        Entries are appended to a branch in the order they are logged, so only
+        the first and last entries of each branch are read, for the time they
+        span.
+
+        Args:
+            branch_ids (List[str]): The IDs of the tree logger branches.
+
+        Returns:
+            Dict[str, BranchSummary]: A dict of branch IDs to the corresponding
+                BranchSummary object.
+        """
+        pipe = self.redis_connection.pipeline()
+
+        for branch_id in branch_ids:
+            pipe.llen(REDIS_PREFIX + branch_id + ":logs")
+            pipe.lindex(REDIS_PREFIX + branch_id + ":logs", 0)
+            pipe.lindex(REDIS_PREFIX + branch_id + ":logs", -1)
+            pipe.smembers(REDIS_PREFIX + branch_id + ":tags")
+            pipe.get(REDIS_PREFIX + branch_id + ":metadata")
+            pipe.hgetall(REDIS_PREFIX + branch_id + ":meta")
+            pipe.get(REDIS_PREFIX + branch_id + ":parent")
+            pipe.hgetall(REDIS_PREFIX + branch_id + ":lifecycle")
+
+        output = await pipe.execute()
+        branches = [
+            [branch_id] + output[i : i + 8]
+            for branch_id, i in zip(branch_ids, range(0, len(output), 8))
+        ]
+
+        edges = {
+            id: [msgpack.loads(log) for log in (first, last) if log is not None]
+            for id, _, first, last, *_ in branches
+        }
+        shared = await self._load_shared(log for logs in edges.values() for log in logs)
+
+        summaries = {}
+        for id, num_entries, _, _, *fields in branches:
+            timestamps = [
+                (shared[log] if isinstance(log, str) else log)[0]
+                for log in edges[id]
+                if not isinstance(log, str) or log in shared
+            ]
+            summaries[id] = BranchSummary(
+                num_entries=num_entries,
+                first_timestamp=timestamps[0] if timestamps else None,
+                last_timestamp=timestamps[-1] if timestamps else None,
+                **_branch_fields(id, *fields),
+            )
+        return summaries
+
+    async def _load_shared(self, logs: Iterable[Any]) -> Dict[str, Any]:
+        """Loads the entries referenced by key from the lists of branches."""
+        shared_keys = list({log for log in logs if isinstance(log, str)})
+        if not shared_keys:
+            return {}
+        payloads = await self.redis_connection.mget(
+            [REDIS_PREFIX + "entry:" + key for key in shared_keys]
+        )
+        return {
+            key: msgpack.loads(payload)
+            for key, payload in zip(shared_keys, payloads)
+            if payload is not None
+        }
+
     async def async_get_branch_ids(self) -> List[str]:
         """Gets the IDs of all tree logger branches.
 
@@ -1,23 +1,24 @@
-from typing import Dict, List, ContextManager
+from typing import Dict, List, Tuple, Mapping, ContextManager
 
 from contextlib import contextmanager, nullcontext
 
 from bramble.utils import (
+    _capture_exception,
     _validate_log_call,
     _validate_tags_and_metadata,
 )
-from bramble.logs import MessageType
+from bramble.logs import MessageType, LazyMessage
 from bramble.loggers import (
     _CURRENT_BRANCH_IDS,
-    _LIVE_BRANCHES,
     _ENABLED,
     LogBranch,
+    TreeLogger,
     _LoggingContext,
 )
 
 
 def log(
-    message: str,
+    message: str | Exception | LazyMessage,
     message_type: MessageType | str = MessageType.USER,
     entry_metadata: Dict[str, str | int | float | bool] | None = None,
 ):
@@ -31,7 +32,9 @@ def log(
     you wish `log` to do anything.
 
     Args:
-        message (str): The message to log.
+        message (str | Exception | LazyMessage): The message to log.
+            Exceptions and `LazyMessage`s are formatted on the logging thread,
+            once the entry is flushed.
         message_type (MessageType | str, optional): The type of the message.
             Defaults to MessageType.USER. Generally, MessageType.SYSTEM is used
             for system messages internal to the logging system. If a string is
@@ -45,21 +48,78 @@ def log(
         not None, the keys of `entry_metadata` are not strings, or the values of
         `entry_metadata` are not `str`, `int`, `float`, or `bool`.
     """
-    # Ensure that we provide proper errors to the user's logging calls, even if
-    # there are currently no loggers in context.
+    current_branch_ids = _CURRENT_BRANCH_IDS.get()
+    if not current_branch_ids:
+        # Ensure that we provide proper errors to the user's logging calls, even
+        # if there are currently no loggers in context. Since nothing will be
+        # logged, there is no need to format the message.
+        _validate_log_call(
+            message=message,
+            message_type=message_type,
+            entry_metadata=entry_metadata,
+            format_message=False,
+        )
+        return
+
     message, message_type, entry_metadata = _validate_log_call(
         message=message,
         message_type=message_type,
         entry_metadata=entry_metadata,
     )
 
+    _log_to_branches(
+        current_branch_ids,
+        message=message,
+        message_type=message_type,
+        entry_metadata=entry_metadata,
+    )
+
+
+def _log_trusted(
+    message: str | Exception | LazyMessage,
+    message_type: MessageType,
+    entry_metadata: Dict[str, str | int | float | bool] | None = None,
+):
+    """Log a message to the active `bramble` branches, without validation.
+
+    For internal callers, such as the `@branch` wrapper and the standard
+    library logging bridge, which construct their own arguments and so know
+    them to be valid. Exceptions are still captured for formatting.
+    """
     current_branch_ids = _CURRENT_BRANCH_IDS.get()
-    if current_branch_ids is None:
+    if not current_branch_ids:
         return
 
-    for branch_id in current_branch_ids:
-        branch = _LIVE_BRANCHES[branch_id]
-        branch.log(
+    if isinstance(message, Exception):
+        message = _capture_exception(message)
+
+    _log_to_branches(
+        current_branch_ids,
+        message=message,
+        message_type=message_type,
+        entry_metadata=entry_metadata,
+    )
+
+
+def _log_to_branches(
+    branches: Mapping[str, LogBranch],
+    message: str | LazyMessage,
+    message_type: MessageType,
+    entry_metadata: Dict[str, str | int | float | bool] | None,
+):
+    # The message has been validated once for all branches, and each tree
+    # logger only needs to enqueue a single entry for all of its branches.
+    branch_ids_by_logger: Dict[TreeLogger, List[str]] = {}
+    for branch_id, branch in branches.items():
+        tree_logger = branch.tree_logger
+        if tree_logger in branch_ids_by_logger:
+            branch_ids_by_logger[tree_logger].append(branch_id)
+        else:
+            branch_ids_by_logger[tree_logger] = [branch_id]
+
+    for tree_logger, logger_branch_ids in branch_ids_by_logger.items():
+        tree_logger._log_validated(
+            tuple(logger_branch_ids),
             message=message,
             message_type=message_type,
             entry_metadata=entry_metadata,
@@ -156,13 +216,7 @@ def context(*args: List[LogBranch] | None) -> List[LogBranch]:
     """
     match len(args):
         case 0:
-            branches = []
-
-            current_branch_ids = _CURRENT_BRANCH_IDS.get()
-            for id in current_branch_ids:
-                branches.append(_LIVE_BRANCHES[id])
-
-            return branches
+            return list(_CURRENT_BRANCH_IDS.get().values())
         case 1:
             parameter = args[0]
             if isinstance(parameter, LogBranch):
@@ -203,9 +257,10 @@ def fork(
 
     Creates new branches of any branches in the current context, using the
     provided name, and then sets the current context to those new branches,
-    until the end of `fork`'s context. For use only as a context manager, if
-    fork is not used as a context, then it will have no effect, other than
-    creating new branches.
+    until the end of `fork`'s context. The new branches are closed when the
+    context ends, with an error status if it ended with an exception. For use
+    only as a context manager, if fork is not used as a context, then it will
+    have no effect, other than creating new branches.
 
     Args:
         name (str): The name of this new context / branch.
@@ -224,10 +279,37 @@ def fork(
     if len(current_context) == 0:
         return nullcontext()
 
-    next_context = [branch.branch(name) for branch in current_context]
-    _set_tags_and_metadata(branches=next_context, tags=tags, metadata=metadata)
+    # Shared by all of the new branches, and never modified
+    tags = tuple(tags) if tags else None
+    metadata = dict(metadata) if metadata else None
+    next_context = [
+        branch._branch_trusted(name, tags, metadata) for branch in current_context
+    ]
+
+    return _LoggingContext(next_context, close=True)
 
-    return context(next_context)
+
+def _fork_trusted(
+    name: str,
+    tags: Tuple[str, ...] | None,
+    metadata: Mapping[str, str | int | float | bool] | None,
+) -> ContextManager[None]:
+    """Forks the current `bramble` context, without any validation.
+
+    Used by `@branch`, which validates its name, tags and metadata once, when
+    decorating.
+    """
+    current_branch_ids = _CURRENT_BRANCH_IDS.get()
+    if not current_branch_ids:
+        return nullcontext()
+
+    return _LoggingContext(
+        [
+            branch._branch_trusted(name, tags, metadata)
+            for branch in current_branch_ids.values()
+        ],
+        close=True,
+    )
 
 
 @contextmanager
@@ -1,28 +1,207 @@
-from typing import Set, Dict, List
+from typing import Set, Dict, List, Tuple, Deque, Mapping, Callable, Self
 
+from enum import Enum
+import collections
 import contextvars
 import threading
-import datetime
+import functools
 import asyncio
-import queue
-import uuid
 import time
+import sys
+from types import MappingProxyType
 
-from bramble.utils import _validate_log_call
-from bramble.backends.base import BrambleWriter
+from bramble.utils import _validate_log_call, time_ordered_id
+from bramble.backends.base import BrambleWriter, WriteBatch
 from bramble.stdlib import hook_logging
 from bramble.logs import (
     MessageType,
+    BranchStatus,
+    BranchCreation,
     LogEntry,
+    LazyMessage,
 )
 
-_LIVE_BRANCHES: Dict[str, "LogBranch"] = {}
-_CURRENT_BRANCH_IDS: contextvars.ContextVar[Set[str]] = contextvars.ContextVar(
-    "_CURRENT_BRANCH_IDS", default=set()
+# The branches of the current context, keyed by their IDs. Since a context
+# holds on to its branches, they stay alive for as long as some context (for
+# example one copied into an asyncio task) can still log to them, and no longer.
+_CURRENT_BRANCH_IDS: contextvars.ContextVar[Mapping[str, "LogBranch"]] = (
+    contextvars.ContextVar("_CURRENT_BRANCH_IDS", default=MappingProxyType({}))
 )
 _ENABLED: contextvars.ContextVar[bool] = contextvars.ContextVar(
     "_ENABLED", default=True
 )
+# The logging thread looks for new tasks at least this far apart, even with a
+# shorter debounce, so that an idle logger does not spin
+_MIN_POLL_INTERVAL = 0.001
+# Branches only remember this many of their children, so that long lived
+# branches, such as the root, do not grow without bound. The backend is sent
+# every child.
+_MAX_REMEMBERED_CHILDREN = 1000
+
+
+class OverflowPolicy(Enum):
+    """What a `TreeLogger` does once its pending entry budget is used up."""
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NON_ERROR = "drop_non_error"
+
+    @classmethod
+    def from_string(cls, input: str) -> Self | None:
+        try:
+            return cls(input.lower().strip())
+        except:
+            raise ValueError(f"'{input}' is not a valid OverflowPolicy!")
+
+
+def _entry_size(entry: LogEntry) -> int:
+    # A rough estimate of the memory held by a pending entry. It only needs to
+    # be cheap and consistent, since it is computed both when an entry is
+    # accepted and when it is released.
+    size = 64 + sys.getsizeof(entry.message)
+    if entry.entry_metadata is not None:
+        size += sys.getsizeof(entry.entry_metadata)
+    return size
+
+
+class _PendingBudget:
+    """Tracks the log entries of a `TreeLogger` which are not yet flushed.
+
+    Entries are counted from the moment they are accepted by
+    `TreeLogger.log`, until the backend has finished writing them.
+
+    Only entries are counted. Tasks which describe the tree, such as new
+    branches, tags, metadata and lifecycle events, are never blocked or
+    dropped, since losing one would leave the tree inconsistent. They grow
+    by one task per call to `branch`, `add_tags`, `add_metadata` or `close`
+    while the backend is behind, and are merged per branch once collected.
+    """
+
+    __slots__ = (
+        "max_entries",
+        "max_bytes",
+        "policy",
+        "entries",
+        "bytes",
+        "stats",
+        "_dropped",
+        "_lock",
+        "_space",
+    )
+
+    def __init__(
+        self,
+        max_entries: int | None,
+        max_bytes: int | None,
+        policy: OverflowPolicy,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.entries = 0
+        self.bytes = 0
+        self.stats = {
+            "blocked": 0,
+            "dropped_system": 0,
+            "dropped_user": 0,
+            "dropped_error": 0,
+        }
+        self._dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+
+    def _exceeded(self, count: int, size: int) -> bool:
+        # A single entry is always let through, even if it is larger than the
+        # whole budget, since otherwise it could never be written.
+        if self.entries == 0:
+            return False
+        if self.max_entries is not None and self.entries + count > self.max_entries:
+            return True
+        if self.max_bytes is not None and self.bytes + size > self.max_bytes:
+            return True
+        return False
+
+    def _over(self) -> bool:
+        if self.max_entries is not None and self.entries > self.max_entries:
+            return True
+        if self.max_bytes is not None and self.bytes > self.max_bytes:
+            return True
+        return False
+
+    def _drop(self, branch_ids: Tuple[str, ...], message_type: MessageType) -> None:
+        for branch_id in branch_ids:
+            self._dropped[branch_id] = self._dropped.get(branch_id, 0) + 1
+        self.stats["dropped_" + message_type.value] += len(branch_ids)
+
+    def reserve(
+        self,
+        tree_logger: "TreeLogger",
+        branch_ids: Tuple[str, ...],
+        entry: LogEntry,
+    ) -> bool:
+        """Accounts for a new entry, applying the overflow policy if needed.
+
+        An entry which is shared by several branches counts once per branch,
+        the same as it is counted by the batches which flush it.
+
+        Returns:
+            bool: Whether the entry should be enqueued.
+        """
+        count = len(branch_ids)
+        size = _entry_size(entry) * count
+        with self._lock:
+            if self._exceeded(count, size):
+                # Make the logging thread look at the tasks right away,
+                # rather than at the end of its debounce window.
+                tree_logger._notify()
+
+                match self.policy:
+                    case OverflowPolicy.BLOCK:
+                        self.stats["blocked"] += 1
+                        while self._exceeded(count, size):
+                            # Nobody will make space if the logging thread is
+                            # not running, and it cannot wait on itself.
+                            if not tree_logger._writer_running() or (
+                                threading.current_thread()
+                                is tree_logger._logging_thread
+                            ):
+                                self._drop(branch_ids, entry.message_type)
+                                return False
+                            self._space.wait(timeout=0.1)
+                    case OverflowPolicy.DROP_NON_ERROR:
+                        if entry.message_type != MessageType.ERROR:
+                            self._drop(branch_ids, entry.message_type)
+                            return False
+                    case OverflowPolicy.DROP_OLDEST:
+                        # The logging thread trims the oldest unflushed entries
+                        # once it has taken this one from the task list.
+                        pass
+
+            self.entries += count
+            self.bytes += size
+            return True
+
+    def release(self, entries: int, bytes: int) -> None:
+        with self._lock:
+            self.entries -= entries
+            self.bytes -= bytes
+            self._space.notify_all()
+
+    def trim(self, pending: Deque["_Batch"]) -> None:
+        """Drops the oldest entries of unflushed batches until within budget."""
+        with self._lock:
+            for batch in pending:
+                while batch.entries > 0 and self._over():
+                    branch_id, entry = batch.pop_oldest()
+                    self.entries -= 1
+                    self.bytes -= _entry_size(entry)
+                    self._drop((branch_id,), entry.message_type)
+
+    def take_dropped(self) -> Dict[str, int]:
+        """Returns and resets the number of dropped entries for each branch."""
+        with self._lock:
+            dropped, self._dropped = self._dropped, {}
+            return dropped
 
 
 class TreeLogger:
@@ -31,6 +210,29 @@ class TreeLogger:
     A TreeLogger is a tree-like logger which can be used to log a flow of
     functions with many child functions. Will separate each branch into its own
     log.
+
+    Log tasks are written to the backend from a separate thread. The thread
+    collects tasks for `debounce` seconds, then starts flushing them in batches
+    of at most `batch_size` branches. Collection of the next batch continues
+    while earlier batches are still being written, with at most
+    `max_concurrent_flushes` flushes in flight at once. Batches start in the
+    order they were collected, and a batch which touches a branch that is
+    still being written waits for that flush, so the updates of each branch
+    always reach the backend in order.
+
+    By default, there is no limit on the number of entries which are waiting
+    to be written. If `max_pending_entries` or `max_pending_bytes` is set, the
+    `overflow_policy` decides what happens once that budget is used up: block
+    the logging caller until there is space, drop the oldest unflushed
+    entries, or drop new entries unless they are errors. Dropped entries are
+    counted in `overflow_stats`, and each affected branch receives a SYSTEM
+    entry with the number of entries it lost. The budget only covers log
+    entries: creating branches, and changing their tags, metadata or
+    lifecycle, is never blocked or dropped.
+
+    Branch IDs are created by `id_generator`. The default,
+    `bramble.time_ordered_id`, creates IDs which sort by creation time, so
+    that backends and readers can order branches by their ID alone.
     """
 
     root: "LogBranch"
@@ -44,6 +246,11 @@ class TreeLogger:
         debounce: float = 0.25,
         batch_size: int = 50,
         silent: bool = False,
+        max_concurrent_flushes: int = 1,
+        max_pending_entries: int | None = None,
+        max_pending_bytes: int | None = None,
+        overflow_policy: OverflowPolicy | str = OverflowPolicy.BLOCK,
+        id_generator: Callable[[], str] = time_ordered_id,
     ):
         if not isinstance(logging_backend, BrambleWriter):
             raise ValueError(
@@ -53,138 +260,159 @@ class TreeLogger:
         if not isinstance(name, str):
             raise ValueError(f"`name` must be of type `str`, received {type(name)}.")
 
+        if not isinstance(max_concurrent_flushes, int) or max_concurrent_flushes < 1:
+            raise ValueError(
+                f"`max_concurrent_flushes` must be a positive `int`, received {max_concurrent_flushes}."
+            )
+
+        for parameter_name, value in [
+            ("max_pending_entries", max_pending_entries),
+            ("max_pending_bytes", max_pending_bytes),
+        ]:
+            if value is not None and (not isinstance(value, int) or value < 1):
+                raise ValueError(
+                    f"`{parameter_name}` must be `None` or a positive `int`, received {value}."
+                )
+
+        if isinstance(overflow_policy, str):
+            overflow_policy = OverflowPolicy.from_string(overflow_policy)
+        elif not isinstance(overflow_policy, OverflowPolicy):
+            raise ValueError(
+                f"`overflow_policy` must be of type `str` or `OverflowPolicy`, received {type(overflow_policy)}."
+            )
+
+        if not callable(id_generator):
+            raise ValueError(
+                f"`id_generator` must be callable, received {type(id_generator)}."
+            )
+
         self.logging_backend = logging_backend
         self.silent = silent
+        self._new_id = id_generator
+
+        self._budget = None
+        if max_pending_entries is not None or max_pending_bytes is not None:
+            self._budget = _PendingBudget(
+                max_entries=max_pending_entries,
+                max_bytes=max_pending_bytes,
+                policy=overflow_policy,
+            )
 
-        self._tasks = queue.SimpleQueue()
+        # Producers append their tasks to a single list, which the logging
+        # thread takes in whole chunks. Appending to a list is atomic, and
+        # keeps tasks in the order they were made across threads, so
+        # `_enqueue` is the `append` of the list itself, with no lock and no
+        # Python call. Producers never signal the logging thread, which looks
+        # at the list once every debounce window instead.
+        self._tasks: List[tuple] = []
+        self._enqueue = self._tasks.append
+        self._closing = False
         self._debounce = debounce
         self._batch_size = batch_size
+        self._max_concurrent_flushes = max_concurrent_flushes
+
+        # Set by the logging thread once its event loop is running
+        self._logging_thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._wakeup_context = contextvars.Context()
 
         self.root = LogBranch(name=name, tree_logger=self)
         hook_logging()
 
     def run(self):
         async def _run():
-            log_tasks, tree_tasks, meta_tasks, tag_tasks = (
-                None,
-                None,
-                None,
-                None,
-            )
-
-            deadline = None
-
-            def get_batch_size():
-                return max(
-                    [0]
-                    + [
-                        len(item)
-                        for item in [log_tasks, tree_tasks, meta_tasks, tag_tasks]
-                        if item is not None
-                    ]
-                )
-
-            while True:
-                if deadline:
-                    try:
-                        task = self._tasks.get(timeout=deadline - time.time())
-                    except queue.Empty:
-                        task = ()
-                else:
-                    task = self._tasks.get()
-                    deadline = time.time() + self._debounce
-
-                if task is not None and len(task) > 0:
-                    task_type = task[0]
-                    match task_type:
-                        case 0:
-                            _, branch_id, log_entry = task
-
-                            if not log_tasks:
-                                log_tasks = {}
-
-                            if not branch_id in log_tasks:
-                                log_tasks[branch_id] = []
-
-                            log_tasks[branch_id].append(log_entry)
-                        case 1:
-                            _, branch_id, parent, children = task
-
-                            if not tree_tasks:
-                                tree_tasks = {}
-
-                            tree_tasks[branch_id] = (parent, list(set(children)))
-                        case 2:
-                            _, branch_id, metadata = task
-
-                            if not meta_tasks:
-                                meta_tasks = {}
-
-                            if not branch_id in meta_tasks:
-                                meta_tasks[branch_id] = {}
-
-                            meta_tasks[branch_id].update(metadata)
-                        case 3:
-                            _, branch_id, tags = task
-
-                            if not tag_tasks:
-                                tag_tasks = {}
-
-                            if not branch_id in tag_tasks:
-                                tag_tasks[branch_id] = []
-
-                            task_tags = set(tag_tasks[branch_id])
-                            task_tags.update(tags)
-                            tag_tasks[branch_id] = list(task_tags)
-
-                if (
-                    time.time() > deadline
-                    or get_batch_size() >= self._batch_size
-                    or task is None
-                ):
-                    todo = []
-
-                    if log_tasks:
-                        todo.append(
-                            self.logging_backend.async_append_entries(
-                                entries=log_tasks,
-                            )
-                        )
-
-                    if tree_tasks:
-                        todo.append(
-                            self.logging_backend.async_update_tree(
-                                relationships=tree_tasks,
-                            )
-                        )
-
-                    if meta_tasks:
-                        todo.append(
-                            self.logging_backend.async_update_branch_metadata(
-                                metadata=meta_tasks,
-                            )
-                        )
-
-                    if tag_tasks:
-                        todo.append(
-                            self.logging_backend.async_add_tags(
-                                tags=tag_tasks,
-                            )
-                        )
-
-                    await asyncio.gather(*todo)
-
-                    log_tasks, tree_tasks, meta_tasks, tag_tasks = (
-                        None,
-                        None,
-                        None,
-                        None,
+            loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._loop = loop
+
+            budget = self._budget
+            measure = budget is not None
+
+            # Batches which are ready, but waiting for a free flush slot
+            pending: Deque[_Batch] = collections.deque()
+            # The branches which each flush in flight is writing
+            in_flight: Dict[asyncio.Task, Set[str]] = {}
+            errors: List[BaseException] = []
+
+            def _on_flushed(flush_task: asyncio.Task, batch: _Batch):
+                del in_flight[flush_task]
+                if budget is not None:
+                    budget.release(batch.entries, batch.bytes)
+                if not flush_task.cancelled() and flush_task.exception():
+                    errors.append(flush_task.exception())
+                dispatch()
+
+            def dispatch():
+                # At most `max_concurrent_flushes` batches are written at once.
+                # New tasks keep accumulating in the task list meanwhile.
+                while pending and len(in_flight) < self._max_concurrent_flushes:
+                    # A later batch may hold newer updates of a branch which
+                    # is still being written. It waits, along with every
+                    # batch behind it, so that no branch is written out of
+                    # order.
+                    branch_ids = pending[0].branch_ids()
+                    if any(
+                        not branch_ids.isdisjoint(writing)
+                        for writing in in_flight.values()
+                    ):
+                        break
+
+                    batch = pending.popleft()
+                    flush_task = loop.create_task(batch.flush(self.logging_backend))
+                    in_flight[flush_task] = branch_ids
+                    flush_task.add_done_callback(
+                        functools.partial(_on_flushed, batch=batch)
                     )
 
-                    deadline = None
-
-                if task is None:
-                    return
+            try:
+                while True:
+                    # This wait only ends early if the logger is closing or
+                    # out of budget. Tasks pile up in the list in the
+                    # meantime, and are taken in one go at the end of the
+                    # debounce window, while earlier flushes keep running.
+                    if not self._closing:
+                        try:
+                            await asyncio.wait_for(
+                                self._wakeup.wait(),
+                                timeout=max(self._debounce, _MIN_POLL_INTERVAL),
+                            )
+                        except asyncio.TimeoutError:
+                            pass
+
+                    self._wakeup.clear()
+                    closing = self._closing
+
+                    batch = _Batch(measure=measure)
+                    for task in self._drain():
+                        batch.add(task)
+                        if batch.size() >= self._batch_size:
+                            pending.append(batch)
+                            batch = _Batch(measure=measure)
+                    if not batch.empty():
+                        pending.append(batch)
+
+                    if budget is not None:
+                        if budget.policy == OverflowPolicy.DROP_OLDEST:
+                            budget.trim(pending)
+                        dropped = budget.take_dropped()
+                        if dropped:
+                            pending.append(_summary_batch(dropped, budget.policy))
+
+                    dispatch()
+
+                    if errors:
+                        raise errors[0]
+
+                    if closing:
+                        break
+
+                while in_flight:
+                    await asyncio.gather(*in_flight, return_exceptions=True)
+                if errors:
+                    raise errors[0]
+            finally:
+                self._loop = None
 
         try:
             asyncio.run(_run())
@@ -196,7 +424,7 @@ class TreeLogger:
     def log(
         self,
         branch_id: str,
-        message: str | Exception,
+        message: str | Exception | LazyMessage,
         message_type: MessageType | str = MessageType.USER,
         entry_metadata: Dict[str, str | int | float | bool] | None = None,
     ) -> None:
@@ -204,7 +432,9 @@ class TreeLogger:
 
         Args:
             branch_id (str): ID of the branch to log this message to.
-            message (str): The message to log.
+            message (str | Exception | LazyMessage): The message to log.
+                Exceptions and `LazyMessage`s are formatted on the logging
+                thread, once the entry is flushed.
             message_type (MessageType | str, optional): The type of the message.
                 Defaults to MessageType.USER. Generally, MessageType.SYSTEM is
                 used for system messages internal to the logging system. If a
@@ -224,40 +454,136 @@ class TreeLogger:
             message_type=message_type,
             entry_metadata=entry_metadata,
         )
+        self._log_validated(
+            (branch_id,),
+            message=message,
+            message_type=message_type,
+            entry_metadata=entry_metadata,
+        )
 
+    def _log_validated(
+        self,
+        branch_ids: Tuple[str, ...],
+        message: str | LazyMessage,
+        message_type: MessageType,
+        entry_metadata: Dict[str, str | int | float | bool] | None,
+    ) -> None:
+        """Logs an already validated message to one or more branches.
+
+        A single entry is created and enqueued, no matter how many branches it
+        is logged to. Backends receive the same `LogEntry` object for each of
+        the branches. A `LazyMessage` is only rendered once the entry is
+        flushed.
+        """
         if not _ENABLED.get():
             return
 
-        timestamp = datetime.datetime.now().timestamp()
+        timestamp = time.time()
         log_entry = LogEntry(
             message=message,
             timestamp=timestamp,
             message_type=message_type,
             entry_metadata=entry_metadata,
         )
-        self._tasks.put((0, branch_id, log_entry))
+        if self._budget is not None and not self._budget.reserve(
+            self, branch_ids, log_entry
+        ):
+            return
+
+        if len(branch_ids) == 1:
+            self._enqueue((0, branch_ids[0], log_entry))
+        else:
+            self._enqueue((4, branch_ids, log_entry))
+
+    @property
+    def overflow_stats(self) -> Dict[str, int]:
+        """Counts of what the overflow policy has blocked or dropped.
+
+        Contains the number of times a logging call had to wait for space
+        (`"blocked"`), and the number of dropped entries of each message type
+        (`"dropped_system"`, `"dropped_user"`, and `"dropped_error"`). All
+        counts are zero if the logger has no pending entry budget.
+        """
+        if self._budget is None:
+            return {
+                "blocked": 0,
+                "dropped_system": 0,
+                "dropped_user": 0,
+                "dropped_error": 0,
+            }
+        with self._budget._lock:
+            return dict(self._budget.stats)
+
+    def _writer_running(self) -> bool:
+        return (
+            self._logging_thread is not None
+            and self._logging_thread.is_alive()
+            and not self._closing
+        )
 
-    def _update_tree(self, branch_id: str, parent: str, children: List[str]) -> None:
-        self._tasks.put((1, branch_id, parent, children))
+    def _update_tree(
+        self, branch_id: str, parent: str | None, children: Tuple[str, ...]
+    ) -> None:
+        # Only the change is sent: a new parent, or `None` to keep the current
+        # one, and the children which were added
+        self._enqueue((1, branch_id, parent, children))
 
     def _update_metadata(
         self, branch_id: str, metadata: Dict[str, str | int | float | bool]
     ) -> None:
-        self._tasks.put((2, branch_id, metadata))
+        self._enqueue((2, branch_id, metadata))
 
-    def _update_tags(self, branch_id: str, tags: List[str]) -> None:
-        self._tasks.put((3, branch_id, tags))
+    def _update_tags(self, branch_id: str, tags: Tuple[str, ...]) -> None:
+        self._enqueue((3, branch_id, tags))
 
-    def __enter__(self):
-        current_logger_ids = _CURRENT_BRANCH_IDS.get()
+    def _update_lifecycle(
+        self, branch_id: str, lifecycle: Dict[str, float | str]
+    ) -> None:
+        self._enqueue((5, branch_id, lifecycle))
 
-        if current_logger_ids is None:
-            _CURRENT_BRANCH_IDS.set(set([self.root.id]))
-        else:
-            current_logger_ids.add(self.root.id)
-            _CURRENT_BRANCH_IDS.set(current_logger_ids)
+    def _create_branch(
+        self,
+        branch_id: str,
+        parent: str | None,
+        name: str,
+        tags: Tuple[str, ...] | None,
+        metadata: Mapping[str, str | int | float | bool] | None,
+        start: float,
+    ) -> None:
+        # A single task for everything known about a new branch. The logging
+        # thread builds the backend record, and the entry announcing the new
+        # branch to its parent, from it. Neither `tags` nor `metadata` may be
+        # modified afterwards.
+        self._enqueue(
+            (6, branch_id, parent, name, tags, metadata, start, _ENABLED.get())
+        )
 
-        _LIVE_BRANCHES[self.root.id] = self.root
+    def _notify(self) -> None:
+        loop = self._loop
+        if loop is None:
+            # The logging thread has not started yet, and will look at the
+            # tasks as soon as it does.
+            return
+        try:
+            # Without an explicit context, the callback would hold on to a copy
+            # of the caller's context, and with it the caller's branches
+            loop.call_soon_threadsafe(self._wakeup.set, context=self._wakeup_context)
+        except RuntimeError:
+            # The loop has already been closed
+            pass
+
+    def _drain(self) -> List[tuple]:
+        """Takes every pending task, in the order in which they were enqueued."""
+        tasks = self._tasks
+        # Slicing and deleting are each atomic, so anything appended after
+        # the length is taken stays in the list for the next drain
+        count = len(tasks)
+        drained = tasks[:count]
+        del tasks[:count]
+        return drained
+
+    def __enter__(self):
+        _CURRENT_BRANCH_IDS.set({**_CURRENT_BRANCH_IDS.get(), self.root.id: self.root})
 
         self._logging_thread = threading.Thread(target=self.run)
         self._logging_thread.start()
@@ -271,35 +597,264 @@ class TreeLogger:
             except:
                 pass
 
-        # Now, we need to remove ourselves from the current loggers, if we are
-        # in them. Since we also know that we are the source of all branches
-        # under us, we know that none of our children will still be in use via
-        # the @bramble.branch API, so we can clean up ourselves and our
-        # children from _LIVE_BRANCHES
+        self.root.close(BranchStatus.ERROR if exc_type else BranchStatus.OK)
 
+        # Now, we need to remove ourselves from the current loggers, if we are
+        # in them
         current_logger_ids = _CURRENT_BRANCH_IDS.get()
-        try:
-            current_logger_ids.remove(self.root.id)
-            _CURRENT_BRANCH_IDS.set(current_logger_ids)
-        except KeyError:
-            pass
-
-        keys_to_delete = [self.root.id]
-
-        while keys_to_delete:
-            next_key_to_delete = keys_to_delete.pop()
-            try:
-                logger_to_delete = _LIVE_BRANCHES.pop(next_key_to_delete)
-                keys_to_delete.extend(logger_to_delete.children)
-            except KeyError:
-                pass
+        if self.root.id in current_logger_ids:
+            _CURRENT_BRANCH_IDS.set(
+                {
+                    branch_id: branch
+                    for branch_id, branch in current_logger_ids.items()
+                    if branch_id != self.root.id
+                }
+            )
 
         # Stop the logging thread
-        self._tasks.put(None)
+        self._closing = True
+        self._notify()
         self._logging_thread.join()
 
 
+class _Batch:
+    """The tasks collected by the logging thread for a single flush."""
+
+    __slots__ = (
+        "log_tasks",
+        "tree_tasks",
+        "meta_tasks",
+        "tag_tasks",
+        "lifecycle_tasks",
+        "created_tasks",
+        "entries",
+        "_uncounted",
+        "bytes",
+        "_measure",
+    )
+
+    def __init__(self, measure: bool = False):
+        self.log_tasks: Dict[str, List[LogEntry]] = {}
+        self.tree_tasks: Dict[str, Tuple[str | None, List[str]]] = {}
+        self.meta_tasks: Dict[str, Dict[str, str | int | float | bool]] = {}
+        self.tag_tasks: Dict[str, List[str]] = {}
+        self.lifecycle_tasks: Dict[str, Dict[str, float | str]] = {}
+        self.created_tasks: Dict[str, BranchCreation] = {}
+
+        # Only tracked when the logger has a pending entry budget
+        self.entries = 0
+        self.bytes = 0
+        self._measure = measure
+        self._uncounted: Set[int] = set()
+
+    def add(self, task: tuple) -> None:
+        task_type = task[0]
+        match task_type:
+            case 0:
+                _, branch_id, log_entry = task
+
+                if not branch_id in self.log_tasks:
+                    self.log_tasks[branch_id] = []
+
+                self.log_tasks[branch_id].append(log_entry)
+
+                if self._measure:
+                    self.entries += 1
+                    self.bytes += _entry_size(log_entry)
+            case 4:
+                _, branch_ids, log_entry = task
+
+                for branch_id in branch_ids:
+                    if not branch_id in self.log_tasks:
+                        self.log_tasks[branch_id] = []
+
+                    self.log_tasks[branch_id].append(log_entry)
+
+                if self._measure:
+                    self.entries += len(branch_ids)
+                    self.bytes += _entry_size(log_entry) * len(branch_ids)
+            case 1:
+                _, branch_id, parent, children = task
+
+                if not branch_id in self.tree_tasks:
+                    self.tree_tasks[branch_id] = (parent, list(children))
+                else:
+                    known_parent, known_children = self.tree_tasks[branch_id]
+                    known_children.extend(children)
+                    if parent is None:
+                        parent = known_parent
+                    self.tree_tasks[branch_id] = (parent, known_children)
+            case 2:
+                _, branch_id, metadata = task
+
+                # Branches created in this batch take their changes with them,
+                # so that nothing depends on the order in which they are written
+                if branch_id in self.created_tasks:
+                    self.created_tasks[branch_id].metadata.update(metadata)
+                    return
+
+                if not branch_id in self.meta_tasks:
+                    self.meta_tasks[branch_id] = {}
+
+                self.meta_tasks[branch_id].update(metadata)
+            case 3:
+                _, branch_id, tags = task
+
+                if branch_id in self.created_tasks:
+                    self.created_tasks[branch_id].tags.extend(tags)
+                    return
+
+                if not branch_id in self.tag_tasks:
+                    self.tag_tasks[branch_id] = []
+
+                self.tag_tasks[branch_id].extend(tags)
+            case 5:
+                _, branch_id, lifecycle = task
+
+                if not branch_id in self.lifecycle_tasks:
+                    self.lifecycle_tasks[branch_id] = {}
+
+                self.lifecycle_tasks[branch_id].update(lifecycle)
+            case 6:
+                _, branch_id, parent, name, tags, metadata, start, announce = task
+
+                branch_metadata = {"name": name}
+                if metadata:
+                    branch_metadata.update(metadata)
+                self.created_tasks[branch_id] = BranchCreation(
+                    name=name,
+                    parent=parent,
+                    tags=list(tags) if tags else [],
+                    metadata=branch_metadata,
+                    start=start,
+                )
+
+                if announce and parent is not None:
+                    if not parent in self.log_tasks:
+                        self.log_tasks[parent] = []
+
+                    log_entry = LogEntry(
+                        message=f"Branched Logger: `{name}`",
+                        timestamp=start,
+                        message_type=MessageType.SYSTEM,
+                        entry_metadata={"branch_id": branch_id},
+                    )
+                    self.log_tasks[parent].append(log_entry)
+
+                    # Not counted against the budget, since it describes the
+                    # tree, rather than being a message which was logged
+                    if self._measure:
+                        self._uncounted.add(id(log_entry))
+
+    def size(self) -> int:
+        return max(
+            len(self.log_tasks),
+            len(self.tree_tasks),
+            len(self.meta_tasks),
+            len(self.tag_tasks),
+            len(self.lifecycle_tasks),
+            len(self.created_tasks),
+        )
+
+    def empty(self) -> bool:
+        return self.size() == 0
+
+    def branch_ids(self) -> Set[str]:
+        """The IDs of every branch which this batch writes to."""
+        return set().union(
+            self.log_tasks,
+            self.tree_tasks,
+            self.meta_tasks,
+            self.tag_tasks,
+            self.lifecycle_tasks,
+            self.created_tasks,
+        )
+
+    def pop_oldest(self) -> Tuple[str, LogEntry]:
+        """Removes the first counted entry of the earliest branch in this batch."""
+        for branch_id, entries in self.log_tasks.items():
+            for index, entry in enumerate(entries):
+                if id(entry) not in self._uncounted:
+                    break
+            else:
+                continue
+
+            del entries[index]
+            if not entries:
+                del self.log_tasks[branch_id]
+            break
+
+        self.entries -= 1
+        self.bytes -= _entry_size(entry)
+        return branch_id, entry
+
+    def render(self) -> None:
+        """Renders the lazy messages of this batch into plain strings.
+
+        Runs on the logging thread, right before the batch is written, so that
+        callers only pay for capturing their messages. Entries shared between
+        several branches are rendered once, and stay shared.
+        """
+        rendered: Dict[int, LogEntry] = {}
+        for entries in self.log_tasks.values():
+            for index, entry in enumerate(entries):
+                if not isinstance(entry.message, LazyMessage):
+                    continue
+                if id(entry) not in rendered:
+                    rendered[id(entry)] = LogEntry(
+                        message=entry.message.render(),
+                        timestamp=entry.timestamp,
+                        message_type=entry.message_type,
+                        entry_metadata=entry.entry_metadata,
+                    )
+                entries[index] = rendered[id(entry)]
+
+    async def flush(self, logging_backend: BrambleWriter) -> None:
+        self.render()
+
+        await logging_backend.async_write_batch(
+            batch=WriteBatch(
+                created=self.created_tasks,
+                entries=self.log_tasks,
+                relationships=self.tree_tasks,
+                metadata=self.meta_tasks,
+                tags=self.tag_tasks,
+                lifecycle=self.lifecycle_tasks,
+            )
+        )
+
+
+def _summary_batch(dropped: Dict[str, int], policy: OverflowPolicy) -> _Batch:
+    # Summaries are not counted against the budget, since they are what tells
+    # the user that the budget was exceeded in the first place.
+    batch = _Batch()
+    timestamp = time.time()
+    for branch_id, count in dropped.items():
+        batch.add(
+            (
+                0,
+                branch_id,
+                LogEntry(
+                    message=f"Dropped {count} log entries, the logging backend could not keep up.",
+                    timestamp=timestamp,
+                    message_type=MessageType.SYSTEM,
+                    entry_metadata={
+                        "dropped_entries": count,
+                        "overflow_policy": policy.value,
+                    },
+                ),
+            )
+        )
+    return batch
+
+
 class LogBranch:
+    """A branch of a `TreeLogger`, which can be logged to on its own.
+
+    `children` holds the IDs of the first thousand children of the branch.
+    Any further children are only recorded by the logging backend.
+    """
+
     id: str
     name: str
     parent: str | None
@@ -307,7 +862,7 @@ class LogBranch:
     tags: List[str]
     metadata: Dict[str, str | int | float | bool]
 
-    slots = (
+    __slots__ = (
         "id",
         "name",
         "parent",
@@ -315,26 +870,52 @@ class LogBranch:
         "tags",
         "metadata",
         "tree_logger",
+        "_logging_context",
+        "_start",
+        "_started",
+        "_end",
     )
 
     def __init__(self, name: str, tree_logger: TreeLogger, id: str = None):
+        self._init(name, tree_logger, id, None, None, None)
+
+    def _init(
+        self,
+        name: str,
+        tree_logger: TreeLogger,
+        id: str | None,
+        parent: str | None,
+        tags: Tuple[str, ...] | None,
+        metadata: Mapping[str, str | int | float | bool] | None,
+    ) -> None:
+        # Sets up a new branch, for `__init__`, and for `_branch_trusted` on
+        # branches made with `__new__`
         self.name = name
-        self.parent = None
+        self.parent = parent
         self.children = []
-        self.tags = []
+        self.tags = list(tags) if tags else []
         self.metadata = {"name": name}
+        if metadata:
+            self.metadata.update(metadata)
 
         self.tree_logger = tree_logger
 
         if id is None:
-            id = str(uuid.uuid4().hex)[:24]
+            id = tree_logger._new_id()
         self.id = id
 
-        self.tree_logger._update_metadata(self.id, self.metadata)
+        # Times are recorded from the wall clock, like the timestamps of
+        # entries, and durations from the monotonic clock, so that they stay
+        # correct if the system clock is adjusted in between
+        self._start = time.time()
+        self._started = time.monotonic()
+        self._end = None
+
+        tree_logger._create_branch(id, parent, name, tags, metadata, self._start)
 
     def log(
         self,
-        message: str | Exception,
+        message: str | Exception | LazyMessage,
         message_type: MessageType | str = MessageType.USER,
         entry_metadata: Dict[str, str | int | float | bool] = None,
     ):
@@ -369,30 +950,80 @@ class LogBranch:
 
         Returns:
             LogBranch: The new `bramble` branch.
+
+        Raises:
+            ValueError: If `name` is not a string.
         """
-        new_branch = LogBranch(
-            name=name,
-            tree_logger=self.tree_logger,
-        )
+        if not isinstance(name, str):
+            raise ValueError(f"`name` must be of type `str`, received {type(name)}.")
 
-        new_branch.set_parent(self.id)
-        self.add_child(new_branch.id)
+        return self._branch_trusted(name, None, None)
 
-        self.log(
-            message=f"Branched Logger: `{new_branch.name}`",
-            message_type=MessageType.SYSTEM,
-            entry_metadata={"branch_id": new_branch.id},
-        )
+    def _branch_trusted(
+        self,
+        name: str,
+        tags: Tuple[str, ...] | None,
+        metadata: Mapping[str, str | int | float | bool] | None,
+    ) -> "LogBranch":
+        """Creates a new branch with tags and metadata which are already valid.
+
+        Equivalent to calling `branch`, followed by `add_tags` and
+        `add_metadata`, but without validating anything. Everything about the
+        new branch is sent to the logging thread as a single task. Used by
+        `fork` and `@branch`, which validate their tags and metadata once.
+        Neither `tags` nor `metadata` may be modified afterwards.
+        """
+        new_branch = LogBranch.__new__(LogBranch)
+        new_branch._init(name, self.tree_logger, None, self.id, tags, metadata)
+        if len(self.children) < _MAX_REMEMBERED_CHILDREN:
+            self.children.append(new_branch.id)
 
         return new_branch
 
+    def close(self, status: BranchStatus | str = BranchStatus.OK) -> None:
+        """Marks this branch as finished.
+
+        Records the end time, duration, and outcome of this branch with the
+        logging backend. Branches created by `fork` and `@branch` are closed
+        automatically when their scope ends, as is the root branch of a
+        `TreeLogger`. Only the first call has any effect.
+
+        Args:
+            status (BranchStatus | str, optional): How this branch ended.
+                Defaults to `BranchStatus.OK`. If a string is passed, an
+                attempt is made to cast it to BranchStatus.
+
+        Raises:
+            ValueError: If `status` cannot be converted to a BranchStatus.
+        """
+        if isinstance(status, str):
+            status = BranchStatus.from_string(status)
+        elif not isinstance(status, BranchStatus):
+            raise ValueError(
+                f"`status` must be of type `str` or `BranchStatus`, received {type(status)}."
+            )
+
+        if self._end is not None:
+            return
+
+        self._end = end = time.time()
+        self.tree_logger._update_lifecycle(
+            self.id,
+            {
+                "end": end,
+                "duration": time.monotonic() - self._started,
+                "status": status.value,
+            },
+        )
+
     def add_child(self, child_id: str) -> None:
         if not isinstance(child_id, str):
             raise ValueError(
                 f"`child_id` must be of type `str`, received {type(child_id)}."
             )
-        self.children.append(child_id)
-        self.tree_logger._update_tree(self.id, self.parent, self.children)
+        if len(self.children) < _MAX_REMEMBERED_CHILDREN:
+            self.children.append(child_id)
+        self.tree_logger._update_tree(self.id, None, (child_id,))
 
     def set_parent(self, parent_id: str) -> None:
         if not isinstance(parent_id, str):
@@ -400,7 +1031,7 @@ class LogBranch:
                 f"`parent_id` must be of type `str`, received {type(parent_id)}."
             )
         self.parent = parent_id
-        self.tree_logger._update_tree(self.id, self.parent, self.children)
+        self.tree_logger._update_tree(self.id, parent_id, ())
 
     def add_tags(self, tags: List[str]) -> None:
         if not isinstance(tags, list):
@@ -411,7 +1042,7 @@ class LogBranch:
                     f"Each entry of `tags` must be of type `str`, received {type(tag)}."
                 )
         self.tags.extend(tags)
-        self.tree_logger._update_tags(self.id, self.tags)
+        self.tree_logger._update_tags(self.id, tuple(tags))
 
     def add_metadata(self, metadata: Dict[str, str | int | float | bool]) -> None:
         if not isinstance(metadata, dict):
@@ -428,7 +1059,7 @@ class LogBranch:
                     f"`metadata` must have values of type `str`, `int`, `float`, or `bool`, received {type(value)}"
                 )
         self.metadata.update(metadata)
-        self.tree_logger._update_metadata(self.id, self.metadata)
+        self.tree_logger._update_metadata(self.id, dict(metadata))
 
     def __repr__(self):
         return f"LogBranch(id={self.id}, name={self.name}, parent={self.parent}, children={self.children}, tags={self.tags}, metadata={self.metadata})"
@@ -441,20 +1072,31 @@ class LogBranch:
         self._logging_context.__exit__(exc_type, exc_value, traceback)
 
 
+_OK_STATUS = BranchStatus.OK
+_ERROR_STATUS = BranchStatus.ERROR
+
+
 class _LoggingContext:
-    _prev_logger_ids: Set[str]
+    _prev_logger_ids: Mapping[str, LogBranch]
     _new_branches: List[LogBranch]
+    _close: bool
 
-    __slots__ = ("_prev_logger_ids", "_new_branches")
+    __slots__ = ("_prev_logger_ids", "_new_branches", "_close")
 
-    def __init__(self, new_branches: List[LogBranch]):
+    def __init__(self, new_branches: List[LogBranch], close: bool = False):
         self._new_branches = new_branches
+        # Whether the branches end with this context, as for `fork`
+        self._close = close
 
     def __enter__(self):
         self._prev_logger_ids = _CURRENT_BRANCH_IDS.get()
 
-        _LIVE_BRANCHES.update({branch.id: branch for branch in self._new_branches})
-        _CURRENT_BRANCH_IDS.set({branch.id for branch in self._new_branches})
+        _CURRENT_BRANCH_IDS.set({branch.id: branch for branch in self._new_branches})
 
     def __exit__(self, exc_type, exc_value, traceback):
         _CURRENT_BRANCH_IDS.set(self._prev_logger_ids)
+
+        if self._close:
+            status = _ERROR_STATUS if exc_type else _OK_STATUS
+            for branch in self._new_branches:
+                branch.close(status)
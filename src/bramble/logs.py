@@ -19,6 +19,62 @@ class MessageType(Enum):
             raise ValueError(f"'{input}' is not a valid MessageType!")
 
 
+class BranchStatus(Enum):
+    """How a tree logger branch ended."""
+
+    OK = "ok"
+    ERROR = "error"
+
+    @classmethod
+    def from_string(cls, input: str) -> Self:
+        try:
+            return cls(input.lower().strip())
+        except:
+            raise ValueError(f"'{input}' is not a valid BranchStatus!")
+
+
+class LazyMessage:
+    """A log message which is only rendered once it is written.
+
+    Holds a format string and its arguments, which are combined with
+    `str.format` on the logging thread, right before the entry is handed to
+    the logging backend. The caller only pays for creating this object, and
+    nothing at all if the entry is dropped.
+
+    IMPORTANT: The arguments are rendered at some later point, and from a
+    different thread. Do not pass objects which may be modified after the log
+    call, or which are not safe to convert to strings from another thread.
+
+    Example:
+    ```
+    bramble.log(bramble.LazyMessage("Loaded {} rows: {!r}", len(rows), rows))
+    ```
+    """
+
+    __slots__ = ("format", "args", "kwargs")
+
+    def __init__(self, format: str, *args, **kwargs):
+        if not isinstance(format, str):
+            raise ValueError(
+                f"`format` must be of type `str`, received {type(format)}."
+            )
+        self.format = format
+        self.args = args
+        self.kwargs = kwargs
+
+    def render(self) -> str:
+        try:
+            return self.format.format(*self.args, **self.kwargs)
+        except Exception:
+            return f"{self.format}\n`ERROR`"
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def __repr__(self) -> str:
+        return f"LazyMessage(format={self.format!r})"
+
+
 @dataclass(frozen=True, slots=True)
 class LogEntry:
     """A log entry for a tree logger."""
@@ -55,7 +111,13 @@ class LogEntry:
 
 @dataclass(frozen=True, slots=True)
 class BranchData:
-    """A tree logger branch's full info."""
+    """A tree logger branch's full info.
+
+    `start` and `end` are the times at which the branch was opened and closed,
+    in seconds since the epoch, and `duration` is the time between them. They
+    are None if the backend did not record them, or if the branch has not
+    been closed yet.
+    """
 
     id: str
     name: str
@@ -64,11 +126,21 @@ class BranchData:
     messages: List[LogEntry]
     tags: List[str]
     metadata: Dict[str, str | int | float | bool]
+    start: float | None = None
+    end: float | None = None
+    duration: float | None = None
+    status: BranchStatus | None = None
 
     def as_dict(self) -> Dict[str, Any]:
         dictionary_messages = [message.as_dict() for message in self.messages]
         dictionary = asdict(self)
         dictionary["messages"] = dictionary_messages
+        # Lifecycle fields are left out until they are known
+        for key in ["start", "end", "duration", "status"]:
+            if dictionary[key] is None:
+                del dictionary[key]
+        if "status" in dictionary:
+            dictionary["status"] = dictionary["status"].value
         return dictionary
 
     @classmethod
@@ -89,4 +161,65 @@ class BranchData:
         dictionary["messages"] = [
             LogEntry.from_dict(log_dict) for log_dict in dictionary["messages"]
         ]
+        if dictionary.get("status") is not None:
+            dictionary["status"] = BranchStatus.from_string(dictionary["status"])
         return cls(**dictionary)
+
+
+@dataclass(frozen=True, slots=True)
+class BranchSummary:
+    """A tree logger branch, without its messages.
+
+    `num_entries` is the number of messages of the branch, and
+    `first_timestamp` and `last_timestamp` the earliest and latest of their
+    timestamps, which are None if it has none. The other fields are those of
+    `BranchData`.
+    """
+
+    id: str
+    name: str
+    parent: str | None
+    tags: List[str]
+    metadata: Dict[str, str | int | float | bool]
+    num_entries: int
+    first_timestamp: float | None = None
+    last_timestamp: float | None = None
+    start: float | None = None
+    end: float | None = None
+    duration: float | None = None
+    status: BranchStatus | None = None
+
+    @classmethod
+    def from_branch_data(cls, branch_data: BranchData) -> Self:
+        timestamps = [message.timestamp for message in branch_data.messages]
+        return cls(
+            id=branch_data.id,
+            name=branch_data.name,
+            parent=branch_data.parent,
+            tags=branch_data.tags,
+            metadata=branch_data.metadata,
+            num_entries=len(timestamps),
+            first_timestamp=min(timestamps, default=None),
+            last_timestamp=max(timestamps, default=None),
+            start=branch_data.start,
+            end=branch_data.end,
+            duration=branch_data.duration,
+            status=branch_data.status,
+        )
+
+
+@dataclass(slots=True)
+class BranchCreation:
+    """A new tree logger branch, as sent to logging backends.
+
+    Holds everything known about the branch when it was created. `metadata`
+    includes the branch name, under `"name"`, and `start` is the time at
+    which the branch was opened, in seconds since the epoch. `parent` is None
+    for the root branch of a tree logger.
+    """
+
+    name: str
+    parent: str | None
+    tags: List[str]
+    metadata: Dict[str, str | int | float | bool]
+    start: float
@@ -6,10 +6,12 @@ from bramble.logs import MessageType
 class BrambleHandler(logging.Handler):
     def __init__(self, level=0):
         # Cannot import at top of file because of circular imports
-        from bramble.contextual import log
+        from bramble.contextual import _log_trusted
 
         super().__init__(level)
-        self.log_fn = log
+        # The metadata below is converted to valid types here, so there is no
+        # need to validate it again
+        self.log_fn = _log_trusted
 
     def emit(self, record):
         try:
@@ -1,14 +1,31 @@
+from typing import Tuple
+
 from dataclasses import asdict
 import streamlit as st
 import pandas as pd
 import datetime
 import asyncio
 
-from bramble.logs import MessageType
+from bramble.logs import MessageType, BranchData, BranchSummary
 from bramble.backends import FileReader
 from bramble.backends.base import BrambleReader
 
 
+def _branch_times(branch_data: BranchData | BranchSummary) -> Tuple[float, float]:
+    """The start and end of a branch, from its lifecycle if it was recorded."""
+    if branch_data.start is not None and branch_data.end is not None:
+        return branch_data.start, branch_data.end
+
+    # Older logs, or branches which are not closed yet
+    if isinstance(branch_data, BranchSummary):
+        timestamps = [branch_data.first_timestamp, branch_data.last_timestamp]
+    else:
+        timestamps = [message.timestamp for message in branch_data.messages]
+    timestamps.append(branch_data.start)
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return min(timestamps), max(timestamps)
+
+
 @st.cache_data
 def load_branches_and_tags():
     def _load_branches_and_tags():
@@ -21,7 +38,9 @@ def load_branches_and_tags():
 
         async def _load():
             all_branch_ids = await backend.async_get_branch_ids()
-            all_branch_data = await backend.async_get_branches(all_branch_ids)
+            # Only the number of entries of each branch is shown, so their
+            # messages are not read
+            all_branch_data = await backend.async_get_branch_summaries(all_branch_ids)
             return all_branch_data
 
         all_branch_data = asyncio.run(_load())
@@ -30,12 +49,7 @@ def load_branches_and_tags():
         tags = set()
 
         for unformatted_data in all_branch_data.values():
-            start = unformatted_data.messages[0].timestamp
-            end = unformatted_data.messages[0].timestamp
-
-            for message in unformatted_data.messages:
-                start = min(start, message.timestamp)
-                end = max(end, message.timestamp)
+            start, end = _branch_times(unformatted_data)
 
             branches.append(
                 {
@@ -51,9 +65,14 @@ def load_branches_and_tags():
                         if len(unformatted_data.metadata) > 0
                         else None
                     ),
-                    "entries": len(unformatted_data.messages),
+                    "entries": unformatted_data.num_entries,
                     "start": datetime.datetime.fromtimestamp(start),
                     "end": datetime.datetime.fromtimestamp(end),
+                    "status": (
+                        unformatted_data.status.value
+                        if unformatted_data.status is not None
+                        else None
+                    ),
                 }
             )
             tags.update(unformatted_data.tags)
@@ -80,13 +99,7 @@ def load_branch_data(id: str):
         branch_data = asyncio.run(backend.async_get_branches([id]))
         branch_data = branch_data[id]
 
-        start = branch_data.messages[0].timestamp
-        end = branch_data.messages[0].timestamp
-
-        for message in branch_data.messages:
-            start = min(start, message.timestamp)
-            end = max(end, message.timestamp)
-
+        start, end = _branch_times(branch_data)
         start = datetime.datetime.fromtimestamp(start)
         end = datetime.datetime.fromtimestamp(end)
 
@@ -1,8 +1,219 @@
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Set, Iterator, Self
 
+from enum import Enum
+import itertools
 import traceback
+import random
+import time
+import os
 
-from bramble.logs import MessageType
+from bramble.logs import MessageType, LazyMessage
+
+
+class ValidationMode(Enum):
+    """How thoroughly `bramble` checks the metadata of logging calls.
+
+    `FULL` checks every key and value of every metadata dictionary. `CACHED`
+    remembers the key names of metadata which passed the check, and for
+    metadata with the same keys, only compares the exact type of each value
+    with the allowed types. It accepts and rejects exactly what `FULL` does.
+    Its cost still grows with the number of keys, so it only saves time for
+    metadata with more than a handful of them. `SAMPLED` only checks one in
+    every `1 / sample_rate` metadata dictionaries, which lets invalid
+    metadata through to the backend, in exchange for the lowest overhead.
+    """
+
+    FULL = "full"
+    CACHED = "cached"
+    SAMPLED = "sampled"
+
+    @classmethod
+    def from_string(cls, input: str) -> Self | None:
+        try:
+            return cls(input.lower().strip())
+        except:
+            raise ValueError(f"'{input}' is not a valid ValidationMode!")
+
+
+# Key names of metadata which are known to be valid in `CACHED` mode. Cleared
+# when full, so that code with unbounded key names cannot grow it forever.
+_MAX_VALID_KEYS = 1024
+_VALID_KEYS: Set[tuple] = set()
+# Exact types are compared, so a subclass of an allowed type is checked in
+# full, rather than matching its parent
+_CACHED_TYPES = frozenset((str, int, float, bool))
+
+_FULL = ValidationMode.FULL
+_CACHED = ValidationMode.CACHED
+_SAMPLED = ValidationMode.SAMPLED
+
+_VALIDATION_MODE = _FULL
+_SAMPLE_INTERVAL = 100
+_SAMPLE_COUNTER = itertools.count()
+
+
+def set_validation(
+    mode: ValidationMode | str,
+    sample_rate: float = 0.01,
+) -> None:
+    """Sets how thoroughly `bramble` checks the metadata of logging calls.
+
+    Applies to the `entry_metadata` of log calls, as well as the metadata of
+    `apply`, `fork`, and `@branch`. All other arguments are always checked.
+
+    Args:
+        mode (ValidationMode | str): The validation mode to use, see
+            `ValidationMode`.
+        sample_rate (float, optional): The fraction of metadata dictionaries
+            which are checked in `ValidationMode.SAMPLED`. Defaults to `0.01`.
+
+    `bramble` starts out in `ValidationMode.FULL`.
+    """
+    global _VALIDATION_MODE, _SAMPLE_INTERVAL
+
+    if isinstance(mode, str):
+        mode = ValidationMode.from_string(mode)
+    elif not isinstance(mode, ValidationMode):
+        raise ValueError(
+            f"`mode` must be of type `str` or `ValidationMode`, received {type(mode)}."
+        )
+
+    if not isinstance(sample_rate, (int, float)) or not 0 < sample_rate <= 1:
+        raise ValueError(
+            f"`sample_rate` must be a number in the range (0, 1], received {sample_rate}."
+        )
+
+    _VALIDATION_MODE = mode
+    _SAMPLE_INTERVAL = max(1, round(1 / sample_rate))
+    _VALID_KEYS.clear()
+
+
+def _skip_metadata_check(metadata: Dict[str, str | int | float | bool]) -> bool:
+    """Whether the current validation mode allows skipping `metadata`."""
+    # Compared against module level aliases, since attribute access on an
+    # Enum class is comparatively slow.
+    mode = _VALIDATION_MODE
+    if mode is _CACHED:
+        return tuple(metadata) in _VALID_KEYS and _CACHED_TYPES.issuperset(
+            map(type, metadata.values())
+        )
+    if mode is _SAMPLED:
+        return next(_SAMPLE_COUNTER) % _SAMPLE_INTERVAL != 0
+    return False
+
+
+def _remember_valid_metadata(metadata: Dict[str, str | int | float | bool]) -> None:
+    if len(_VALID_KEYS) >= _MAX_VALID_KEYS:
+        _VALID_KEYS.clear()
+    _VALID_KEYS.add(tuple(metadata))
+
+
+# Wall clock time at the zero point of the monotonic clock. Branch IDs use
+# the monotonic clock, so that they keep sorting by creation time, even if the
+# system clock is adjusted while running.
+_CLOCK_EPOCH_NS = time.time_ns() - time.monotonic_ns()
+
+
+def _new_id_state() -> Tuple[str, Iterator[int]]:
+    # A random tag for this process, and a counter starting at a random point,
+    # so that processes created at the same time are unlikely to collide
+    return f"{random.getrandbits(20):05x}", itertools.count(random.getrandbits(31))
+
+
+_ID_PROCESS_TAG, _ID_COUNTER = _new_id_state()
+
+
+def _reset_id_state() -> None:
+    global _ID_PROCESS_TAG, _ID_COUNTER
+    _ID_PROCESS_TAG, _ID_COUNTER = _new_id_state()
+
+
+# A forked child would otherwise continue with the same tag and counter as its
+# parent, and hand out the same IDs
+os.register_at_fork(after_in_child=_reset_id_state)
+
+
+def time_ordered_id() -> str:
+    """Creates a new branch ID, which sorts by creation time.
+
+    The default ID generator of `TreeLogger`. IDs are 24 hexadecimal
+    characters: the creation time in milliseconds (11), a random tag for the
+    current process (5), and a per process counter (8). IDs created later in
+    the same process always sort after earlier ones, and IDs of different
+    processes sort by their creation time, up to the millisecond.
+    """
+    return "%011x%s%08x" % (
+        (_CLOCK_EPOCH_NS + time.monotonic_ns()) // 1_000_000,
+        _ID_PROCESS_TAG,
+        next(_ID_COUNTER) & 0xFFFFFFFF,
+    )
+
+
+def _capture_exception(exception: Exception) -> LazyMessage:
+    return _LazyException(exception)
+
+
+class _LazyException(LazyMessage):
+    """An exception which is captured now, but formatted once it is written.
+
+    Only references to the exception and its traceback are kept, which means
+    that the frames of the traceback stay alive until the entry is flushed.
+    """
+
+    __slots__ = ("_exception", "_traceback")
+
+    def __init__(self, exception: BaseException):
+        super().__init__("{}")
+        self._exception = exception
+        # The traceback of an exception grows as it is raised further, so we
+        # keep the one it has right now
+        self._traceback = exception.__traceback__
+
+    def render(self) -> str:
+        try:
+            return "".join(
+                traceback.TracebackException(
+                    type(self._exception), self._exception, self._traceback
+                ).format()
+            ).strip()
+        except Exception:
+            return "`ERROR`"
+
+
+class _LazyFunctionCall(LazyMessage):
+    """The arguments of a function call, which are formatted once written."""
+
+    __slots__ = ("_format_call", "_args", "_kwargs")
+
+    def __init__(self, format_call, args: tuple, kwargs: dict):
+        super().__init__("Function call:\n{}")
+        self._format_call = format_call
+        self._args = args
+        self._kwargs = kwargs
+
+    def render(self) -> str:
+        return "Function call:\n" + self._format_call(self._args, self._kwargs)
+
+
+class _LazyFunctionReturn(LazyMessage):
+    """The return value of a function, which is formatted once written."""
+
+    __slots__ = ("_format_return", "_output")
+
+    def __init__(self, format_return, output):
+        super().__init__("Function return:\n{}")
+        self._format_return = format_return
+        self._output = output
+
+    def render(self) -> str:
+        return "Function return:\n" + self._format_return(self._output)
+
+
+def _stringify_return(output) -> str:
+    try:
+        return f"{output}"
+    except Exception:
+        return "`ERROR`"
 
 
 def _stringify_function_call(func, args: list, kwargs: dict):
@@ -22,24 +233,25 @@ def _stringify_function_call(func, args: list, kwargs: dict):
 
 
 def _validate_log_call(
-    message: str | Exception,
+    message: str | Exception | LazyMessage,
     message_type: MessageType | str = MessageType.USER,
     entry_metadata: Dict[str, str | int | float | bool] | None = None,
-) -> Tuple[str, MessageType, Dict[str, str | int | float | bool] | None]:
+    format_message: bool = True,
+) -> Tuple[str | LazyMessage, MessageType, Dict[str, str | int | float | bool] | None]:
     """Validates a bramble log call and formats objects.
 
     Used to ensure that we have consistent validation that happens as close to
-    the user as possible.
+    the user as possible. Exceptions are captured as a `LazyMessage`, which
+    formats their traceback once the entry is written. If `format_message` is
+    `False`, exceptions are returned as they are.
     """
-    if not isinstance(message, (str, Exception)):
+    if not isinstance(message, (str, Exception, LazyMessage)):
         raise ValueError(
-            f"`message` must be of type `str` or `Exception`, received {type(message)}."
+            f"`message` must be of type `str`, `Exception`, or `LazyMessage`, received {type(message)}."
         )
 
-    if isinstance(message, Exception):
-        message = "".join(
-            traceback.TracebackException.from_exception(message).format()
-        ).strip()
+    if format_message and isinstance(message, Exception):
+        message = _capture_exception(message)
 
     if isinstance(message_type, str):
         message_type = MessageType.from_string(message_type)
@@ -53,7 +265,9 @@ def _validate_log_call(
             f"`entry_metadata` must either be `None` or a dictionary, received {type(entry_metadata)}."
         )
 
-    if entry_metadata is not None:
+    if entry_metadata is not None and (
+        _VALIDATION_MODE is _FULL or not _skip_metadata_check(entry_metadata)
+    ):
         for key, value in entry_metadata.items():
             if not isinstance(key, str):
                 raise ValueError(
@@ -65,6 +279,9 @@ def _validate_log_call(
                     f"Values for `entry_metadata` must be one of `str`, `int`, `float`, `bool`, received {type(value)}"
                 )
 
+        if _VALIDATION_MODE is _CACHED:
+            _remember_valid_metadata(entry_metadata)
+
     return message, message_type, entry_metadata
 
 
@@ -100,15 +317,18 @@ def _validate_tags_and_metadata(
                 )
             collected_tags.update(arg)
         elif isinstance(arg, dict):
-            for key, value in arg.items():
-                if not isinstance(key, str):
-                    raise ValueError(
-                        f"Metadata `dict` arguments must have string keys, received {type(key)}"
-                    )
-                if not isinstance(value, (str, int, float, bool)):
-                    raise ValueError(
-                        f"Metadata `dict` arguments must have values of type `str`, `int`, `float`, or `bool`, received {type(value)}"
-                    )
+            if _VALIDATION_MODE is _FULL or not _skip_metadata_check(arg):
+                for key, value in arg.items():
+                    if not isinstance(key, str):
+                        raise ValueError(
+                            f"Metadata `dict` arguments must have string keys, received {type(key)}"
+                        )
+                    if not isinstance(value, (str, int, float, bool)):
+                        raise ValueError(
+                            f"Metadata `dict` arguments must have values of type `str`, `int`, `float`, or `bool`, received {type(value)}"
+                        )
+                if _VALIDATION_MODE is _CACHED:
+                    _remember_valid_metadata(arg)
             collected_metadata.update(arg)
         else:
             raise ValueError(
@@ -1,77 +1,307 @@
-from typing import Dict, List, Callable, Any, Awaitable
+from typing import Dict, List, Callable, Any, Awaitable, Mapping, Tuple
 
+from dataclasses import dataclass
 import functools
 import inspect
+import reprlib
+from types import MappingProxyType
 
 from bramble.utils import (
     _stringify_function_call,
+    _stringify_return,
     _validate_tags_and_metadata,
+    _LazyFunctionCall,
+    _LazyFunctionReturn,
 )
-from bramble.contextual import log, fork
+from bramble.contextual import _log_trusted, _fork_trusted
+from bramble.loggers import _CURRENT_BRANCH_IDS
 from bramble.logs import MessageType
 
+
+@dataclass(frozen=True, slots=True)
+class CapturePolicy:
+    """How `@branch` captures the arguments and return value of a function.
+
+    Parameter names are resolved against the signature of the decorated
+    function once, when it is decorated.
+
+    Args:
+        max_length (int, optional): The maximum number of characters logged
+            for each argument and for the return value. Values are converted
+            with `reprlib`, which also limits how many items of large
+            containers are converted, and only converts the start of long
+            strings and bytes. Other values, such as instances of your own
+            classes, still have their full `repr` computed before it is cut
+            short. Defaults to None, which logs the full `str` of each value.
+        include (List[str], optional): If given, only the parameters with
+            these names are captured. Defaults to None.
+        exclude (List[str], optional): The names of parameters which are
+            never captured. Defaults to None.
+        types_only (bool, optional): Whether to only log the type name of each
+            value. Defaults to False.
+        capture_return (bool, optional): Whether to log the return value.
+            Defaults to True.
+    """
+
+    max_length: int | None = None
+    include: List[str] | None = None
+    exclude: List[str] | None = None
+    types_only: bool = False
+    capture_return: bool = True
+
+    def __post_init__(self):
+        if self.max_length is not None and (
+            not isinstance(self.max_length, int)
+            or isinstance(self.max_length, bool)
+            or self.max_length < 1
+        ):
+            raise ValueError(
+                f"`max_length` must be a positive integer, received {self.max_length}."
+            )
+
+        for field in ["include", "exclude"]:
+            names = getattr(self, field)
+            if names is None:
+                continue
+            if not isinstance(names, (list, tuple, set)) or not all(
+                isinstance(name, str) for name in names
+            ):
+                raise ValueError(f"`{field}` must be a list of parameter names.")
+
+        if not isinstance(self.types_only, bool):
+            raise ValueError(
+                f"`types_only` must be of type `bool`, received {type(self.types_only)}."
+            )
+
+        if not isinstance(self.capture_return, bool):
+            raise ValueError(
+                f"`capture_return` must be of type `bool`, received {type(self.capture_return)}."
+            )
+
+
+class _LimitedRepr(reprlib.Repr):
+    """A `reprlib.Repr` which also limits `bytes` before converting them.
+
+    `reprlib` has no method for `bytes` or `bytearray`, so it would otherwise
+    convert the whole value with `repr`, only to cut the result short.
+    """
+
+    def repr_bytes(self, value: bytes, level: int) -> str:
+        return repr(value[: self.maxstring])
+
+    def repr_bytearray(self, value: bytearray, level: int) -> str:
+        return repr(value[: self.maxstring])
+
+
+def _compile_capture(
+    func, capture: CapturePolicy | None
+) -> Tuple[Callable[[tuple, dict], str], Callable[[Any], str] | None]:
+    """Creates the functions which format the calls and returns of `func`.
+
+    Returns the call formatter, and the return formatter, which is None if
+    return values should not be logged.
+    """
+    if capture is None:
+        return functools.partial(_stringify_function_call, func), _stringify_return
+
+    if not isinstance(capture, CapturePolicy):
+        raise ValueError(
+            f"`capture` must be of type `CapturePolicy`, received {type(capture)}."
+        )
+
+    parameters = inspect.signature(func).parameters.values()
+    positional_kinds = (
+        inspect.Parameter.POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+    )
+    positional_names = [
+        parameter.name for parameter in parameters if parameter.kind in positional_kinds
+    ]
+    var_positional_name = None
+    accepts_kwargs = False
+    for parameter in parameters:
+        if parameter.kind == inspect.Parameter.VAR_POSITIONAL:
+            var_positional_name = parameter.name
+        elif parameter.kind == inspect.Parameter.VAR_KEYWORD:
+            accepts_kwargs = True
+
+    include = None if capture.include is None else frozenset(capture.include)
+    exclude = frozenset(capture.exclude or [])
+    if not accepts_kwargs:
+        known = {parameter.name for parameter in parameters}
+        for name in (include or set()) | exclude:
+            if name not in known:
+                raise ValueError(
+                    f"`{func.__name__}` does not have a parameter named `{name}`."
+                )
+
+    def _captured(name: str | None) -> bool:
+        if name is None:
+            return False
+        if include is not None and name not in include:
+            return False
+        return name not in exclude
+
+    positional_captured = tuple(_captured(name) for name in positional_names)
+    var_positional_captured = _captured(var_positional_name)
+
+    if capture.types_only:
+
+        def _render(value) -> str:
+            return type(value).__name__
+
+    elif capture.max_length is not None:
+        max_length = capture.max_length
+        limiter = _LimitedRepr()
+        limiter.maxstring = max_length
+        limiter.maxother = max_length
+        limiter.maxlong = max_length
+
+        def _render(value) -> str:
+            try:
+                text = limiter.repr(value)
+            except Exception:
+                return "`ERROR`"
+            if len(text) > max_length:
+                text = text[: max(max_length - 3, 0)] + "..."
+            return text
+
+    else:
+        _render = _stringify_return
+
+    def _format_call(args: tuple, kwargs: dict) -> str:
+        function_call = f"{func.__name__}("
+        for index, arg in enumerate(args):
+            if index < len(positional_captured):
+                captured = positional_captured[index]
+            else:
+                captured = var_positional_captured
+            function_call += (_render(arg) if captured else "`OMITTED`") + ",\n"
+        for key, value in kwargs.items():
+            captured = _captured(key)
+            function_call += f"{key}={_render(value) if captured else '`OMITTED`'},\n"
+        function_call += ")"
+        return function_call
+
+    return _format_call, _render if capture.capture_return else None
+
+
+@dataclass(frozen=True, slots=True)
+class _BranchTemplate:
+    """Everything `@branch` needs for each call, computed when decorating."""
+
+    name: str
+    tags: Tuple[str, ...] | None
+    metadata: Mapping[str, str | int | float | bool] | None
+    format_call: Callable[[tuple, dict], str]
+    format_return: Callable[[Any], str] | None
+    lazy: bool
+
+
+def _compile_template(
+    func,
+    tags: List[str] | None = None,
+    metadata: Dict[str, str | int | float | bool] | None = None,
+    lazy: bool = False,
+    capture: CapturePolicy | None = None,
+) -> _BranchTemplate:
+    """Creates the branch template of a function, from validated arguments."""
+    format_call, format_return = _compile_capture(func, capture)
+    return _BranchTemplate(
+        name=func.__name__,
+        tags=tuple(tags) if tags else None,
+        metadata=MappingProxyType(dict(metadata)) if metadata else None,
+        format_call=format_call,
+        format_return=format_return,
+        lazy=lazy,
+    )
+
+
 # _async_branch and _sync_branch are split into two functions this way so that
 # we only call inspect.iscoroutinefunction a single time. We want the wrapper
 # overhead to be as small as possible.
+#
+# For the same reason, both wrappers check for active branches before doing
+# anything else. Most calls happen outside of any TreeLogger, and in that case
+# there is nobody to log to, so we skip forking and formatting the arguments.
+# Tags and metadata are validated once, when decorating, and each call creates
+# its branches straight from the template, without validating them again.
+#
+# With `lazy=True`, the arguments and return value are only captured, and are
+# converted to strings on the logging thread when the entries are flushed.
 
 
-def _async_branch(func, tags=None, metadata=None):
+def _async_branch(func, template: _BranchTemplate):
+    name = template.name
+    tags = template.tags
+    metadata = template.metadata
+    format_call = template.format_call
+    format_return = template.format_return
+    lazy = template.lazy
+
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
+        if not _CURRENT_BRANCH_IDS.get():
+            return await func(*args, **kwargs)
+
         try:
-            with fork(name=func.__name__, tags=tags, metadata=metadata):
-                log(
-                    "Function call:\n"
-                    + _stringify_function_call(
-                        func,
-                        args,
-                        kwargs,
-                    ),
-                    MessageType.SYSTEM,
-                )
+            with _fork_trusted(name, tags, metadata):
+                if lazy:
+                    call_message = _LazyFunctionCall(format_call, args, kwargs)
+                else:
+                    call_message = "Function call:\n" + format_call(args, kwargs)
+                _log_trusted(call_message, MessageType.SYSTEM)
 
                 output = await func(*args, **kwargs)
 
-                try:
-                    return_string = f"Function return:\n{output}"
-                except Exception:
-                    return_string = "Function return:\n`ERROR`"
-                log(return_string, MessageType.SYSTEM)
+                if format_return is not None:
+                    if lazy:
+                        return_message = _LazyFunctionReturn(format_return, output)
+                    else:
+                        return_message = "Function return:\n" + format_return(output)
+                    _log_trusted(return_message, MessageType.SYSTEM)
 
                 return output
         except Exception as e:
-            log(e, MessageType.ERROR)
+            _log_trusted(e, MessageType.ERROR)
             raise e
 
     return wrapper
 
 
-def _sync_branch(func, tags=None, metadata=None):
+def _sync_branch(func, template: _BranchTemplate):
+    name = template.name
+    tags = template.tags
+    metadata = template.metadata
+    format_call = template.format_call
+    format_return = template.format_return
+    lazy = template.lazy
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        if not _CURRENT_BRANCH_IDS.get():
+            return func(*args, **kwargs)
+
         try:
-            with fork(name=func.__name__, tags=tags, metadata=metadata):
-                log(
-                    "Function call:\n"
-                    + _stringify_function_call(
-                        func,
-                        args,
-                        kwargs,
-                    ),
-                    MessageType.SYSTEM,
-                )
+            with _fork_trusted(name, tags, metadata):
+                if lazy:
+                    call_message = _LazyFunctionCall(format_call, args, kwargs)
+                else:
+                    call_message = "Function call:\n" + format_call(args, kwargs)
+                _log_trusted(call_message, MessageType.SYSTEM)
 
                 output = func(*args, **kwargs)
 
-                try:
-                    return_string = f"Function return:\n{output}"
-                except Exception:
-                    return_string = "Function return:\n`ERROR`"
-                log(return_string, MessageType.SYSTEM)
+                if format_return is not None:
+                    if lazy:
+                        return_message = _LazyFunctionReturn(format_return, output)
+                    else:
+                        return_message = "Function return:\n" + format_return(output)
+                    _log_trusted(return_message, MessageType.SYSTEM)
 
                 return output
         except Exception as e:
-            log(e, MessageType.ERROR)
+            _log_trusted(e, MessageType.ERROR)
             raise e
 
     return wrapper
@@ -82,6 +312,8 @@ def branch(
     *args,
     tags: List[str] | None = None,
     metadata: Dict[str, str | int | float | bool] | None = None,
+    lazy: bool = False,
+    capture: CapturePolicy | None = None,
 ) -> Callable[..., Any | Awaitable[Any]]:
     """Mark a function for branching.
 
@@ -100,6 +332,19 @@ def branch(
             branch for this function.
         metadata: (Dict[str, str | int | float | bool], optional): An optional
             list of metadata to add to each branch for this function.
+        lazy (bool, optional): Whether to defer converting the arguments and
+            return value to strings until the entries are flushed, on the
+            logging thread. Makes calls cheaper for large arguments, but any
+            changes made to them after the call will show up in the log, and
+            their `__str__` must be safe to call from another thread. Defaults
+            to False.
+        capture (CapturePolicy, optional): Which arguments to log, and how.
+            Defaults to None, which logs the full string of every argument
+            and of the return value.
+
+    Raises:
+        ValueError: If the tags, metadata or `capture` are invalid, or if
+            `capture` names a parameter which the function does not have.
     """
     # We might have a tag or metadata arg that got passed as the first argument
     # (i.e. into _func), so we should check
@@ -115,19 +360,19 @@ def branch(
 
     @functools.wraps(_func)
     def _branch(func):
+        template = _compile_template(
+            func=func,
+            tags=tags,
+            metadata=metadata,
+            lazy=lazy,
+            capture=capture,
+        )
+
         if inspect.iscoroutinefunction(func):
-            return _async_branch(
-                func=func,
-                tags=tags,
-                metadata=metadata,
-            )
+            return _async_branch(func=func, template=template)
 
         else:
-            return _sync_branch(
-                func=func,
-                tags=tags,
-                metadata=metadata,
-            )
+            return _sync_branch(func=func, template=template)
 
     if _func is None:
         return _branch
@@ -7,7 +7,7 @@ from contextlib import nullcontext
 from bramble.contextual import log, apply, context, disable, enable, fork
 from bramble.utils import _stringify_function_call
 from bramble.backends.base import BrambleWriter
-from bramble.logs import MessageType, LogEntry
+from bramble.logs import MessageType, LogEntry, LazyMessage
 from bramble.loggers import TreeLogger, LogBranch
 from bramble.wrapper import branch
 
@@ -148,16 +148,14 @@ def test_branch_decorator_logs_exceptions(simple_logger):
         will_fail()
 
     task = None
-    while not simple_logger._tasks.empty():
-        candidate = simple_logger._tasks.get_nowait()
+    for candidate in simple_logger._drain():
         if (
             isinstance(candidate[2], LogEntry)
             and candidate[2].message_type == MessageType.ERROR
         ):
             task = candidate
             break
-    print(task)
-    assert "ValueError" in task[2].message
+    assert "ValueError" in task[2].message.render()
     assert task[2].message_type == MessageType.ERROR
 
 
@@ -315,3 +313,116 @@ def test_enable_reactivates_logging(mock_backend):
     with TreeLogger(logging_backend=mock_backend) as logger:
         enable()  # should be a no-op if already enabled
         log("still logs")
+
+
+def test_log_outside_logger_still_validates():
+    log("fine outside of a logger")
+    log(ValueError("not formatted outside of a logger"))
+
+    with pytest.raises(ValueError):
+        log(123)
+
+    with pytest.raises(ValueError):
+        log("hello", entry_metadata={"bad": object()})
+
+
+def test_log_to_many_branches_enqueues_one_shared_entry(simple_logger):
+    root = simple_logger.root
+    first = root.branch("first")
+    second = root.branch("second")
+    simple_logger._drain()
+
+    with context([first, second]):
+        log("shared message", MessageType.USER, {"k": 1})
+
+    [task] = simple_logger._drain()
+    assert task[0] == 4
+    assert set(task[1]) == {first.id, second.id}
+    assert task[2].message == "shared message"
+
+
+def test_file_backend_stores_shared_entry_for_each_branch(tmp_path):
+    from bramble.backends import FileReader, FileWriter
+
+    with TreeLogger(logging_backend=FileWriter(str(tmp_path))) as logger:
+        first = logger.root.branch("first")
+        second = logger.root.branch("second")
+        with context([first, second]):
+            log("shared message")
+
+    branches = FileReader(str(tmp_path)).get_branches([first.id, second.id])
+    for branch_data in branches.values():
+        assert [entry.message for entry in branch_data.messages] == ["shared message"]
+
+
+def test_log_to_many_branches_shares_entry_with_backend(mock_backend):
+    captured_entries = {}
+
+    async def capture_entries(entries):
+        captured_entries.update(entries)
+
+    mock_backend.async_append_entries.side_effect = capture_entries
+
+    with TreeLogger(logging_backend=mock_backend) as logger:
+        first = logger.root.branch("first")
+        second = logger.root.branch("second")
+        with context([first, second]):
+            log("shared message")
+
+    [first_entry] = captured_entries[first.id]
+    [second_entry] = captured_entries[second.id]
+    assert first_entry is second_entry
+
+
+def test_lazy_messages_are_rendered_when_flushed(mock_backend):
+    captured_entries = {}
+
+    async def capture_entries(entries):
+        captured_entries.update(entries)
+
+    mock_backend.async_append_entries.side_effect = capture_entries
+
+    class Counted:
+        renders = 0
+
+        def __str__(self):
+            Counted.renders += 1
+            return "counted"
+
+    with TreeLogger(logging_backend=mock_backend) as logger:
+        first = logger.root.branch("first")
+        second = logger.root.branch("second")
+        with context([first, second]):
+            log(LazyMessage("value: {!s}", Counted()))
+            # Capturing the message does not render it
+            assert Counted.renders == 0
+
+    [first_entry] = captured_entries[first.id]
+    [second_entry] = captured_entries[second.id]
+    assert first_entry.message == "value: counted"
+    assert first_entry is second_entry
+    assert Counted.renders == 1
+
+
+def test_lazy_branch_decorator_defers_formatting(mock_backend):
+    received_entries = {}
+
+    async def capture_entries(entries):
+        received_entries.update(entries)
+
+    mock_backend.async_append_entries.side_effect = capture_entries
+
+    with TreeLogger(logging_backend=mock_backend) as logger:
+
+        @branch(lazy=True)
+        def double(value):
+            return value * 2
+
+        assert double(21) == 42
+
+    [messages] = [
+        [entry.message for entry in entries]
+        for branch_id, entries in received_entries.items()
+        if branch_id != logger.root.id
+    ]
+    assert messages == ["Function call:\ndouble(21,\n)", "Function return:\n42"]
@@ -0,0 +1,819 @@
+import json
+import os
+
+import pytest
+
+from bramble.backends import FileReader, FileWriter
+from bramble.contextual import fork, log
+from bramble.loggers import TreeLogger
+from bramble.logs import BranchStatus
+
+
+def test_file_backend_round_trip(tmp_path):
+    writer = FileWriter(str(tmp_path))
+
+    with TreeLogger(logging_backend=writer, debounce=0.01) as logger:
+        with fork("child", tags=["tag"], metadata={"key": 1}):
+            log("hello")
+
+    reader = FileReader(str(tmp_path))
+    [child_id] = logger.root.children
+    branches = reader.get_branches([logger.root.id, child_id])
+
+    child = branches[child_id]
+    assert child.name == "child"
+    assert child.parent == logger.root.id
+    assert child.tags == ["tag"]
+    assert child.metadata == {"key": 1}
+    assert [entry.message for entry in child.messages] == ["hello"]
+    assert branches[logger.root.id].children == [child_id]
+
+
+def test_file_backend_records_lifecycle(tmp_path):
+    writer = FileWriter(str(tmp_path))
+
+    with TreeLogger(logging_backend=writer, debounce=0.01) as logger:
+        try:
+            with fork("failed"):
+                raise RuntimeError("failed")
+        except RuntimeError:
+            pass
+
+    reader = FileReader(str(tmp_path))
+    [child_id] = logger.root.children
+    branches = reader.get_branches([logger.root.id, child_id])
+
+    child = branches[child_id]
+    assert child.status == BranchStatus.ERROR
+    assert child.start <= child.end
+    assert child.duration == pytest.approx(child.end - child.start, abs=0.01)
+    assert branches[logger.root.id].status == BranchStatus.OK
+
+
+def test_file_reader_loads_files_without_lifecycle(tmp_path):
+    legacy = {
+        "abc": {
+            "messages": [
+                {
+                    "message": "old",
+                    "timestamp": 1.0,
+                    "message_type": "user",
+                    "entry_metadata": None,
+                }
+            ],
+            "metadata": {"name": "legacy", "parent": None, "children": []},
+            "tags": [],
+        }
+    }
+    path = os.path.join(tmp_path, "bramble_logging_storage_partition_0.jsonl")
+    with open(path, "w") as file:
+        json.dump(legacy, file)
+
+    branch = FileReader(str(tmp_path)).get_branches(["abc"])["abc"]
+    assert branch.name == "legacy"
+    assert branch.start is None
+    assert branch.status is None
+
+
+def test_file_writer_extends_tree_tags_and_metadata(tmp_path):
+    import asyncio
+
+    writer = FileWriter(str(tmp_path))
+
+    async def write():
+        await writer.async_update_branch_metadata({"abc": {"name": "parent"}})
+        await writer.async_extend_tree({"abc": (None, ["one"])})
+        await writer.async_extend_tree({"abc": (None, ["two"])})
+        await writer.async_add_tags({"abc": ["a", "b"]})
+        await writer.async_add_tags({"abc": ["b", "c"]})
+        await writer.async_update_branch_metadata({"abc": {"key": 1}})
+
+    asyncio.run(write())
+
+    branch = FileReader(str(tmp_path)).get_branches(["abc"])["abc"]
+    assert branch.parent is None
+    assert branch.children == ["one", "two"]
+    assert branch.tags == ["a", "b", "c"]
+    assert branch.metadata == {"key": 1}
+    assert branch.name == "parent"
+
+
+def test_file_writer_appends_each_partition_once_per_batch(tmp_path):
+    import asyncio
+
+    from bramble.backends.base import WriteBatch
+    from bramble.logs import BranchCreation, LogEntry, MessageType
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1)
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+    batch = WriteBatch(
+        created={
+            "a": BranchCreation("a", None, [], {"name": "a"}, 1.0),
+            "b": BranchCreation("b", "a", ["tag"], {"name": "b"}, 1.0),
+        },
+        entries={"a": [entry], "b": [entry]},
+        metadata={"a": {"key": 1}},
+        lifecycle={"b": {"end": 2.0, "duration": 1.0, "status": "ok"}},
+    )
+    asyncio.run(writer.async_write_batch(batch))
+
+    [segment] = os.listdir(tmp_path)
+    with open(os.path.join(tmp_path, segment)) as file:
+        assert len(file.readlines()) == 7
+
+    branches = FileReader(str(tmp_path)).get_branches(["a", "b"])
+    assert branches["a"].children == ["b"]
+    assert branches["a"].metadata == {"key": 1}
+    assert branches["b"].tags == ["tag"]
+    assert branches["b"].status == BranchStatus.OK
+
+
+def _write_flushes(writer, num_flushes, measure=False):
+    import asyncio
+
+    from bramble.logs import LogEntry, MessageType
+
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+    sizes = []
+
+    async def write():
+        await writer.async_update_branch_metadata({"a": {"name": "a"}})
+        for _ in range(num_flushes):
+            await writer.async_append_entries({"a": [entry]})
+            if measure:
+                sizes.append(
+                    sum(
+                        os.path.getsize(os.path.join(writer.base_path, name))
+                        for name in os.listdir(writer.base_path)
+                    )
+                )
+        await writer.async_compact()
+
+    asyncio.run(write())
+    return sizes
+
+
+def test_file_writer_only_writes_new_data(tmp_path):
+    sizes = _write_flushes(FileWriter(str(tmp_path)), 100, measure=True)
+    growth = {after - before for before, after in zip(sizes, sizes[1:])}
+    assert len(growth) == 1
+
+
+def test_file_writer_compacts_segments_into_snapshot(tmp_path):
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1, max_segment_bytes=500)
+    _write_flushes(writer, 100)
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "bramble_logging_storage_partition_0.index.json",
+        "bramble_logging_storage_partition_0.jsonl",
+    ]
+    branch = FileReader(str(tmp_path)).get_branches(["a"])["a"]
+    assert len(branch.messages) == 100
+
+
+def test_file_writer_compacts_after_its_logger_stops(tmp_path):
+    import asyncio
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1, max_segment_bytes=200)
+    with TreeLogger(logging_backend=writer, debounce=0.001) as logger:
+        for index in range(200):
+            logger.root.log(f"message {index}")
+
+    # Compactions which were still running when the loop of the logger ended
+    # are picked up by a call from another loop
+    asyncio.run(writer.async_compact())
+    assert not writer._compactions
+    assert sorted(os.listdir(tmp_path)) == [
+        "bramble_logging_storage_partition_0.index.json",
+        "bramble_logging_storage_partition_0.jsonl",
+    ]
+    branch = FileReader(str(tmp_path)).get_branches([logger.root.id])[logger.root.id]
+    assert len(branch.messages) == 200
+
+
+def test_file_writer_compacts_on_its_own_threads(tmp_path, monkeypatch):
+    import threading
+
+    from bramble.backends import file_backend
+
+    compact_partition = file_backend._compact_partition
+    threads = []
+
+    def _compact_and_record(*args):
+        threads.append(threading.current_thread().name)
+        return compact_partition(*args)
+
+    monkeypatch.setattr(file_backend, "_compact_partition", _compact_and_record)
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1, max_segment_bytes=500)
+    _write_flushes(writer, 20)
+
+    assert threads
+    assert all(name.startswith("bramble-file-writer") for name in threads)
+
+
+def test_file_reader_replays_segments_after_snapshot(tmp_path):
+    import asyncio
+
+    from bramble.logs import LogEntry, MessageType
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1)
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+
+    async def write():
+        await writer.async_update_branch_metadata({"a": {"name": "a"}})
+        await writer.async_append_entries({"a": [entry]})
+        await writer.async_compact()
+        await writer.async_append_entries({"a": [entry, entry]})
+
+    asyncio.run(write())
+
+    # A write which was cut short leaves a partial record
+    [segment] = [
+        name
+        for name in os.listdir(tmp_path)
+        if name.endswith(".jsonl") and name.count(".") == 2
+    ]
+    with open(os.path.join(tmp_path, segment), "a") as file:
+        file.write('["entries", "a", [{"mess')
+
+    branch = FileReader(str(tmp_path)).get_branches(["a"])["a"]
+    assert len(branch.messages) == 3
+
+
+def _write_branches(writer, num_flushes, branches_per_flush=10):
+    import asyncio
+
+    from bramble.backends.base import WriteBatch
+    from bramble.logs import BranchCreation, LogEntry, MessageType
+
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+
+    async def write():
+        for index in range(num_flushes):
+            branch_ids = [f"{index}-{branch}" for branch in range(branches_per_flush)]
+            await writer.async_write_batch(
+                WriteBatch(
+                    created={
+                        branch_id: BranchCreation(
+                            branch_id, None, [], {"name": branch_id}, 1.0
+                        )
+                        for branch_id in branch_ids
+                    },
+                    entries={branch_id: [entry] for branch_id in branch_ids},
+                )
+            )
+        await writer.async_compact()
+
+    asyncio.run(write())
+
+
+def test_file_writer_seals_quiet_partitions(tmp_path):
+    writer = FileWriter(
+        str(tmp_path),
+        num_flows_per_partition=10,
+        num_concurrent_writes=1,
+        seal_after=0,
+    )
+    _write_branches(writer, 20)
+
+    # Only the partition which is still being filled is remembered
+    assert len(writer._partition) <= 10
+    assert len(writer._partition_branches) <= 1
+    branches = FileReader(str(tmp_path)).get_branches(["0-0", "19-9"])
+    assert [entry.message for entry in branches["0-0"].messages] == ["hello"]
+    assert branches["19-9"].name == "19-9"
+
+
+def test_file_writer_seals_partitions_over_budget(tmp_path):
+    writer = FileWriter(
+        str(tmp_path),
+        num_flows_per_partition=5,
+        num_concurrent_writes=4,
+        max_open_flows=20,
+    )
+    _write_branches(writer, 20)
+
+    assert len(writer._partition) <= 20
+    reader = FileReader(str(tmp_path))
+    assert len(reader.get_branch_ids()) == 200
+
+
+def test_file_reader_merges_writes_after_sealing(tmp_path):
+    import asyncio
+
+    from bramble.logs import LogEntry, MessageType
+
+    writer = FileWriter(
+        str(tmp_path),
+        num_flows_per_partition=1,
+        num_concurrent_writes=1,
+        seal_after=0,
+    )
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+
+    async def write():
+        await writer.async_update_branch_metadata({"a": {"name": "a"}})
+        await writer.async_append_entries({"a": [entry]})
+        await writer.async_update_branch_metadata({"b": {"name": "b"}})
+        # "a" was sealed once its partition was full, and went quiet
+        await writer.async_append_entries({"a": [entry]})
+        await writer.async_extend_tree({"a": (None, ["b"])})
+        await writer.async_add_tags({"a": ["late"]})
+        await writer.async_update_lifecycle(
+            {"a": {"end": 2.0, "duration": 1.0, "status": "ok"}}
+        )
+        await writer.async_compact()
+
+    asyncio.run(write())
+
+    branch = FileReader(str(tmp_path)).get_branches(["a"])["a"]
+    assert len(branch.messages) == 2
+    assert branch.children == ["b"]
+    assert branch.tags == ["late"]
+    assert branch.status == BranchStatus.OK
+
+
+def _resident_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@pytest.mark.skipif(
+    not os.environ.get("BRAMBLE_SOAK") or not os.path.exists("/proc/self/statm"),
+    reason="memory soak test, set BRAMBLE_SOAK=1 to run (takes about a minute)",
+)
+def test_file_writer_has_bounded_memory(tmp_path):
+    import asyncio
+
+    from bramble.backends.base import WriteBatch
+    from bramble.logs import BranchCreation, LogEntry, MessageType
+
+    writer = FileWriter(str(tmp_path), max_open_flows=10_000, seal_after=0)
+    entry = LogEntry("message " * 10, 1.0, MessageType.USER, None)
+
+    async def write():
+        for index in range(2_000):
+            branch_ids = [f"{index}-{branch}" for branch in range(200)]
+            await writer.async_write_batch(
+                WriteBatch(
+                    created={
+                        branch_id: BranchCreation(
+                            branch_id, None, [], {"name": branch_id}, 1.0
+                        )
+                        for branch_id in branch_ids
+                    },
+                    entries={branch_id: [entry] * 5 for branch_id in branch_ids},
+                    lifecycle={
+                        branch_id: {"end": 2.0, "duration": 1.0, "status": "ok"}
+                        for branch_id in branch_ids
+                    },
+                )
+            )
+            if index == 199:
+                warmed_up = _resident_bytes()
+        await writer.async_compact()
+        return _resident_bytes() - warmed_up
+
+    # 400k branches, with ~300MB of messages, are written in total
+    grown = asyncio.run(write())
+    assert len(writer._partition) <= 10_000
+    assert grown < 32 * 1024 * 1024
+
+
+def test_file_writer_handles_overlapping_batches(tmp_path):
+    import asyncio
+
+    from bramble.backends.base import WriteBatch
+    from bramble.logs import BranchCreation, LogEntry, MessageType
+
+    writer = FileWriter(
+        str(tmp_path),
+        num_flows_per_partition=2,
+        num_concurrent_writes=1,
+        seal_after=0.2,
+    )
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+
+    def created(*branch_ids):
+        return WriteBatch(
+            created={
+                branch_id: BranchCreation(branch_id, None, [], {"name": branch_id}, 1.0)
+                for branch_id in branch_ids
+            }
+        )
+
+    async def write():
+        await writer.async_write_batch(created("a0", "a1"))
+        await asyncio.sleep(0.3)
+        # The second batch writes to the partition the first one seals, as a
+        # TreeLogger with several flushes in flight does
+        await asyncio.gather(
+            writer.async_write_batch(created("a2")),
+            writer.async_write_batch(WriteBatch(entries={"a0": [entry]})),
+        )
+        for _ in range(2):
+            await asyncio.sleep(0.3)
+            await writer.async_write_batch(WriteBatch(entries={"a2": [entry]}))
+        await writer.async_compact()
+
+    asyncio.run(write())
+
+    branches = FileReader(str(tmp_path)).get_branches(["a0", "a2"])
+    assert len(branches["a0"].messages) == 1
+    assert len(branches["a2"].messages) == 2
+
+
+def test_file_writer_writes_partitions_in_parallel(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    from bramble.backends import file_backend
+    from bramble.logs import LogEntry, MessageType
+
+    # Each write waits for the other, so this only passes if they overlap
+    both_writing = threading.Barrier(2, timeout=5)
+    append_records = file_backend._append_records
+
+    def _append_together(path, records):
+        both_writing.wait()
+        return append_records(path, records)
+
+    monkeypatch.setattr(file_backend, "_append_records", _append_together)
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=2, max_write_threads=2)
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+    # "a" and "b" go to different partitions
+    asyncio.run(writer.async_append_entries({"a": [entry], "b": [entry]}))
+
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_file_writer_fsync_policies(tmp_path, monkeypatch):
+    import asyncio
+
+    from bramble.backends import FsyncPolicy
+    from bramble.logs import LogEntry, MessageType
+
+    synced = []
+    fsync = os.fsync
+
+    def _counting_fsync(fd):
+        synced.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", _counting_fsync)
+    entry = LogEntry("hello", 1.0, MessageType.USER, None)
+
+    def _count_syncs(path, policy):
+        writer = FileWriter(path, num_concurrent_writes=1, fsync=policy)
+        synced.clear()
+
+        async def write():
+            for _ in range(10):
+                await writer.async_append_entries({"a": [entry]})
+
+        asyncio.run(write())
+        return len(synced)
+
+    assert _count_syncs(str(tmp_path / "never"), "never") == 0
+    # The segment, and the directory listing it
+    assert _count_syncs(str(tmp_path / "flush"), FsyncPolicy.FLUSH) == 20
+    assert _count_syncs(str(tmp_path / "interval"), 3600) == 0
+
+    with pytest.raises(ValueError):
+        FileWriter(str(tmp_path), fsync="always")
+    with pytest.raises(ValueError):
+        FileWriter(str(tmp_path), fsync=0)
+
+
+def test_file_reader_follows_compaction(tmp_path):
+    from bramble.backends.file_backend import _read_partition
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1, fsync="flush")
+    _write_flushes(writer, 2)
+
+    # A reader may list a segment which is compacted away before it is read
+    missing_segment = "f" * 16
+    branches, _ = _read_partition(str(tmp_path), 0, [missing_segment])
+    assert len(branches["a"]["messages"]) == 2
+
+
+def test_file_writer_rotates_partitions_by_size_and_age(tmp_path):
+    from bramble.backends.file_backend import _list_partitions
+
+    writer = FileWriter(
+        str(tmp_path / "size"), num_concurrent_writes=1, max_partition_bytes=1_000
+    )
+    _write_branches(writer, 10)
+    by_size = _list_partitions(writer.base_path)
+
+    writer = FileWriter(
+        str(tmp_path / "age"), num_concurrent_writes=1, max_partition_age=1e-9
+    )
+    _write_branches(writer, 10)
+    by_age = _list_partitions(writer.base_path)
+
+    # Each flush of ten branches writes well over 1000 bytes
+    assert len(by_size) == 10
+    assert len(by_age) == 10
+    assert len(FileReader(str(tmp_path / "size")).get_branch_ids()) == 100
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma"])
+def test_file_writer_compresses_sealed_partitions(tmp_path, compression):
+    writer = FileWriter(
+        str(tmp_path / "compressed"),
+        num_flows_per_partition=10,
+        num_concurrent_writes=1,
+        seal_after=0,
+        compression=compression,
+    )
+    _write_branches(writer, 10)
+    plain = FileWriter(str(tmp_path / "plain"), num_flows_per_partition=10)
+    _write_branches(plain, 10)
+
+    def _snapshot_sizes(path):
+        # Indexes are never compressed
+        return {
+            name: os.path.getsize(os.path.join(path, name))
+            for name in os.listdir(path)
+            if not name.endswith(".index.json")
+        }
+
+    # Every partition was filled, and went quiet
+    suffix = {"gzip": ".jsonl.gz", "lzma": ".jsonl.xz"}[compression]
+    compressed = _snapshot_sizes(writer.base_path)
+    assert all(name.endswith(suffix) for name in compressed)
+    assert sum(compressed.values()) < sum(_snapshot_sizes(plain.base_path).values()) / 2
+
+    reader = FileReader(writer.base_path)
+    assert len(reader.get_branch_ids()) == 100
+    branch = reader.get_branches(["0-0"])["0-0"]
+    assert [entry.message for entry in branch.messages] == ["hello"]
+
+
+def test_file_writer_reopens_directory_with_compressed_snapshots(tmp_path):
+    import asyncio
+
+    from bramble.logs import LogEntry, MessageType
+
+    writer = FileWriter(
+        str(tmp_path),
+        num_flows_per_partition=10,
+        num_concurrent_writes=1,
+        seal_after=0,
+        compression="gzip",
+    )
+    _write_branches(writer, 10)
+
+    # A writer on the same directory must not reuse the partitions on disk
+    reopened = FileWriter(str(tmp_path), num_concurrent_writes=1)
+    assert reopened._open_partitions == [10]
+    entry = LogEntry("later", 2.0, MessageType.USER, None)
+
+    async def write():
+        await reopened.async_update_branch_metadata({"late": {"name": "late"}})
+        await reopened.async_append_entries({"late": [entry], "0-0": [entry]})
+        await reopened.async_compact()
+
+    asyncio.run(write())
+
+    reader = FileReader(str(tmp_path))
+    assert len(reader.get_branch_ids()) == 101
+    branches = reader.get_branches(["0-0", "late"])
+    assert [entry.message for entry in branches["late"].messages] == ["later"]
+    assert [entry.message for entry in branches["0-0"].messages] == [
+        "hello",
+        "later",
+    ]
+
+    # Of two snapshots of a partition, the one which merged more is read
+    uncompressed = tmp_path / "bramble_logging_storage_partition_0.jsonl"
+    with open(uncompressed, "w") as f:
+        f.write(json.dumps({"compacted_through": "f" * 16}) + "\n")
+    os.remove(tmp_path / "bramble_logging_storage_partition_0.index.json")
+    assert "0-0" not in FileReader(str(tmp_path)).get_branch_ids()
+
+
+def test_binary_format_interns_strings_across_appends():
+    from bramble.backends.binary_format import decode_records, encode_records
+
+    branch_id = "0123456789abcdef01234567"
+    records = [
+        ["metadata", branch_id, {"name": "branch", "count": 2**70, "ok": True}],
+        ["entries", branch_id, [{"message": "m" * 100, "timestamp": 1.5}]],
+    ]
+    strings = {}
+    first = encode_records(records, strings)
+    second = encode_records(records, strings)
+
+    # Repeated strings are only references the second time around
+    assert len(second) < len(first)
+    assert list(decode_records(first + second)) == records * 2
+    # A partial record ends the segment
+    assert list(decode_records(first + second[:-1])) == records + records[:1]
+
+
+def test_file_backend_round_trip_with_binary_segments(tmp_path):
+    writer = FileWriter(str(tmp_path), file_format="binary")
+
+    with TreeLogger(logging_backend=writer, debounce=0.01) as logger:
+        with fork("child", tags=["tag"], metadata={"key": 1}):
+            log("hello")
+
+    assert all(name.endswith(".bin") for name in os.listdir(tmp_path))
+    reader = FileReader(str(tmp_path))
+    [child_id] = logger.root.children
+    child = reader.get_branches([child_id])[child_id]
+    assert child.name == "child"
+    assert child.parent == logger.root.id
+    assert child.tags == ["tag"]
+    assert child.metadata == {"key": 1}
+    assert [entry.message for entry in child.messages] == ["hello"]
+    assert child.status == BranchStatus.OK
+
+    # Compaction merges binary segments into the usual snapshot
+    writer = FileWriter(
+        str(tmp_path / "compacted"),
+        num_concurrent_writes=1,
+        max_segment_bytes=200,
+        file_format="binary",
+    )
+    _write_flushes(writer, 100)
+    assert sorted(os.listdir(writer.base_path)) == [
+        "bramble_logging_storage_partition_0.index.json",
+        "bramble_logging_storage_partition_0.jsonl",
+    ]
+    branch = FileReader(writer.base_path).get_branches(["a"])["a"]
+    assert len(branch.messages) == 100
+
+
+def test_file_reader_opens_from_indexes(tmp_path, monkeypatch):
+    import asyncio
+
+    from bramble.backends import file_backend
+    from bramble.logs import LogEntry, MessageType
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1)
+
+    async def write(messages):
+        for message in messages:
+            entry = LogEntry(message, 1.0, MessageType.USER, None)
+            await writer.async_append_entries({"a": [entry]})
+
+    _write_flushes(writer, 2)
+    asyncio.run(write(["after compaction"]))
+
+    with open(tmp_path / "bramble_logging_storage_partition_0.index.json") as f:
+        index = json.load(f)
+    assert index["branches"]["a"]["num_entries"] == 2
+    assert index["branches"]["a"]["first_timestamp"] == 1.0
+
+    # Snapshots are not read until messages are asked for
+    def _fail(path):
+        raise AssertionError("the snapshot was read in full")
+
+    monkeypatch.setattr(file_backend, "_read_snapshot", _fail)
+    reader = FileReader(str(tmp_path))
+    assert reader.get_branch_ids() == ["a"]
+
+    branch = reader.get_branches(["a"])["a"]
+    assert [entry.message for entry in branch.messages] == [
+        "hello",
+        "hello",
+        "after compaction",
+    ]
+
+    # If the snapshot is compacted again, the reader opens it again
+    monkeypatch.undo()
+    asyncio.run(write(["later"]))
+    asyncio.run(writer.async_compact())
+    branch = reader.get_branches(["a"])["a"]
+    assert [entry.message for entry in branch.messages][-2:] == [
+        "after compaction",
+        "later",
+    ]
+
+
+def test_file_reader_summarizes_branches_from_indexes(tmp_path, monkeypatch):
+    import asyncio
+
+    from bramble.backends import file_backend
+    from bramble.logs import BranchSummary, LogEntry, MessageType
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1)
+    _write_flushes(writer, 2)
+
+    async def write():
+        entry = LogEntry("after compaction", 3.0, MessageType.USER, None)
+        await writer.async_append_entries({"a": [entry]})
+
+    asyncio.run(write())
+
+    reader = FileReader(str(tmp_path))
+    expected = {
+        branch_id: BranchSummary.from_branch_data(branch)
+        for branch_id, branch in reader.get_branches(["a"]).items()
+    }
+
+    # The messages left in the snapshot are counted from its index
+    def _fail(slices):
+        raise AssertionError("messages were read from the snapshot")
+
+    monkeypatch.setattr(file_backend, "_load_slices", _fail)
+    summaries = asyncio.run(reader.async_get_branch_summaries(["a"]))
+    assert summaries == expected
+    assert summaries["a"].num_entries == 3
+    assert summaries["a"].first_timestamp == 1.0
+    assert summaries["a"].last_timestamp == 3.0
+
+
+def test_file_reader_only_retries_partitions_replaced_while_read(tmp_path, monkeypatch):
+    from bramble.backends import file_backend
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1)
+    _write_flushes(writer, 2)
+
+    # A snapshot removed by a compaction while it is read is read again
+    read_indexed_partition = file_backend._read_indexed_partition
+    calls = []
+
+    def _replaced_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise FileNotFoundError("replaced by a compaction")
+        return read_indexed_partition(*args)
+
+    monkeypatch.setattr(file_backend, "_read_indexed_partition", _replaced_once)
+    assert FileReader(str(tmp_path)).get_branch_ids() == ["a"]
+    assert len(calls) == 2
+    monkeypatch.undo()
+
+    # Anything else is not hidden by dropping the partition
+    with open(tmp_path / "bramble_logging_storage_partition_0.index.json", "w") as f:
+        f.write("{not json")
+    with pytest.raises(ValueError):
+        FileReader(str(tmp_path))
+
+
+def test_file_reader_maps_snapshots_and_segments(tmp_path, monkeypatch):
+    import asyncio
+    import mmap
+
+    from bramble.logs import LogEntry, MessageType
+
+    writer = FileWriter(str(tmp_path), num_concurrent_writes=1)
+    _write_flushes(writer, 2)
+    entry = LogEntry("in a segment", 1.0, MessageType.USER, None)
+    asyncio.run(writer.async_append_entries({"a": [entry]}))
+
+    mapped = []
+
+    class _SpyMap(mmap.mmap):
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                mapped.append(index.stop - index.start)
+            return super().__getitem__(index)
+
+    monkeypatch.setattr(mmap, "mmap", _SpyMap)
+    reader = FileReader(str(tmp_path))
+    branch = reader.get_branches(["a"])["a"]
+
+    assert [entry.message for entry in branch.messages] == [
+        "hello",
+        "hello",
+        "in a segment",
+    ]
+    # The record of the segment, then the line of "a" in the snapshot
+    snapshot_path = tmp_path / "bramble_logging_storage_partition_0.jsonl"
+    assert len(mapped) == 2
+    assert mapped[1] < os.path.getsize(snapshot_path)
+
+
+def test_file_reader_loads_partitions_in_parallel(tmp_path):
+    writer = FileWriter(
+        str(tmp_path),
+        num_flows_per_partition=10,
+        num_concurrent_writes=2,
+        seal_after=0,
+    )
+    _write_branches(writer, 10)
+
+    serial = FileReader(str(tmp_path))
+    parallel = FileReader(str(tmp_path), num_workers=2)
+    branch_ids = serial.get_branch_ids()
+    assert parallel.get_branch_ids() == branch_ids
+    assert parallel._with_tags == serial._with_tags
+    assert parallel.get_branches(branch_ids) == serial.get_branches(branch_ids)
+
+    # The same pool serves every call, until the reader is closed
+    pool = parallel._pool
+    assert pool is not None
+    parallel.get_branches(branch_ids)
+    assert parallel._pool is pool
+    parallel.close()
+    assert parallel._pool is None
+
+    with pytest.raises(ValueError):
+        FileReader(str(tmp_path), num_workers=0)
@@ -1,7 +1,8 @@
+import os
 import pytest
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock
 
-from bramble.loggers import TreeLogger, LogBranch
+from bramble.loggers import TreeLogger, LogBranch, OverflowPolicy
 from bramble.backends.base import BrambleWriter
 from bramble.logs import MessageType
 
@@ -12,6 +13,7 @@ class MockWriter(BrambleWriter):
         self.async_update_tree = AsyncMock()
         self.async_update_branch_metadata = AsyncMock()
         self.async_add_tags = AsyncMock()
+        self.async_update_lifecycle = AsyncMock()
 
 
 @pytest.fixture
@@ -42,19 +44,113 @@ def test_branch_creation_and_linking(mock_backend):
     assert child.name == "child"
 
 
+def test_branches_remember_a_bounded_number_of_children(mock_backend):
+    from bramble.loggers import _MAX_REMEMBERED_CHILDREN
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    children = [
+        logger.root.branch(f"child {index}")
+        for index in range(_MAX_REMEMBERED_CHILDREN + 10)
+    ]
+    logger.root.add_child("adopted")
+
+    assert logger.root.children == [
+        child.id for child in children[:_MAX_REMEMBERED_CHILDREN]
+    ]
+    # The logging thread is still told about every child
+    created = [task[1] for task in logger._drain() if task[0] == 6]
+    assert created[-10:] == [child.id for child in children[-10:]]
+
+
+def test_logger_uses_id_generator(mock_backend):
+    import itertools
+
+    counter = itertools.count()
+    logger = TreeLogger(
+        logging_backend=mock_backend, id_generator=lambda: f"id-{next(counter)}"
+    )
+    child = logger.root.branch("child")
+
+    assert logger.root.id == "id-0"
+    assert child.id == "id-1"
+
+
+def test_logger_rejects_invalid_id_generator(mock_backend):
+    with pytest.raises(ValueError):
+        TreeLogger(logging_backend=mock_backend, id_generator="not-callable")
+
+
+def test_default_branch_ids_sort_by_creation(mock_backend):
+    logger = TreeLogger(logging_backend=mock_backend)
+    children = [logger.root.branch(f"child {index}") for index in range(100)]
+
+    ids = [logger.root.id] + [child.id for child in children]
+    assert sorted(ids) == ids
+
+
 def test_branch_logging_puts_task_in_queue(mock_backend):
     logger = TreeLogger(logging_backend=mock_backend)
     branch = logger.root
 
-    logger._tasks = MagicMock()
+    logger._drain()
     branch.log("A test log", message_type="USER")
 
-    assert logger._tasks.put.called
-    put_args = logger._tasks.put.call_args[0][0]
+    [put_args] = logger._drain()
     assert put_args[0] == 0  # log task
     assert put_args[1] == branch.id
 
 
+def test_tasks_from_many_threads_are_drained_in_order(mock_backend):
+    import threading
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    logger._drain()
+
+    def produce(index):
+        for number in range(100):
+            logger._enqueue((0, str(index), number))
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    tasks = logger._drain()
+    assert len(tasks) == 800
+    for index in range(8):
+        numbers = [task[2] for task in tasks if task[1] == str(index)]
+        assert numbers == list(range(100))
+    assert logger._drain() == []
+
+
+def test_tasks_for_a_shared_branch_keep_their_order_across_threads(mock_backend):
+    import threading
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    logger._drain()
+    turn = threading.Condition()
+    next_number = 0
+
+    # The threads take turns, so that their tasks interleave
+    def produce(index):
+        nonlocal next_number
+        for _ in range(100):
+            with turn:
+                turn.wait_for(lambda: next_number % 8 == index)
+                logger._enqueue((0, "shared", next_number))
+                next_number += 1
+                turn.notify_all()
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [task[2] for task in logger._drain()] == list(range(800))
+
+
 def test_add_tags_valid(mock_backend):
     logger = TreeLogger(logging_backend=mock_backend)
     branch = logger.root
@@ -106,27 +202,25 @@ def test_add_metadata_invalid(bad_metadata, mock_backend):
 
 
 def test_context_sets_and_clears_branch_context(mock_backend):
-    from bramble.contextual import _CURRENT_BRANCH_IDS, _LIVE_BRANCHES
+    from bramble.contextual import _CURRENT_BRANCH_IDS
 
     logger = TreeLogger(logging_backend=mock_backend)
     with logger as ctx_logger:
         assert ctx_logger is logger
         current_ids = _CURRENT_BRANCH_IDS.get()
         assert logger.root.id in current_ids
-        assert logger.root.id in _LIVE_BRANCHES
 
     # After context exit
     assert logger.root.id not in _CURRENT_BRANCH_IDS.get()
-    assert logger.root.id not in _LIVE_BRANCHES
 
 
 def test_log_entry_validation(mock_backend):
     logger = TreeLogger(logging_backend=mock_backend)
     branch = logger.root
-    logger._tasks = MagicMock()
+    logger._drain()
 
     branch.log("Test message", message_type=MessageType.USER, entry_metadata={"k": 1})
-    call = logger._tasks.put.call_args[0][0]
+    [call] = logger._drain()
 
     assert call[0] == 0
     assert isinstance(call[2].message, str)
@@ -148,3 +242,608 @@ def test_add_child_and_set_parent_updates_backend(mock_backend):
     for call in calls:
         relationships = call[1]["relationships"]
         assert isinstance(relationships, dict)
+
+
+def test_flushes_overlap_with_collection():
+    import asyncio
+    import time
+
+    in_flight = 0
+    max_in_flight = 0
+    flushed = []
+
+    async def slow_append(entries):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.2)
+        flushed.extend(entry.message for logs in entries.values() for entry in logs)
+        in_flight -= 1
+
+    backend = MockWriter()
+    backend.async_append_entries.side_effect = slow_append
+
+    with TreeLogger(
+        logging_backend=backend, debounce=0.01, max_concurrent_flushes=2
+    ) as logger:
+        first = logger.root.branch("first")
+        second = logger.root.branch("second")
+        time.sleep(0.3)
+        # Different branches, so the second flush need not wait for the first
+        first.log("first")
+        time.sleep(0.05)
+        second.log("second")
+
+    assert max_in_flight == 2
+    assert sorted(flushed[-2:]) == ["first", "second"]
+
+
+def test_concurrent_flushes_keep_each_branch_in_order():
+    import asyncio
+    import random
+
+    flushed = []
+
+    async def uneven_append(entries):
+        # Later flushes often finish first
+        await asyncio.sleep(random.uniform(0, 0.02))
+        for branch_id, logs in entries.items():
+            flushed.extend((branch_id, entry.message) for entry in logs)
+
+    backend = MockWriter()
+    backend.async_append_entries.side_effect = uneven_append
+
+    with TreeLogger(
+        logging_backend=backend,
+        debounce=0.001,
+        batch_size=1,
+        max_concurrent_flushes=4,
+    ) as logger:
+        branches = [logger.root.branch(f"branch {index}") for index in range(4)]
+        for index in range(200):
+            branches[index % 4].log(f"{index}")
+
+    for offset, branch in enumerate(branches):
+        messages = [message for branch_id, message in flushed if branch_id == branch.id]
+        assert messages == [f"{index}" for index in range(offset, 200, 4)]
+
+
+@pytest.mark.parametrize("bad_value", [0, -1, 1.5, "2"])
+def test_logger_rejects_invalid_max_concurrent_flushes(bad_value, mock_backend):
+    with pytest.raises(ValueError):
+        TreeLogger(logging_backend=mock_backend, max_concurrent_flushes=bad_value)
+
+
+def _blocking_backend():
+    import threading
+
+    release = threading.Event()
+    written = []
+
+    async def blocked_append(entries):
+        import asyncio
+
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        for branch_id, logs in entries.items():
+            written.extend((branch_id, entry) for entry in logs)
+
+    backend = MockWriter()
+    backend.async_append_entries.side_effect = blocked_append
+    return backend, release, written
+
+
+def test_drop_non_error_policy_keeps_errors():
+    backend, release, written = _blocking_backend()
+
+    with TreeLogger(
+        logging_backend=backend,
+        debounce=0.01,
+        max_pending_entries=5,
+        overflow_policy="drop_non_error",
+    ) as logger:
+        for index in range(10):
+            logger.root.log(f"user {index}")
+        logger.root.log("an error", MessageType.ERROR)
+        release.set()
+
+    messages = [entry.message for _, entry in written]
+    assert "an error" in messages
+    assert len([m for m in messages if m.startswith("user")]) == 5
+    assert logger.overflow_stats["dropped_user"] == 5
+    assert logger.overflow_stats["dropped_error"] == 0
+
+    [summary] = [entry for _, entry in written if "Dropped" in entry.message]
+    assert summary.message_type == MessageType.SYSTEM
+    assert summary.entry_metadata["dropped_entries"] == 5
+
+
+def test_drop_oldest_policy_keeps_newest():
+    import time
+
+    backend, release, written = _blocking_backend()
+
+    with TreeLogger(
+        logging_backend=backend,
+        debounce=0.01,
+        max_pending_entries=3,
+        overflow_policy=OverflowPolicy.DROP_OLDEST,
+    ) as logger:
+        # The first flush holds on to one entry while the backend is stuck
+        logger.root.log("stuck")
+        time.sleep(0.1)
+        for index in range(10):
+            logger.root.log(f"entry {index}")
+        time.sleep(0.1)
+        release.set()
+
+    messages = [entry.message for _, entry in written]
+    assert "stuck" in messages
+    assert "entry 9" in messages
+    assert "entry 0" not in messages
+    assert logger.overflow_stats["dropped_user"] > 0
+
+
+def test_block_policy_waits_for_space():
+    import threading
+    import time
+
+    backend, release, written = _blocking_backend()
+
+    with TreeLogger(
+        logging_backend=backend,
+        debounce=0.01,
+        max_pending_entries=2,
+        overflow_policy="block",
+    ) as logger:
+        logger.root.log("one")
+        logger.root.log("two")
+
+        done = threading.Event()
+
+        def log_third():
+            logger.root.log("three")
+            done.set()
+
+        thread = threading.Thread(target=log_third)
+        thread.start()
+        time.sleep(0.1)
+        assert not done.is_set()
+
+        release.set()
+        thread.join(timeout=5)
+        assert done.is_set()
+
+    assert sorted(entry.message for _, entry in written) == ["one", "three", "two"]
+    assert logger.overflow_stats["blocked"] == 1
+    assert logger.overflow_stats["dropped_user"] == 0
+
+
+def test_budget_never_blocks_or_drops_tree_tasks():
+    import threading
+    import time
+
+    backend, release, written = _blocking_backend()
+
+    with TreeLogger(
+        logging_backend=backend,
+        debounce=0.01,
+        max_pending_entries=1,
+        overflow_policy="block",
+    ) as logger:
+        # The budget is used up while the backend is stuck
+        logger.root.log("stuck")
+        time.sleep(0.1)
+
+        branches = []
+        done = threading.Event()
+
+        def build_tree():
+            for index in range(100):
+                child = logger.root.branch(f"child {index}")
+                child.add_tags([f"tag {index}"])
+                child.add_metadata({"index": index})
+                child.close()
+                branches.append(child)
+            done.set()
+
+        thread = threading.Thread(target=build_tree)
+        thread.start()
+        thread.join(timeout=5)
+        # None of the 400 tree tasks waited for the budget
+        assert done.is_set()
+        release.set()
+
+    metadata = {}
+    for call in backend.async_update_branch_metadata.call_args_list:
+        for branch_id, branch_metadata in call[1]["metadata"].items():
+            metadata.setdefault(branch_id, {}).update(branch_metadata)
+    for index, child in enumerate(branches):
+        assert metadata[child.id] == {"name": f"child {index}", "index": index}
+    assert logger.overflow_stats["blocked"] == 0
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_pending_entries": 0},
+        {"max_pending_bytes": -5},
+        {"max_pending_entries": 10, "overflow_policy": "not-a-policy"},
+        {"max_pending_entries": 10, "overflow_policy": 1},
+    ],
+)
+def test_logger_rejects_invalid_budget(kwargs, mock_backend):
+    with pytest.raises(ValueError):
+        TreeLogger(logging_backend=mock_backend, **kwargs)
+
+
+def test_branch_uses_slots(mock_backend):
+    logger = TreeLogger(logging_backend=mock_backend)
+    child = logger.root.branch("child")
+
+    assert not hasattr(child, "__dict__")
+    with pytest.raises(AttributeError):
+        child.unknown_attribute = 1
+
+
+def _live_branch_ids():
+    import gc
+
+    return {obj.id for obj in gc.get_objects() if type(obj) is LogBranch}
+
+
+def test_forked_branches_are_freed_when_scope_ends(mock_backend):
+    from bramble.contextual import fork, context
+
+    with TreeLogger(logging_backend=mock_backend) as logger:
+        with fork("child"):
+            [child] = context()
+            child_id = child.id
+            del child
+            assert child_id in _live_branch_ids()
+
+        assert child_id not in _live_branch_ids()
+        assert logger.root.id in _live_branch_ids()
+
+
+def test_tasks_keep_forked_branches_alive(mock_backend):
+    import asyncio
+    from bramble.contextual import fork, log
+
+    received = {}
+
+    async def capture_entries(entries):
+        for branch_id, logs in entries.items():
+            received.setdefault(branch_id, []).extend(e.message for e in logs)
+
+    mock_backend.async_append_entries.side_effect = capture_entries
+
+    async def outlives_scope(started: asyncio.Event):
+        started.set()
+        await asyncio.sleep(0.01)
+        log("after the fork ended")
+
+    async def main():
+        started = asyncio.Event()
+        with fork("child"):
+            task = asyncio.create_task(outlives_scope(started))
+            await started.wait()
+        await task
+
+    with TreeLogger(logging_backend=mock_backend, debounce=0.01) as logger:
+        asyncio.run(main())
+
+    [child_id] = logger.root.children
+    assert received[child_id] == ["after the fork ended"]
+
+
+def _resident_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@pytest.mark.skipif(
+    not os.environ.get("BRAMBLE_SOAK") or not os.path.exists("/proc/self/statm"),
+    reason="memory soak test, set BRAMBLE_SOAK=1 to run (takes about a minute)",
+)
+def test_million_branches_have_bounded_memory():
+    from bramble.wrapper import branch
+
+    class NullWriter(BrambleWriter):
+        async def async_append_entries(self, entries):
+            pass
+
+        async def async_extend_tree(self, relationships):
+            pass
+
+        async def async_update_branch_metadata(self, metadata):
+            pass
+
+        async def async_add_tags(self, tags):
+            pass
+
+    @branch
+    def leaf(index):
+        return index
+
+    @branch
+    def middle(count):
+        for index in range(count):
+            leaf(index)
+
+    @branch
+    def outer(count):
+        for _ in range(count):
+            middle(count)
+
+    # 100 * 100 * 100 leaves, plus the branches above them
+    with TreeLogger(logging_backend=NullWriter(), max_pending_entries=10_000):
+        live_before = len(_live_branch_ids())
+        for iteration in range(100):
+            outer(100)
+            assert len(_live_branch_ids()) == live_before
+            if iteration == 9:
+                warmed_up = _resident_bytes()
+        grown = _resident_bytes() - warmed_up
+
+    # Keeping ~900k branches alive would take hundreds of megabytes
+    assert grown < 32 * 1024 * 1024
+
+
+def _lifecycle_tasks(logger):
+    return _lifecycle_tasks_from(logger._drain())
+
+
+def _lifecycle_tasks_from(tasks):
+    lifecycle = {}
+    for task in tasks:
+        if task[0] == 5:
+            lifecycle.setdefault(task[1], {}).update(task[2])
+        elif task[0] == 6:
+            lifecycle.setdefault(task[1], {})["start"] = task[6]
+    return lifecycle
+
+
+def test_fork_opens_and_closes_branches(mock_backend):
+    from bramble.contextual import fork, context
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    logger.run = lambda *_, **__: None
+
+    with logger:
+        with fork("ok"):
+            [ok_branch] = context()
+        with pytest.raises(RuntimeError):
+            with fork("failed"):
+                [failed_branch] = context()
+                raise RuntimeError("failed")
+
+        lifecycle = _lifecycle_tasks(logger)
+
+    ok = lifecycle[ok_branch.id]
+    assert ok["status"] == "ok"
+    assert ok["start"] <= ok["end"]
+    assert ok["duration"] == pytest.approx(ok["end"] - ok["start"], abs=0.01)
+    assert lifecycle[failed_branch.id]["status"] == "error"
+
+    # The root is closed when the logger exits
+    assert _lifecycle_tasks(logger)[logger.root.id]["status"] == "ok"
+
+
+def test_branch_times_follow_the_wall_clock(mock_backend, monkeypatch):
+    import time
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    logger._drain()
+    branch = logger.root.branch("child")
+    logger.root.log("logged with the branch")
+
+    # The system clock is stepped back an hour, as NTP might do
+    wall_clock = time.time
+    monkeypatch.setattr(time, "time", lambda: wall_clock() - 3600)
+    branch.close()
+    logger.root.log("logged after the step")
+
+    tasks = logger._drain()
+    lifecycle = _lifecycle_tasks_from(tasks)[branch.id]
+    entries = [task[2] for task in tasks if task[0] == 0]
+    # Start and end are on the same clock as the entries logged with them
+    assert abs(lifecycle["start"] - entries[0].timestamp) < 1
+    assert abs(lifecycle["end"] - entries[1].timestamp) < 1
+    # The duration is not affected by the step
+    assert 0 <= lifecycle["duration"] < 1
+
+
+def test_branch_close_only_records_first_call(mock_backend):
+    logger = TreeLogger(logging_backend=mock_backend)
+    child = logger.root.branch("child")
+    assert _lifecycle_tasks(logger)[child.id].keys() == {"start"}
+
+    child.close("error")
+    child.close()
+    lifecycle = _lifecycle_tasks(logger)
+    assert lifecycle[child.id]["status"] == "error"
+
+    with pytest.raises(ValueError):
+        child.close("not-a-status")
+
+
+def test_lifecycle_is_sent_to_backend(mock_backend):
+    from bramble.wrapper import branch
+
+    @branch
+    def decorated():
+        pass
+
+    with TreeLogger(logging_backend=mock_backend) as logger:
+        decorated()
+
+    lifecycle = {}
+    for call in mock_backend.async_update_lifecycle.call_args_list:
+        for branch_id, fields in call[1]["lifecycle"].items():
+            lifecycle.setdefault(branch_id, {}).update(fields)
+
+    [child_id] = logger.root.children
+    assert lifecycle[child_id]["status"] == "ok"
+    assert lifecycle[logger.root.id]["status"] == "ok"
+
+
+def test_updates_only_carry_what_changed(mock_backend):
+    from bramble.contextual import fork
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    logger.run = lambda *_, **__: None
+    parent = logger.root
+    for index in range(100):
+        parent.branch(f"child {index}")
+        parent.add_tags([f"tag {index}"])
+        parent.add_metadata({f"key {index}": index})
+    logger._drain()
+
+    parent.branch("last")
+    parent.add_tags(["last"])
+    parent.add_metadata({"last": True})
+    with logger:
+        with fork("forked", tags=["tag"], metadata={"key": 1}):
+            pass
+
+    tasks = [task for task in logger._drain() if task[0] in (1, 2, 3, 6)]
+    parent_tasks = [task for task in tasks if task[1] == parent.id]
+    assert parent_tasks == [
+        (3, parent.id, ("last",)),
+        (2, parent.id, {"last": True}),
+    ]
+
+    # New children are announced by their own creation, not by the parent
+    created = {task[1]: task for task in tasks if task[0] == 6}
+    assert created[parent.children[-2]][2:6] == (parent.id, "last", None, None)
+    assert created[parent.children[-1]][2:6] == (
+        parent.id,
+        "forked",
+        ("tag",),
+        {"key": 1},
+    )
+
+    # The writer never holds the dicts owned by the branches
+    for task in tasks:
+        if task[0] == 2:
+            assert task[2] is not parent.metadata
+            assert len(task[2]) <= 2
+
+
+def test_batch_merges_tree_updates():
+    from bramble.loggers import _Batch
+
+    batch = _Batch()
+    batch.add((1, "child", "parent", ()))
+    batch.add((1, "parent", None, ("child",)))
+    batch.add((1, "parent", None, ("other",)))
+    batch.add((1, "child", None, ("grandchild",)))
+
+    assert batch.tree_tasks == {
+        "child": ("parent", ["grandchild"]),
+        "parent": (None, ["child", "other"]),
+    }
+
+
+def test_default_extend_tree_sends_full_relationships(mock_backend):
+    import asyncio
+
+    async def extend():
+        await mock_backend.async_extend_tree({"parent": (None, ["a"])})
+        await mock_backend.async_extend_tree({"parent": (None, ["b", "a"])})
+        await mock_backend.async_extend_tree({"a": ("parent", [])})
+
+    # The relationships are held in memory, which is warned about once
+    with pytest.warns(UserWarning, match="extend_tree") as warned:
+        asyncio.run(extend())
+    assert len(warned) == 1
+
+    calls = [
+        call[1]["relationships"]
+        for call in mock_backend.async_update_tree.call_args_list
+    ]
+    assert calls == [
+        {"parent": (None, ["a"])},
+        {"parent": (None, ["a", "b"])},
+        {"a": ("parent", [])},
+    ]
+
+
+def test_branching_enqueues_a_single_task(mock_backend):
+    from bramble.contextual import disable
+    from bramble.loggers import _Batch
+
+    logger = TreeLogger(logging_backend=mock_backend)
+    logger._drain()
+
+    child = logger.root.branch("child")
+    [task] = logger._drain()
+    assert task[:4] == (6, child.id, logger.root.id, "child")
+
+    batch = _Batch()
+    batch.add(task)
+    batch.add((2, child.id, {"key": 1}))
+    batch.add((3, child.id, ("tag",)))
+
+    created = batch.created_tasks[child.id]
+    assert created.parent == logger.root.id
+    assert created.metadata == {"name": "child", "key": 1}
+    assert created.tags == ["tag"]
+    assert not batch.meta_tasks and not batch.tag_tasks
+
+    [entry] = batch.log_tasks[logger.root.id]
+    assert entry.message == "Branched Logger: `child`"
+    assert entry.message_type == MessageType.SYSTEM
+    assert entry.entry_metadata == {"branch_id": child.id}
+
+    with disable():
+        logger.root.branch("quiet")
+    batch = _Batch()
+    [task] = logger._drain()
+    batch.add(task)
+    assert not batch.log_tasks
+
+
+def test_default_create_branches_uses_other_functions(mock_backend):
+    with TreeLogger(logging_backend=mock_backend) as logger:
+        logger.root.branch("child")
+
+    [child_id] = logger.root.children
+
+    def merged(mock, key):
+        merged = {}
+        for call in mock.call_args_list:
+            merged.update(call[1][key])
+        return merged
+
+    metadata = merged(mock_backend.async_update_branch_metadata, "metadata")
+    assert metadata[child_id] == {"name": "child"}
+    relationships = merged(mock_backend.async_update_tree, "relationships")
+    assert relationships[child_id] == (logger.root.id, [])
+    assert relationships[logger.root.id] == (None, [child_id])
+    lifecycle = merged(mock_backend.async_update_lifecycle, "lifecycle")
+    assert "start" in lifecycle[child_id]
+
+
+def test_flush_sends_one_write_batch(mock_backend):
+    from bramble.backends.base import WriteBatch
+
+    mock_backend.async_write_batch = AsyncMock()
+
+    with TreeLogger(logging_backend=mock_backend) as logger:
+        child = logger.root.branch("child")
+        child.log("hello")
+        child.add_tags(["tag"])
+
+    batches = [
+        call[1]["batch"] for call in mock_backend.async_write_batch.call_args_list
+    ]
+    assert all(isinstance(batch, WriteBatch) for batch in batches)
+    created = {}
+    tags = []
+    for batch in batches:
+        created.update(batch.created)
+        tags.extend(batch.tags.get(child.id, []))
+    assert created[child.id].tags + tags == ["tag"]
+    mock_backend.async_append_entries.assert_not_called()
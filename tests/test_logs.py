@@ -2,7 +2,13 @@ import pytest
 from datetime import datetime
 import dataclasses
 
-from bramble.logs import MessageType, LogEntry, BranchData
+from bramble.logs import (
+    MessageType,
+    BranchStatus,
+    LogEntry,
+    BranchData,
+    BranchSummary,
+)
 
 
 def test_message_type_from_valid_strings():
@@ -168,6 +174,95 @@ def test_branch_data_serialization_and_deserialization():
     assert reconstructed == branch
 
 
+def test_branch_data_serializes_lifecycle():
+    branch = BranchData(
+        id="abc123",
+        name="root",
+        parent=None,
+        children=[],
+        messages=[],
+        tags=[],
+        metadata={},
+        start=10.0,
+        end=12.5,
+        duration=2.5,
+        status=BranchStatus.ERROR,
+    )
+
+    as_dict = branch.as_dict()
+    assert as_dict["start"] == 10.0
+    assert as_dict["end"] == 12.5
+    assert as_dict["duration"] == 2.5
+    assert as_dict["status"] == "error"
+
+    reconstructed = BranchData.from_dict(as_dict)
+    assert reconstructed == branch
+
+
+def test_branch_summary_from_branch_data():
+    branch = BranchData(
+        id="abc123",
+        name="root",
+        parent=None,
+        children=["child"],
+        messages=[
+            LogEntry("later", 2.0, MessageType.USER, None),
+            LogEntry("earlier", 1.0, MessageType.USER, None),
+        ],
+        tags=["tag"],
+        metadata={"key": 1},
+        start=0.5,
+        status=BranchStatus.OK,
+    )
+
+    summary = BranchSummary.from_branch_data(branch)
+    assert summary.num_entries == 2
+    assert summary.first_timestamp == 1.0
+    assert summary.last_timestamp == 2.0
+    assert (summary.name, summary.tags, summary.metadata) == (
+        "root",
+        ["tag"],
+        {"key": 1},
+    )
+    assert summary.start == 0.5
+    assert summary.end is None
+    assert summary.status == BranchStatus.OK
+
+    empty = BranchSummary.from_branch_data(dataclasses.replace(branch, messages=[]))
+    assert empty.num_entries == 0
+    assert empty.first_timestamp is None
+
+
+def test_branch_summaries_fall_back_to_async_get_branches():
+    import asyncio
+
+    from bramble.backends.base import BrambleReader
+
+    branch = BranchData(
+        id="abc123",
+        name="root",
+        parent=None,
+        children=[],
+        messages=[LogEntry("msg", 1.0, MessageType.USER, None)],
+        tags=[],
+        metadata={},
+    )
+
+    class AsyncReader(BrambleReader):
+        async def async_get_branches(self, branch_ids):
+            return {branch.id: branch}
+
+    summaries = asyncio.run(AsyncReader().async_get_branch_summaries(["abc123"]))
+    assert summaries == {"abc123": BranchSummary.from_branch_data(branch)}
+
+
+def test_branch_status_from_string():
+    assert BranchStatus.from_string(" OK ") == BranchStatus.OK
+    assert BranchStatus.from_string("error") == BranchStatus.ERROR
+    with pytest.raises(ValueError):
+        BranchStatus.from_string("unknown")
+
+
 def test_branch_data_from_dict_invalid_input_type():
     with pytest.raises(ValueError, match="must be a dictionary"):
         BranchData.from_dict(["not", "a", "dict"])
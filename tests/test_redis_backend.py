@@ -0,0 +1,305 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("redis")
+pytest.importorskip("msgpack")
+
+from redis.exceptions import DataError
+
+from bramble.backends.base import WriteBatch
+from bramble.backends.redis_backend import REDIS_PREFIX, RedisReader, RedisWriter
+from bramble.logs import (
+    BranchCreation,
+    BranchStatus,
+    BranchSummary,
+    LogEntry,
+    MessageType,
+)
+
+
+class _FakeRedis:
+    """The commands used by the redis backend, kept in memory.
+
+    Values are stored as bytes, as redis returns them, and every pipeline
+    that is executed is recorded, with its commands.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.executed = []
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def keys(self, pattern):
+        prefix, suffix = pattern.split("*")
+        return [
+            key.encode()
+            for key in self.data
+            if key.startswith(prefix) and key.endswith(suffix)
+        ]
+
+    def run(self, command, key, *args, **kwargs):
+        return getattr(self, "_" + command)(key, *args, **kwargs)
+
+    def _set(self, key, value):
+        self.data[key] = _encode(value)
+
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _delete(self, key):
+        self.data.pop(key, None)
+
+    def _sadd(self, key, *values):
+        if not values:
+            raise DataError("'sadd' with no values")
+        self.data.setdefault(key, set()).update(map(_encode, values))
+
+    def _smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def _rpush(self, key, *values):
+        if not values:
+            raise DataError("'rpush' with no values")
+        self.data.setdefault(key, []).extend(map(_encode, values))
+
+    def _lrange(self, key, start, end):
+        values = self.data.get(key, [])
+        return values[start : None if end == -1 else end + 1]
+
+    def _llen(self, key):
+        return len(self.data.get(key, []))
+
+    def _lindex(self, key, index):
+        values = self.data.get(key, [])
+        return values[index] if -len(values) <= index < len(values) else None
+
+    def _hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        if not fields:
+            raise DataError("'hset' with no key value pairs")
+        self.data.setdefault(key, {}).update(
+            {_encode(field): _encode(value) for field, value in fields.items()}
+        )
+
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, command):
+        def _queue(key, *args, **kwargs):
+            # Redis checks the arguments of a command when it is queued
+            if command in ["sadd", "rpush"] and not args:
+                raise DataError(f"'{command}' with no values")
+            if command == "hset" and not args and not kwargs.get("mapping"):
+                raise DataError("'hset' with no key value pairs")
+            self.commands.append((command, key, args, kwargs))
+
+        return _queue
+
+    async def execute(self):
+        self.redis.executed.append([command for command, *_ in self.commands])
+        return [
+            self.redis.run(command, key, *args, **kwargs)
+            for command, key, args, kwargs in self.commands
+        ]
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, float):
+        return repr(value).encode()
+    return str(value).encode()
+
+
+def _entry(message, timestamp=1.0):
+    return LogEntry(message, timestamp, MessageType.USER, None)
+
+
+def _creation(name, parent=None, tags=(), start=1.0):
+    return BranchCreation(
+        name=name,
+        parent=parent,
+        tags=list(tags),
+        metadata={"name": name},
+        start=start,
+    )
+
+
+def _write_and_read(batch):
+    redis = _FakeRedis()
+    asyncio.run(RedisWriter(redis).async_write_batch(batch))
+    reader = RedisReader(redis)
+
+    async def read():
+        branch_ids = await reader.async_get_branch_ids()
+        return await reader.async_get_branches(branch_ids)
+
+    return redis, reader, asyncio.run(read())
+
+
+def test_redis_writer_writes_each_batch_in_one_round_trip():
+    redis, _, branches = _write_and_read(
+        WriteBatch(
+            created={"root": _creation("root"), "child": _creation("child", "root")},
+            entries={"root": [_entry("hello")], "child": [_entry("world")]},
+            relationships={"root": (None, ["child"])},
+            metadata={"child": {"key": 1}},
+            tags={"child": ["tag"]},
+            lifecycle={"child": {"end": 2.0, "duration": 1.0, "status": "ok"}},
+        )
+    )
+
+    # The write is a single pipeline, and the read that follows it another
+    assert len(redis.executed) == 2
+    assert {"rpush", "sadd", "hset"} <= set(redis.executed[0])
+    child = branches["child"]
+    assert child.name == "child"
+    assert child.parent == "root"
+    assert child.tags == ["tag"]
+    assert child.metadata == {"name": "child", "key": 1}
+    assert [entry.message for entry in child.messages] == ["world"]
+    assert branches["root"].children == {"child"}
+
+
+def test_redis_writer_creates_branches():
+    _, _, branches = _write_and_read(
+        WriteBatch(
+            created={
+                "root": _creation("root"),
+                "child": _creation("child", "root", tags=["a", "b"], start=5.0),
+            },
+            entries={"root": [_entry("hello")], "child": [_entry("world")]},
+        )
+    )
+
+    child = branches["child"]
+    assert child.parent == "root"
+    assert sorted(child.tags) == ["a", "b"]
+    assert child.start == 5.0
+    assert child.end is None
+    # Creating a branch adds it to the children of its parent
+    assert branches["root"].children == {"child"}
+    assert branches["root"].parent is None
+
+
+def test_redis_writer_stores_fan_out_entries_once():
+    entry = _entry("shared")
+    redis, _, branches = _write_and_read(
+        WriteBatch(
+            created={"a": _creation("a"), "b": _creation("b")},
+            entries={"a": [entry, _entry("own")], "b": [entry]},
+        )
+    )
+
+    payloads = [key for key in redis.data if key.startswith(REDIS_PREFIX + "entry:")]
+    assert len(payloads) == 1
+    assert [entry.message for entry in branches["a"].messages] == ["shared", "own"]
+    assert [entry.message for entry in branches["b"].messages] == ["shared"]
+
+
+def test_redis_writer_records_lifecycle():
+    _, _, branches = _write_and_read(
+        WriteBatch(
+            created={"a": _creation("a", start=1.0)},
+            entries={"a": [_entry("hello")]},
+            lifecycle={"a": {"end": 3.5, "duration": 2.5, "status": "error"}},
+        )
+    )
+
+    branch = branches["a"]
+    assert (branch.start, branch.end, branch.duration) == (1.0, 3.5, 2.5)
+    assert branch.status == BranchStatus.ERROR
+
+
+def test_redis_writer_sends_only_changes():
+    redis = _FakeRedis()
+    writer = RedisWriter(redis)
+
+    async def write():
+        await writer.async_create_branches({"root": _creation("root")})
+        await writer.async_append_entries({"root": [_entry("hello")]})
+        await writer.async_extend_tree({"root": (None, ["a"])})
+        await writer.async_extend_tree({"root": (None, ["b"])})
+        await writer.async_update_branch_metadata({"root": {"first": 1}})
+        await writer.async_update_branch_metadata({"root": {"second": 2}})
+        await writer.async_add_tags({"root": ["x"]})
+        await writer.async_add_tags({"root": ["y"]})
+
+    asyncio.run(write())
+    root = asyncio.run(RedisReader(redis).async_get_branches(["root"]))["root"]
+    assert root.children == {"a", "b"}
+    assert root.metadata == {"name": "root", "first": 1, "second": 2}
+    assert sorted(root.tags) == ["x", "y"]
+
+    # The relationships of a branch are replaced by `update_tree`
+    asyncio.run(writer.async_update_tree({"root": ("parent", ["c"])}))
+    root = asyncio.run(RedisReader(redis).async_get_branches(["root"]))["root"]
+    assert root.parent == "parent"
+    assert root.children == {"c"}
+
+
+def test_redis_writer_skips_empty_updates():
+    redis = _FakeRedis()
+    writer = RedisWriter(redis)
+
+    async def write():
+        await writer.async_create_branches({"a": _creation("a")})
+        await writer.async_write_batch(
+            WriteBatch(
+                entries={"a": []},
+                relationships={"a": (None, [])},
+                metadata={"a": {}},
+                tags={"a": []},
+                lifecycle={"a": {}},
+            )
+        )
+        await writer.async_update_branch_metadata({"a": {}})
+        await writer.async_add_tags({"a": []})
+        await writer.async_update_lifecycle({"a": {}})
+
+    asyncio.run(write())
+    assert redis.executed[1:] == [[], [], [], []]
+
+
+def test_redis_reader_summarizes_branches_without_messages():
+    redis, reader, branches = _write_and_read(
+        WriteBatch(
+            created={"a": _creation("a"), "b": _creation("b"), "c": _creation("c")},
+            entries={
+                "a": [_entry("first", 1.0), _entry("middle", 2.0)],
+                "b": [_entry("only", 4.0)],
+            },
+            lifecycle={"a": {"end": 5.0, "duration": 4.0, "status": "ok"}},
+        )
+    )
+    asyncio.run(RedisWriter(redis).async_append_entries({"a": [_entry("last", 3.0)]}))
+    # A branch without entries is not listed, but can still be read
+    branches = asyncio.run(reader.async_get_branches(["a", "b", "c"]))
+
+    summaries = asyncio.run(reader.async_get_branch_summaries(["a", "b", "c"]))
+    assert summaries == {
+        branch_id: BranchSummary.from_branch_data(branch)
+        for branch_id, branch in branches.items()
+    }
+    assert summaries["a"].num_entries == 3
+    assert (summaries["a"].first_timestamp, summaries["a"].last_timestamp) == (
+        1.0,
+        3.0,
+    )
+    assert summaries["c"].num_entries == 0
+    # Only the first and last entries are read
+    assert "lrange" not in redis.executed[-1]
@@ -3,8 +3,11 @@ from bramble.utils import (
     _validate_log_call,
     _validate_tags_and_metadata,
     _stringify_function_call,
+    set_validation,
+    ValidationMode,
+    time_ordered_id,
 )
-from bramble.logs import MessageType
+from bramble.logs import MessageType, LazyMessage
 
 
 def test_validate_log_call_str_message_and_default_type():
@@ -19,11 +22,33 @@ def test_validate_log_call_exception_message():
         raise ValueError("broken")
     except Exception as e:
         msg, msg_type, meta = _validate_log_call(e)
-        assert "ValueError: broken" in msg
+        # Exceptions are captured, and only formatted once they are written
+        assert isinstance(msg, LazyMessage)
+        assert "ValueError: broken" in msg.render()
+        assert "raise ValueError" in msg.render()
         assert msg_type == MessageType.USER
         assert meta is None
 
 
+def test_lazy_message_renders_with_format():
+    message = LazyMessage("{} items in {seconds:.1f}s", 3, seconds=1.25)
+    assert message.render() == "3 items in 1.2s"
+    assert str(message) == "3 items in 1.2s"
+
+
+def test_lazy_message_render_errors_are_contained():
+    class Broken:
+        def __format__(self, spec):
+            raise RuntimeError("nope")
+
+    assert LazyMessage("value: {}", Broken()).render() == "value: {}\n`ERROR`"
+
+
+def test_lazy_message_rejects_non_string_format():
+    with pytest.raises(ValueError):
+        LazyMessage(123)
+
+
 def test_validate_log_call_with_string_message_type():
     msg, msg_type, meta = _validate_log_call("info", "error")
     assert msg == "info"
@@ -119,3 +144,89 @@ def test_stringify_function_call_handles_unprintable():
 
     s = _stringify_function_call(dummy, [Unprintable()], {"x": Unprintable()})
     assert "`ERROR`" in s
+
+
+@pytest.fixture
+def validation_mode():
+    yield set_validation
+    set_validation(ValidationMode.FULL)
+
+
+def test_cached_validation_rejects_what_full_validation_rejects(validation_mode):
+    validation_mode("cached")
+
+    # Populate the cache with a valid layout, then change only the types
+    _validate_log_call("msg", entry_metadata={"key": 1, "other": "a"})
+    _validate_log_call("msg", entry_metadata={"key": 2, "other": "b"})
+
+    with pytest.raises(ValueError):
+        _validate_log_call("msg", entry_metadata={"key": object(), "other": "a"})
+
+    with pytest.raises(ValueError):
+        _validate_tags_and_metadata(
+            {"key": [1], "other": "a"}, tags=None, metadata=None
+        )
+
+
+def test_cached_validation_remembers_layouts(validation_mode):
+    from bramble import utils
+
+    validation_mode(ValidationMode.CACHED)
+    _validate_log_call("msg", entry_metadata={"key": 1})
+
+    assert ("key",) in utils._VALID_KEYS
+    # Values of the same keys are still checked
+    with pytest.raises(ValueError):
+        _validate_log_call("msg", entry_metadata={"key": object()})
+
+
+def test_sampled_validation_checks_a_fraction_of_calls(validation_mode):
+    validation_mode("sampled", sample_rate=0.5)
+
+    failures = 0
+    for _ in range(10):
+        try:
+            _validate_log_call("msg", entry_metadata={"key": object()})
+        except ValueError:
+            failures += 1
+
+    assert failures == 5
+
+
+def test_sampled_validation_still_checks_message_type(validation_mode):
+    validation_mode("sampled", sample_rate=0.01)
+
+    with pytest.raises(ValueError):
+        _validate_log_call("msg", object())
+
+
+@pytest.mark.parametrize(
+    "mode, sample_rate",
+    [("nope", 0.1), (1, 0.1), ("sampled", 0), ("sampled", 1.5), ("full", "0.1")],
+)
+def test_set_validation_rejects_invalid_arguments(mode, sample_rate, validation_mode):
+    with pytest.raises(ValueError):
+        validation_mode(mode, sample_rate=sample_rate)
+
+
+def test_time_ordered_ids_are_unique_and_sorted():
+    import time
+
+    ids = [time_ordered_id() for _ in range(1000)]
+    time.sleep(0.002)
+    ids.append(time_ordered_id())
+
+    assert all(len(id) == 24 for id in ids)
+    assert all(int(id, 16) >= 0 for id in ids)
+    assert len(set(ids)) == len(ids)
+    assert sorted(ids) == ids
+
+
+def test_time_ordered_ids_start_with_creation_time():
+    import time
+
+    before = int(time.time() * 1000)
+    id = time_ordered_id()
+    after = int(time.time() * 1000)
+
+    assert before - 5 <= int(id[:11], 16) <= after + 5
@@ -0,0 +1,209 @@
+import asyncio
+import pytest
+import timeit
+
+from unittest.mock import AsyncMock, patch
+
+from bramble.backends.base import BrambleWriter
+from bramble.loggers import TreeLogger
+from bramble.wrapper import branch, CapturePolicy
+
+# Upper bound on the time which `@branch` may add to a call made outside of any
+# TreeLogger. Generous, so that slow CI machines do not fail spuriously, but
+# far below the cost of forking a branch and formatting the arguments.
+OVERHEAD_BUDGET_NS = 1_500
+NUMBER = 20_000
+REPEAT = 7
+
+
+def _best_ns_per_call(fn) -> float:
+    return min(timeit.repeat(fn, number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def test_sync_branch_overhead_outside_logger_is_within_budget():
+    big_argument = list(range(10_000))
+
+    def plain(data, flag=True):
+        return flag
+
+    decorated = branch(["tag"], {"key": 1})(plain)
+
+    assert decorated(big_argument, flag=False) is False
+
+    plain_ns = _best_ns_per_call(lambda: plain(big_argument, flag=False))
+    decorated_ns = _best_ns_per_call(lambda: decorated(big_argument, flag=False))
+
+    assert decorated_ns - plain_ns < OVERHEAD_BUDGET_NS
+
+
+def test_async_branch_overhead_outside_logger_is_within_budget():
+    async def plain(value):
+        return value
+
+    decorated = branch(plain)
+
+    async def call_many(fn):
+        for _ in range(NUMBER):
+            await fn(1)
+
+    def best_ns_per_call(fn):
+        loop = asyncio.new_event_loop()
+        try:
+            timings = timeit.repeat(
+                lambda: loop.run_until_complete(call_many(fn)),
+                number=1,
+                repeat=REPEAT,
+            )
+        finally:
+            loop.close()
+        return min(timings) / NUMBER * 1e9
+
+    plain_ns = best_ns_per_call(plain)
+    decorated_ns = best_ns_per_call(decorated)
+
+    assert decorated_ns - plain_ns < OVERHEAD_BUDGET_NS
+
+
+def test_branch_outside_logger_does_not_format_arguments():
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("arguments should not be formatted")
+
+    # The call formatter is bound when the function is decorated
+    with patch("bramble.wrapper._stringify_function_call") as stringify:
+
+        @branch
+        def returns_argument(value):
+            return value
+
+        argument = Expensive()
+        assert returns_argument(argument) is argument
+        stringify.assert_not_called()
+
+
+class MockWriter(BrambleWriter):
+    def __init__(self):
+        self.async_append_entries = AsyncMock()
+        self.async_update_tree = AsyncMock()
+        self.async_update_branch_metadata = AsyncMock()
+        self.async_add_tags = AsyncMock()
+
+
+def _logged_messages(func, *args, **kwargs):
+    tree_logger = TreeLogger(logging_backend=MockWriter())
+    tree_logger.run = lambda *_, **__: None
+    with tree_logger:
+        tree_logger._drain()
+        func(*args, **kwargs)
+    return [
+        task[2].message
+        for task in tree_logger._drain()
+        if task[0] == 0 and task[1] != tree_logger.root.id
+    ]
+
+
+def test_capture_policy_excludes_parameters():
+    @branch(capture=CapturePolicy(exclude=["secret"]))
+    def login(user, secret, remember=False):
+        return True
+
+    [call, result] = _logged_messages(login, "alice", "hunter2", remember=True)
+    assert call == "Function call:\nlogin(alice,\n`OMITTED`,\nremember=True,\n)"
+    assert result == "Function return:\nTrue"
+
+
+def test_capture_policy_includes_only_named_parameters():
+    @branch(capture=CapturePolicy(include=["rows"], capture_return=False))
+    def process(rows, *extra, verbose=False):
+        return rows
+
+    [call] = _logged_messages(process, [1, 2], 3, verbose=True)
+    assert call == (
+        "Function call:\nprocess([1, 2],\n`OMITTED`,\nverbose=`OMITTED`,\n)"
+    )
+
+
+def test_capture_policy_limits_length_and_types():
+    @branch(capture=CapturePolicy(max_length=20))
+    def limited(data):
+        return "x" * 100
+
+    [call, result] = _logged_messages(limited, list(range(10_000)))
+    argument = call.removeprefix("Function call:\nlimited(").removesuffix(",\n)")
+    assert len(argument) <= 20
+    assert len(result.removeprefix("Function return:\n")) <= 20
+
+    # Only the start of large bytes is converted
+    [call, _] = _logged_messages(limited, b"\x00" * 1_000_000)
+    argument = call.removeprefix("Function call:\nlimited(").removesuffix(",\n)")
+    assert argument.startswith("b'\\x00")
+    assert len(argument) <= 20
+
+    @branch(capture=CapturePolicy(types_only=True))
+    def typed(data, flag=None):
+        return {}
+
+    [call, result] = _logged_messages(typed, [1, 2], flag=True)
+    assert call == "Function call:\ntyped(list,\nflag=bool,\n)"
+    assert result == "Function return:\ndict"
+
+
+@pytest.mark.parametrize(
+    "policy",
+    [
+        CapturePolicy(include=["missing"]),
+        CapturePolicy(exclude=["missing"]),
+    ],
+)
+def test_capture_policy_rejects_unknown_parameters(policy):
+    def func(value):
+        pass
+
+    with pytest.raises(ValueError):
+        branch(capture=policy)(func)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_length": 0},
+        {"max_length": "10"},
+        {"include": "value"},
+        {"exclude": [1]},
+        {"types_only": "yes"},
+        {"capture_return": None},
+    ],
+)
+def test_capture_policy_rejects_invalid_values(kwargs):
+    with pytest.raises(ValueError):
+        CapturePolicy(**kwargs)
+
+
+def test_branch_forks_from_template_without_validating():
+    tree_logger = TreeLogger(logging_backend=MockWriter())
+    tree_logger.run = lambda *_, **__: None
+
+    metadata = {"key": 1}
+
+    @branch(["tag"], metadata)
+    def decorated():
+        from bramble.contextual import context
+
+        return context()
+
+    # The template holds its own copy of the metadata
+    metadata["key"] = 2
+
+    with tree_logger:
+        with patch("bramble.contextual._validate_tags_and_metadata") as validate:
+            [first] = decorated()
+            [second] = decorated()
+        validate.assert_not_called()
+
+    for forked in [first, second]:
+        assert forked.name == "decorated"
+        assert forked.parent == tree_logger.root.id
+        assert forked.tags == ["tag"]
+        assert forked.metadata == {"name": "decorated", "key": 1}
+    assert tree_logger.root.children == [first.id, second.id]
+    assert first.tags is not second.tags